@@ -1,6 +1,18 @@
 from flask import request, jsonify
 import logging
 
+from .database import database_report
+from .discovery import cleanup_duplicate_scenes
+from .filter_engine import FilterEngine
+from .http_transport import get_transport
+from .log_sink import get_database_log_handler
+from .models import Config, DiscoveryRun
+from .rate_limiter import get_stashdb_limiter
+from .refilter import refilter_stored_scenes
+from .scene_tags import tag_statistics
+from .tag_bitmaps import get_tag_bitmaps
+from .response_cache import get_response_cache
+
 logger = logging.getLogger(__name__)
 
 def register_additional_routes(app):
@@ -28,3 +40,119 @@ def register_additional_routes(app):
         except Exception as e:
             logger.error(f"Error in add_scene_to_whisparr: {str(e)}")
             return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/stashdb/status')
+    def stashdb_status():
+        """Current StashDB request rate, concurrency window, throttle events and cache counters"""
+        try:
+            return jsonify({
+                'rate_limiter': get_stashdb_limiter().status(),
+                'cache': get_response_cache().stats(),
+                'transport': dict(get_transport().stats)
+            })
+        except Exception as e:
+            logger.error(f"Error getting StashDB status: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/database/status')
+    def database_status():
+        """SQLite pragmas in effect versus requested, database/WAL file sizes and the log sink counters"""
+        try:
+            report = database_report()
+            handler = get_database_log_handler()
+            report['log_sink'] = handler.status() if handler else None
+            return jsonify(report)
+        except Exception as e:
+            logger.error(f"Error getting database status: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/discovery/runs')
+    def discovery_runs():
+        """Recent discovery runs, newest first (?limit=, ?status=)"""
+        try:
+            limit = min(request.args.get('limit', 20, type=int), 200)
+            query = DiscoveryRun.query
+            if request.args.get('status'):
+                query = query.filter_by(status=request.args['status'])
+            runs = query.order_by(DiscoveryRun.started_at.desc()).limit(limit).all()
+            return jsonify({'runs': [run.to_dict() for run in runs]})
+        except Exception as e:
+            logger.error(f"Error listing discovery runs: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/discovery/runs/<int:run_id>')
+    def discovery_run(run_id):
+        """One discovery run with its per-entity timings and engine reports"""
+        try:
+            run = DiscoveryRun.query.filter_by(id=run_id).first()
+            if not run:
+                return jsonify({'error': 'Discovery run not found'}), 404
+            return jsonify(run.to_dict(include_stats=True))
+        except Exception as e:
+            logger.error(f"Error getting discovery run {run_id}: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/filters/refilter', methods=['POST'])
+    def refilter_scenes():
+        """Re-apply the current filter settings to all stored scenes (?dry_run=true only reports)"""
+        try:
+            config = Config.query.first()
+            if not config:
+                return jsonify({'error': 'No configuration saved'}), 400
+            dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+            return jsonify(refilter_stored_scenes(config, dry_run=dry_run))
+        except Exception as e:
+            logger.error(f"Error re-filtering stored scenes: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/cleanup-duplicates', methods=['POST'])
+    def cleanup_duplicates():
+        """Merge scenes stored more than once under the same StashDB id (?dry_run=true only reports)"""
+        try:
+            dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+            results = cleanup_duplicate_scenes(dry_run=dry_run)
+            if results['status'] != 'success':
+                return jsonify(dict(results, message='; '.join(results['errors']))), 500
+            return jsonify(results)
+        except Exception as e:
+            logger.error(f"Error cleaning up duplicate scenes: {str(e)}")
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    @app.route('/api/tags/stats')
+    def tag_stats():
+        """Scene counts per tag and per category (?limit=, ?category=)"""
+        try:
+            limit = min(request.args.get('limit', 50, type=int), 1000)
+            return jsonify(tag_statistics(limit=limit, category=request.args.get('category')))
+        except Exception as e:
+            logger.error(f"Error getting tag statistics: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/filters/simulate', methods=['POST'])
+    def simulate_filters():
+        """How many stored scenes a filter configuration would filter, before it is saved.
+        
+        Body: unwanted_categories, required_categories, min_duration_minutes, max_duration_minutes
+        (missing keys fall back to the saved configuration) and optionally sample.
+        """
+        try:
+            data = request.get_json() or {}
+            config = Config.query.first()
+            
+            def setting(key, saved):
+                return data[key] if key in data else saved
+            
+            engine = FilterEngine(
+                unwanted=setting('unwanted_categories', config.get_unwanted_categories() if config else []),
+                required=setting('required_categories', config.get_required_categories() if config else []),
+                min_duration_minutes=int(setting('min_duration_minutes', config.min_duration_minutes if config else 0) or 0),
+                max_duration_minutes=int(setting('max_duration_minutes', config.max_duration_minutes if config else 0) or 0),
+                debug_sample=0
+            )
+            sample = max(0, min(int(data.get('sample', 20)), 200))
+            return jsonify(get_tag_bitmaps().simulate(engine, sample=sample))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid filter settings: {str(e)}'}), 400
+        except Exception as e:
+            logger.error(f"Error simulating filters: {str(e)}")
+            return jsonify({'error': str(e)}), 500
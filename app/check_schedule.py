@@ -0,0 +1,128 @@
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .models import db, Performer, Scene, Studio
+
+logger = logging.getLogger(__name__)
+
+# Release rate is measured over this many days of stored scenes
+CADENCE_WINDOW_DAYS = 180
+
+def use_adaptive_schedule() -> bool:
+    """Only crawl entities whose release cadence says they are due (DISCOVERY_ADAPTIVE_SCHEDULE)"""
+    return os.environ.get('DISCOVERY_ADAPTIVE_SCHEDULE', 'false').lower() == 'true'
+
+def get_check_hours_bounds() -> Tuple[float, float]:
+    """(shortest, longest) interval between checks of one entity, in hours"""
+    try:
+        min_hours = max(1.0, float(os.environ.get('DISCOVERY_MIN_CHECK_HOURS', '6')))
+    except ValueError:
+        min_hours = 6.0
+    try:
+        max_hours = max(min_hours, float(os.environ.get('DISCOVERY_MAX_CHECK_HOURS', '720')))
+    except ValueError:
+        max_hours = max(min_hours, 720.0)
+    return min_hours, max_hours
+
+def get_schedule_tick_minutes() -> int:
+    """How often the scheduler looks for due entities when the adaptive schedule is on"""
+    try:
+        return max(5, int(os.environ.get('DISCOVERY_TICK_MINUTES', '60')))
+    except ValueError:
+        return 60
+
+def check_interval_hours(recent_dates: List[date], latest: Optional[date], today: date = None) -> float:
+    """Hours until an entity should be checked again, from its release history.
+    
+    The expected gap between releases is the cadence window divided by the releases in it; a
+    performer or studio silent for longer than twice that gap is treated as slowing down and
+    its silence becomes the gap. Checking twice per expected gap keeps the delay before a new
+    scene is found at about half a release interval. With no releases at all the longest
+    interval is used.
+    """
+    today = today or date.today()
+    min_hours, max_hours = get_check_hours_bounds()
+    
+    # Announced future releases count as today's
+    recent = [min(release, today) for release in recent_dates if release]
+    if latest:
+        latest = min(latest, today)
+    if recent:
+        latest = max(latest or recent[0], max(recent))
+    if not latest:
+        return max_hours
+    
+    days_since = (today - latest).days
+    gap_days = CADENCE_WINDOW_DAYS / len(recent) if recent else float(days_since)
+    if days_since > 2 * gap_days:
+        gap_days = float(days_since)
+    
+    return min(max_hours, max(min_hours, gap_days * 24 / 2))
+
+def load_release_history(kind: str, entity_ids: List[int], today: date = None) -> Dict[int, Tuple[List[date], Optional[date]]]:
+    """{entity id: (release dates in the cadence window, latest release date)} from stored scenes"""
+    today = today or date.today()
+    column = Scene.performer_id if kind == 'performer' else Scene.studio_id
+    cutoff = today - timedelta(days=CADENCE_WINDOW_DAYS)
+    history = {entity_id: ([], None) for entity_id in entity_ids}
+    
+    # Chunked to stay under SQLite's bound-parameter limit
+    for start in range(0, len(entity_ids), 500):
+        chunk = entity_ids[start:start + 500]
+        for entity_id, latest in db.session.query(column, db.func.max(Scene.release_date)).filter(
+                column.in_(chunk)).group_by(column).all():
+            history[entity_id] = (history[entity_id][0], latest)
+        for entity_id, release_date in db.session.query(column, Scene.release_date).filter(
+                column.in_(chunk), Scene.release_date >= cutoff).all():
+            history[entity_id][0].append(release_date)
+    
+    return history
+
+def is_due(entity, now: datetime = None) -> bool:
+    now = now or datetime.utcnow()
+    return entity.next_check_due is None or entity.next_check_due <= now
+
+def any_entity_due(now: datetime = None) -> bool:
+    """True if any monitored performer or studio is due, so a scheduler tick has work to do"""
+    now = now or datetime.utcnow()
+    for model in (Performer, Studio):
+        due = model.query.filter_by(monitored=True).filter(
+            db.or_(model.next_check_due.is_(None), model.next_check_due <= now)).first()
+        if due:
+            return True
+    return False
+
+def schedule_next_checks(jobs: List[Tuple[str, object]], checked_since: datetime) -> Dict:
+    """Set check_interval_hours and next_check_due for the entities checked in this run.
+    
+    Entities whose check failed (last_checked older than checked_since) stay due.
+    """
+    today = date.today()
+    summary = {'scheduled': 0, 'min_hours': None, 'max_hours': None}
+    
+    for kind in ('performer', 'studio'):
+        entities = [entity for entity_kind, entity in jobs if entity_kind == kind
+                    and entity.last_checked and entity.last_checked >= checked_since]
+        if not entities:
+            continue
+        
+        history = load_release_history(kind, [entity.id for entity in entities], today)
+        for entity in entities:
+            recent, latest = history[entity.id]
+            # The watermark also covers scenes stored under another performer of the same scene
+            if entity.latest_release_date and (not latest or entity.latest_release_date > latest):
+                latest = entity.latest_release_date
+            hours = check_interval_hours(recent, latest, today)
+            entity.check_interval_hours = round(hours, 2)
+            entity.next_check_due = entity.last_checked + timedelta(hours=hours)
+            
+            summary['scheduled'] += 1
+            summary['min_hours'] = hours if summary['min_hours'] is None else min(summary['min_hours'], hours)
+            summary['max_hours'] = hours if summary['max_hours'] is None else max(summary['max_hours'], hours)
+    
+    if summary['scheduled']:
+        logger.info(f"Scheduled next checks for {summary['scheduled']} entities "
+                    f"({summary['min_hours']:.1f}h to {summary['max_hours']:.1f}h)")
+    return summary
@@ -0,0 +1,109 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from .models import db
+from .tag_bitmaps import get_tag_bitmaps
+
+logger = logging.getLogger(__name__)
+
+# Old filtered scenes, read from the (is_filtered, discovered_date) index. Scenes and their dependent
+# rows are deleted in one transaction with this same subquery, which picks the same ids each time
+# because the scenes table is only changed by the last statement
+FILTERED_SCENES = (
+    "SELECT id FROM scenes WHERE is_filtered = 1 AND discovered_date < :cutoff LIMIT :limit"
+)
+
+SCENE_DELETES = (
+    ('wanted_deleted', f"DELETE FROM wanted_scenes WHERE scene_id IN ({FILTERED_SCENES})"),
+    ('scene_tags_deleted', f"DELETE FROM scene_tags WHERE scene_id IN ({FILTERED_SCENES})"),
+    ('scenes_deleted', f"DELETE FROM scenes WHERE id IN ({FILTERED_SCENES})"),
+)
+
+LOG_DELETE = "DELETE FROM logs WHERE id IN (SELECT id FROM logs WHERE timestamp < :cutoff LIMIT :limit)"
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, str(default))))
+    except ValueError:
+        return default
+
+def get_cleanup_settings() -> Dict:
+    """Retention windows and batching for the cleanup job (CLEANUP_*)"""
+    return {
+        'log_retention_days': _env_int('CLEANUP_LOG_RETENTION_DAYS', 30, 1),
+        'filtered_retention_days': _env_int('CLEANUP_FILTERED_RETENTION_DAYS', 90, 1),
+        'batch_size': _env_int('CLEANUP_BATCH_SIZE', 2000, 1),
+        # Pause between chunks so web requests and discovery can take the write lock
+        'pause_ms': _env_int('CLEANUP_PAUSE_MS', 20),
+        'vacuum': os.environ.get('CLEANUP_VACUUM', 'true').lower() == 'true'
+    }
+
+def _delete_in_chunks(statements, params: Dict, batch_size: int, pause: float, report: Dict):
+    """Run the DELETE statements chunk by chunk, one short transaction per chunk, until the last one runs short"""
+    while True:
+        try:
+            deleted = 0
+            for key, statement in statements:
+                deleted = db.session.execute(db.text(statement), dict(params, limit=batch_size)).rowcount
+                report[key] += deleted
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report['chunks'] += 1
+        if deleted < batch_size:
+            return
+        if pause:
+            time.sleep(pause)
+
+def incremental_vacuum() -> Dict:
+    """Return free pages to the filesystem (needs auto_vacuum=INCREMENTAL, see migration 012)"""
+    connection = db.session.connection()
+    if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+        return {'enabled': False, 'pages_freed': 0, 'bytes_freed': 0}
+    
+    page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+    free_before = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+    # sqlite3's execute() steps this pragma once, freeing a single page; executescript() runs it to the end
+    connection.connection.driver_connection.executescript("PRAGMA incremental_vacuum;")
+    free_after = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+    db.session.commit()
+    
+    pages = free_before - free_after
+    return {'enabled': True, 'pages_freed': pages, 'bytes_freed': pages * page_size}
+
+def run_cleanup(settings: Dict = None) -> Dict:
+    """Delete logs and filtered scenes past their retention windows, then reclaim the freed space.
+    
+    Rows are deleted with set-based DELETEs of at most batch_size rows per statement and a
+    commit after every chunk, so the write lock is held for milliseconds at a time instead
+    of for the whole job. A filtered scene's wanted entries and tag links go with it.
+    """
+    settings = settings or get_cleanup_settings()
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    pause = settings['pause_ms'] / 1000
+    report = {'logs_deleted': 0, 'scenes_deleted': 0, 'wanted_deleted': 0, 'scene_tags_deleted': 0, 'chunks': 0}
+    
+    _delete_in_chunks([('logs_deleted', LOG_DELETE)],
+                      {'cutoff': now - timedelta(days=settings['log_retention_days'])},
+                      settings['batch_size'], pause, report)
+    _delete_in_chunks(SCENE_DELETES,
+                      {'cutoff': now - timedelta(days=settings['filtered_retention_days'])},
+                      settings['batch_size'], pause, report)
+    
+    if report['scenes_deleted']:
+        get_tag_bitmaps().mark_stale()
+    
+    seconds = time.perf_counter() - started
+    rows = report['logs_deleted'] + report['scenes_deleted'] + report['wanted_deleted'] + report['scene_tags_deleted']
+    report['rows_deleted'] = rows
+    report['delete_seconds'] = round(seconds, 3)
+    report['rows_per_second'] = round(rows / seconds) if seconds > 0 else 0
+    
+    report['vacuum'] = incremental_vacuum() if settings['vacuum'] else {'enabled': False, 'pages_freed': 0, 'bytes_freed': 0}
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,99 @@
+import logging
+import os
+import sqlite3
+from typing import Dict
+
+from sqlalchemy import event
+
+from .models import db
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_MODES = ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'OFF')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+AUTO_VACUUM_MODES = ('NONE', 'FULL', 'INCREMENTAL')
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, str(default))))
+    except ValueError:
+        return default
+
+def _env_choice(name: str, default: str, choices) -> str:
+    value = os.environ.get(name, default).upper()
+    return value if value in choices else default
+
+def get_sqlite_settings() -> Dict:
+    """Connection pragmas from the environment (SQLITE_*), with defaults suited to one writer and several readers"""
+    return {
+        'journal_mode': _env_choice('SQLITE_JOURNAL_MODE', 'WAL', JOURNAL_MODES),
+        'synchronous': _env_choice('SQLITE_SYNCHRONOUS', 'NORMAL', SYNCHRONOUS_MODES),
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 15000),
+        # Negative cache_size is in KiB
+        'cache_size': -_env_int('SQLITE_CACHE_SIZE_KB', 65536, 1),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE_MB', 256) * 1024 * 1024,
+        'foreign_keys': 1 if os.environ.get('SQLITE_FOREIGN_KEYS', 'true').lower() == 'true' else 0,
+        'temp_store': 'MEMORY',
+        # Lets cleanup hand freed pages back with PRAGMA incremental_vacuum. Only takes effect on a
+        # new database file; existing ones are converted by migration 012
+        'auto_vacuum': 'INCREMENTAL'
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, settings: Dict):
+    """Set the pragmas on a new connection; auto_vacuum must precede journal_mode to apply to a new file"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in ('auto_vacuum', 'journal_mode', 'busy_timeout', 'synchronous', 'cache_size', 'mmap_size', 'foreign_keys', 'temp_store'):
+            cursor.execute(f"PRAGMA {name} = {settings[name]}")
+    finally:
+        cursor.close()
+
+def configure_database(app):
+    """Apply the SQLite pragmas to every connection of the app's engine (call after db.init_app)"""
+    settings = get_sqlite_settings()
+    
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            return
+        
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            if isinstance(dbapi_connection, sqlite3.Connection):
+                apply_sqlite_pragmas(dbapi_connection, settings)
+        
+        try:
+            report = database_report(settings)
+            mismatched = {name: value for name, value in report['pragmas'].items()
+                          if str(value).upper() != str(report['requested'][name]).upper()}
+            logger.info("SQLite settings in effect: " + ', '.join(f'{name}={value}' for name, value in report['pragmas'].items()))
+            if mismatched:
+                # e.g. WAL is unavailable for in-memory databases and some network filesystems
+                logger.warning(f"SQLite did not accept: {', '.join(f'{name}={value}' for name, value in mismatched.items())}")
+        except Exception as e:
+            logger.warning(f"Could not check SQLite settings: {str(e)}")
+
+def database_report(settings: Dict = None) -> Dict:
+    """Pragmas actually in effect on a pooled connection, next to the requested values, plus file sizes"""
+    settings = settings or get_sqlite_settings()
+    with db.engine.connect() as connection:
+        pragmas = {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'foreign_keys', 'temp_store',
+                         'auto_vacuum')
+        }
+        sqlite_version = connection.exec_driver_sql("SELECT sqlite_version()").scalar()
+    
+    # synchronous and temp_store come back as numbers
+    pragmas['synchronous'] = SYNCHRONOUS_MODES[pragmas['synchronous']] if isinstance(pragmas['synchronous'], int) else pragmas['synchronous']
+    pragmas['temp_store'] = ('DEFAULT', 'FILE', 'MEMORY')[pragmas['temp_store']] if isinstance(pragmas['temp_store'], int) else pragmas['temp_store']
+    pragmas['auto_vacuum'] = AUTO_VACUUM_MODES[pragmas['auto_vacuum']] if isinstance(pragmas['auto_vacuum'], int) else pragmas['auto_vacuum']
+    
+    files = {}
+    path = db.engine.url.database
+    if path and path != ':memory:':
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                files[os.path.basename(path + suffix)] = os.path.getsize(path + suffix)
+    
+    return {'sqlite_version': sqlite_version, 'pragmas': pragmas, 'requested': settings, 'files': files}
@@ -1,16 +1,73 @@
+import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from .models import db, Performer, Studio, Scene, WantedScene, Config
+from .models import db, Performer, Studio, Scene, WantedScene, Config, DiscoveryCursor
+from .check_schedule import use_adaptive_schedule, any_entity_due, is_due, schedule_next_checks
+from .discovery_runs import DiscoveryRunTracker
+from .duplicates import consolidate_duplicate_scenes
+from .filter_engine import FilterEngine
+from .owned_index import OwnedLibraryIndex, parse_stash_timestamp
+from .prefetch import PrefetchingPager
+from .response_cache import get_response_cache
+from .scene_tags import store_scene_tags
+from .tag_bitmaps import get_tag_bitmaps
 from .stash_api import StashAPI
 from .stashdb_api import StashDBAPI
 from .whisparr_api import WhisparrAPI
 
 logger = logging.getLogger(__name__)
 
-def run_discovery_task() -> Dict:
-    """Main discovery task that finds new scenes"""
+# StashDB returns 50 scenes per page; performers get up to 1000 scenes, studios up to 2500
+SCENES_PER_PAGE = 50
+MAX_PAGES = {'performer': 20, 'studio': 50}
+
+# The feed engine reads StashDB's global newest-first scene stream 100 scenes at a time
+FEED_PAGE_SIZE = 100
+FEED_CURSOR_NAME = 'scene_feed'
+
+# Wanted scenes sent to Whisparr per run
+WHISPARR_BATCH_LIMIT = 50
+
+def get_discovery_workers() -> int:
+    """Number of entities fetched concurrently (DISCOVERY_WORKERS, 1 = sequential)"""
+    try:
+        return max(1, int(os.environ.get('DISCOVERY_WORKERS', '1')))
+    except ValueError:
+        logger.warning("Invalid DISCOVERY_WORKERS value, falling back to sequential discovery")
+        return 1
+
+def get_deep_resync_days() -> int:
+    """Days between full catalogue walks per entity (DISCOVERY_DEEP_RESYNC_DAYS, 0 = never)"""
+    try:
+        return max(0, int(os.environ.get('DISCOVERY_DEEP_RESYNC_DAYS', '7')))
+    except ValueError:
+        return 7
+
+def get_discovery_engine() -> str:
+    """'entity' crawls each monitored performer/studio; 'feed' reads StashDB's global scene stream once"""
+    engine = os.environ.get('DISCOVERY_ENGINE', 'entity').lower()
+    if engine not in ('entity', 'feed'):
+        logger.warning(f"Unknown DISCOVERY_ENGINE '{engine}', using 'entity'")
+        return 'entity'
+    return engine
+
+def use_discovery_pipeline() -> bool:
+    """Stream entity discovery through the staged pipeline (DISCOVERY_PIPELINE)"""
+    return os.environ.get('DISCOVERY_PIPELINE', 'false').lower() == 'true'
+
+def run_discovery_task(deep_resync: bool = False, trigger: str = None) -> Dict:
+    """Main discovery task that finds new scenes.
+    
+    Entities with a watermark are crawled incrementally; pass deep_resync=True to walk every
+    entity's whole catalogue regardless. Progress is checkpointed in a DiscoveryRun, and a
+    run that was interrupted resumes from its last checkpoint instead of starting over.
+    """
     logger.info("Starting scene discovery task")
     
     config = Config.get_config()
@@ -18,15 +75,45 @@ def run_discovery_task() -> Dict:
         logger.info("Discovery is disabled in configuration")
         return {'status': 'disabled', 'message': 'Discovery is disabled'}
     
+    adaptive = use_adaptive_schedule()
+    if adaptive and trigger == 'scheduled' and not deep_resync and not any_entity_due():
+        # Most adaptive ticks find nothing to do; skip the ownership refresh, feed and Whisparr steps
+        logger.info("No monitored performer or studio is due for a check")
+        return {'status': 'not_due', 'message': 'No monitored performer or studio is due for a check'}
+    
     stash_api = StashAPI()
     stashdb_api = StashDBAPI()
     whisparr_api = WhisparrAPI()
+    workers = get_discovery_workers()
+    engine = get_discovery_engine()
+    use_pipeline = use_discovery_pipeline()
+    started = time.monotonic()
+    
+    # Scenes already evaluated this run: repeat sightings only merge their association
+    seen = SeenScenes()
+    tracker = DiscoveryRunTracker.start(trigger, deep_resync, engine, seen)
+    if tracker is None:
+        return {'status': 'busy', 'message': 'Another discovery run is in progress'}
+    deep_resync = tracker.deep_resync
     
     results = {
         'status': 'success',
+        'engine': engine,
+        'pipeline_enabled': use_pipeline,
         'new_scenes': 0,
         'filtered_scenes': 0,
         'wanted_added': 0,
+        'workers': workers,
+        'deep_resync': deep_resync,
+        'run_id': tracker.run.id,
+        'resumed': tracker.resumed,
+        'started_at': datetime.utcnow().isoformat(),
+        'skipped_entities': 0,
+        'not_due': 0,
+        'pages_fetched': 0,
+        'entity_timings': [],
+        'page_writes': [],
+        'redundant_skipped': 0,
         'errors': []
     }
     
@@ -37,42 +124,81 @@ def run_discovery_task() -> Dict:
         
         logger.info(f"Monitoring {len(monitored_performers)} performers and {len(monitored_studios)} studios")
         
-        # Process performers - check multiple pages for each
-        for performer in monitored_performers:
-            try:
-                performer_results = process_performer_scenes(performer, stashdb_api, stash_api, config)
-                results['new_scenes'] += performer_results['new_scenes']
-                results['filtered_scenes'] += performer_results['filtered_scenes']
-                
-                # Update last checked time
-                performer.last_checked = datetime.utcnow()
-                
-                logger.info(f"Processed {performer.name}: {performer_results['new_scenes']} new, {performer_results['filtered_scenes']} filtered")
-                
-            except Exception as e:
-                error_msg = f"Error processing performer {performer.name}: {str(e)}"
-                logger.error(error_msg)
-                results['errors'].append(error_msg)
+        # Filter settings are compiled once and shared by every entity (and worker) in the run
+        filters = FilterEngine.from_config(config)
         
-        # Process studios - check multiple pages for each
-        for studio in monitored_studios:
-            try:
-                studio_results = process_studio_scenes(studio, stashdb_api, stash_api, config)
-                results['new_scenes'] += studio_results['new_scenes']
-                results['filtered_scenes'] += studio_results['filtered_scenes']
-                
-                # Update last checked time
-                studio.last_checked = datetime.utcnow()
-                
-                logger.info(f"Processed {studio.name}: {studio_results['new_scenes']} new, {studio_results['filtered_scenes']} filtered")
-                
-            except Exception as e:
-                error_msg = f"Error processing studio {studio.name}: {str(e)}"
-                logger.error(error_msg)
-                results['errors'].append(error_msg)
+        # Ownership checks become set lookups instead of one Stash request per new scene
+        owned_index = OwnedLibraryIndex(stash_api)
+        results['owned_index'] = owned_index.refresh()
+        
+        jobs = [('performer', p) for p in monitored_performers] + [('studio', s) for s in monitored_studios]
+        monitored_jobs = list(jobs)
+        if tracker.completed:
+            # Entities a resumed run already finished before it was interrupted
+            remaining = [(kind, entity) for kind, entity in jobs if not tracker.is_done(kind, entity)]
+            results['skipped_entities'] = len(jobs) - len(remaining)
+            jobs = remaining
+            logger.info(f"Resumed run skips {results['skipped_entities']} entities finished before the interruption")
+        results['stashdb_ids_resolved'] = resolve_missing_stashdb_ids(jobs, stashdb_api)
         
-        # Add wanted scenes to Whisparr using UUID-based method
-        if config.auto_add_to_whisparr:
+        if engine == 'feed':
+            # Entities already synced are covered by one feed crawl; new or resync-due ones are crawled individually
+            feed_jobs = [(kind, entity) for kind, entity in jobs
+                         if entity.stashdb_id and not needs_entity_crawl(entity, deep_resync)]
+            if feed_jobs:
+                try:
+                    results['feed'] = run_feed_discovery(feed_jobs, stashdb_api, owned_index, filters, results, seen)
+                    tracker.entities_done(feed_jobs)
+                    feed_ids = {id(entity) for _, entity in feed_jobs}
+                    jobs = [(kind, entity) for kind, entity in jobs if id(entity) not in feed_ids]
+                except Exception as e:
+                    error_msg = f"Feed discovery failed, crawling entities individually: {str(e)}"
+                    logger.error(error_msg)
+                    results['errors'].append(error_msg)
+        
+        if adaptive and not deep_resync:
+            # Entity crawls only for entities whose release cadence says they are due (the feed covers everyone)
+            now = datetime.utcnow()
+            due = [(kind, entity) for kind, entity in jobs if is_due(entity, now)]
+            results['not_due'] = len(jobs) - len(due)
+            jobs = due
+            logger.info(f"{len(due)} entities due for a check, {results['not_due']} not due yet")
+        
+        pipeline_ran = False
+        if use_pipeline:
+            # Imported here: the pipeline module builds on the helpers in this one
+            from .discovery_pipeline import run_discovery_pipeline
+            # Workers read plain values only, so make everything above visible before they start
+            db.session.commit()
+            results['pipeline'] = run_discovery_pipeline(jobs, stashdb_api, owned_index, config, results,
+                                                         whisparr_api, deep_resync, seen, tracker)
+            pipeline_ran = True
+        elif workers > 1:
+            run_entities_concurrently(jobs, stashdb_api, owned_index, config, results, workers, deep_resync, seen,
+                                      tracker)
+        else:
+            # Process performers, then studios - check multiple pages for each
+            for kind, entity in jobs:
+                entity_started = time.monotonic()
+                try:
+                    entity_results = process_entity_scenes(kind, entity, stashdb_api, owned_index, filters, deep_resync, seen,
+                                                           tracker)
+                    record_entity_results(kind, entity, entity_results, time.monotonic() - entity_started, results)
+                    tracker.entity_done(kind, entity)
+                except Exception as e:
+                    error_msg = f"Error processing {kind} {entity.name}: {str(e)}"
+                    logger.error(error_msg)
+                    results['errors'].append(error_msg)
+        
+        # Performer/studio links queued by repeat sightings, written in one pass
+        seen.flush()
+        results['associations_updated'] = seen.associations_updated
+        results['redundant_skipped'] = seen.redundant_skipped
+        if seen.redundant_skipped:
+            logger.info(f"Skipped {seen.redundant_skipped} repeat scene evaluations, {results['associations_updated']} associations merged")
+        
+        # Add wanted scenes to Whisparr using UUID-based method (the pipeline streams them itself)
+        if config.auto_add_to_whisparr and not pipeline_ran:
             try:
                 wanted_results = add_wanted_scenes_to_whisparr(whisparr_api, config)
                 results['wanted_added'] = wanted_results['added_count']
@@ -84,8 +210,19 @@ def run_discovery_task() -> Dict:
                 logger.error(error_msg)
                 results['errors'].append(error_msg)
         
+        if adaptive:
+            results['check_schedule'] = schedule_next_checks(monitored_jobs, tracker.run.started_at)
+        
         # Commit all changes
+        results['seconds'] = round(time.monotonic() - started, 3)
+        tracker.finish(results)
         db.session.commit()
+        results['stashdb_cache'] = get_response_cache().stats()
+        
+        # Index this run's scenes for filter simulation now rather than on the next request
+        tag_bitmaps = get_tag_bitmaps()
+        if tag_bitmaps.built:
+            tag_bitmaps.refresh()
         
         logger.info(f"Discovery completed: {results['new_scenes']} new scenes, {results['filtered_scenes']} filtered, {results['wanted_added']} added to Whisparr")
         
@@ -95,386 +232,742 @@ def run_discovery_task() -> Dict:
         logger.error(error_msg)
         results['status'] = 'error'
         results['errors'].append(error_msg)
+        
+        # Keep the run resumable from its last checkpoint
+        try:
+            results['seconds'] = round(time.monotonic() - started, 3)
+            tracker.finish(results)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record failed discovery run: {str(e)}")
     
     return results
 
-def process_performer_scenes(performer: Performer, stashdb_api: StashDBAPI, stash_api: StashAPI, config: Config) -> Dict:
-    """Process ALL scenes for a specific performer, then filter locally"""
-    logger.info(f"Getting ALL scenes for performer: {performer.name}")
-    
-    results = {'new_scenes': 0, 'filtered_scenes': 0}
-    
-    try:
-        # Find performer in StashDB if not already linked
-        if not performer.stashdb_id:
-            stashdb_performers = stashdb_api.search_performer(performer.name)
-            if stashdb_performers:
-                # Try to match by name (simple matching for now)
-                for sp in stashdb_performers:
-                    if sp['name'].lower() == performer.name.lower():
-                        performer.stashdb_id = sp['id']
-                        break
-        
-        if not performer.stashdb_id:
-            logger.warning(f"Could not find StashDB ID for performer: {performer.name}")
-            return results
-        
-        # Get ALL scenes for this performer from StashDB - comprehensive approach
-        try:
-            max_pages = 20  # Get up to 1000 scenes (20 pages × 50 scenes)
-            all_scenes_processed = 0
-            
-            for page_num in range(1, max_pages + 1):
-                try:
-                    scenes_result = stashdb_api.get_performer_scenes(performer.stashdb_id, page=page_num)
-                    scenes = scenes_result.get('scenes', [])
-                    
-                    if not scenes:
-                        logger.info(f"No more scenes found for {performer.name} on page {page_num}")
-                        break
-                    
-                    logger.info(f"Processing {len(scenes)} scenes for {performer.name} (page {page_num})")
-                    
-                    for scene_data in scenes:
-                        try:
-                            # Process each scene - this handles deduplication and filtering
-                            scene_results = process_scene(scene_data, stash_api, config, performer_id=performer.id)
-                            results['new_scenes'] += scene_results['new_scenes']
-                            results['filtered_scenes'] += scene_results['filtered_scenes']
-                            all_scenes_processed += 1
-                        except Exception as e:
-                            logger.error(f"Error processing scene for {performer.name}: {str(e)}")
-                            continue
-                    
-                    # If we got fewer scenes than requested, we've reached the end
-                    if len(scenes) < 50:
-                        logger.info(f"Reached end of scenes for {performer.name} (got {len(scenes)} on page {page_num})")
-                        break
-                        
-                except Exception as e:
-                    logger.error(f"Error fetching page {page_num} for performer {performer.name}: {str(e)}")
-                    break
-            
-            logger.info(f"Processed {all_scenes_processed} total scenes for performer {performer.name}")
-            
-        except Exception as e:
-            logger.warning(f"Could not fetch scenes for performer {performer.name}: {str(e)}")
-            # Fallback: try search-based discovery
+def run_entities_concurrently(jobs: List[Tuple[str, object]], stashdb_api: StashDBAPI, ownership: OwnedLibraryIndex,
+                              config: Config, results: Dict, workers: int, deep_resync: bool = False,
+                              seen: 'SeenScenes' = None, tracker: DiscoveryRunTracker = None):
+    """Fetch and filter entities on a bounded worker pool, applying DB changes on this thread only.
+    
+    Workers never touch the SQLAlchemy session: they get plain values plus a detached copy of
+    the filter settings, and hand back the filtered pages. The calling thread is the single
+    writer, so SQLite only ever sees one connection writing during discovery.
+    """
+    # Compiled filters hold no ORM state, so the workers can share them
+    filter_config = FilterEngine.from_config(config)
+    logger.info(f"Running discovery for {len(jobs)} entities with {workers} workers")
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='discovery') as executor:
+        futures = {
+            executor.submit(collect_entity_scenes, kind, entity.name, entity.stashdb_id, stashdb_api, filter_config,
+                            entity_watermark(entity, deep_resync),
+                            tracker.start_page(kind, entity) if tracker else 1): (kind, entity)
+            for kind, entity in jobs
+        }
+        
+        for future in as_completed(futures):
+            kind, entity = futures[future]
             try:
-                performer_name = performer.name
-                search_scenes = stashdb_api.search_scene(performer_name)
-                logger.info(f"Fallback search found {len(search_scenes)} scenes for {performer.name}")
-                
-                for scene_data in search_scenes[:100]:  # Limit fallback to 100 scenes
-                    try:
-                        scene_results = process_scene(scene_data, stash_api, config, performer_id=performer.id)
-                        results['new_scenes'] += scene_results['new_scenes']
-                        results['filtered_scenes'] += scene_results['filtered_scenes']
-                    except Exception as e:
-                        logger.error(f"Error processing fallback scene: {str(e)}")
-                        continue
-                        
+                collected = future.result()
+                entity_results = apply_collected_scenes(kind, entity, collected, ownership, config, seen, tracker)
+                record_entity_results(kind, entity, entity_results, collected['seconds'], results)
+                if tracker:
+                    tracker.entity_done(kind, entity)
             except Exception as e:
-                logger.error(f"Fallback search also failed for {performer.name}: {str(e)}")
-    
-    except Exception as e:
-        logger.error(f"Error processing performer {performer.name}: {str(e)}")
+                error_msg = f"Error processing {kind} {entity.name}: {str(e)}"
+                logger.error(error_msg)
+                results['errors'].append(error_msg)
+
+def record_entity_results(kind: str, entity, entity_results: Dict, seconds: float, results: Dict):
+    """Fold one entity's counts and wall time into the run results"""
+    results['new_scenes'] += entity_results['new_scenes']
+    results['filtered_scenes'] += entity_results['filtered_scenes']
+    results['pages_fetched'] += entity_results.get('pages', 0)
+    for page_write in entity_results.get('page_writes', []):
+        results['page_writes'].append(dict(page_write, type=kind, name=entity.name))
+    results['entity_timings'].append({
+        'type': kind,
+        'name': entity.name,
+        'seconds': round(seconds, 3),
+        'pages': entity_results.get('pages', 0),
+        'new_scenes': entity_results['new_scenes'],
+        'filtered_scenes': entity_results['filtered_scenes']
+    })
+    
+    # Update last checked time
+    entity.last_checked = datetime.utcnow()
+    
+    logger.info(f"Processed {entity.name}: {entity_results['new_scenes']} new, {entity_results['filtered_scenes']} filtered ({seconds:.1f}s)")
+
+def resolve_stashdb_id(kind: str, name: str, stashdb_api: StashDBAPI) -> Optional[str]:
+    """Find the StashDB ID for a performer or studio by exact (case-insensitive) name match"""
+    if kind == 'performer':
+        candidates = stashdb_api.search_performer(name)
+    else:
+        candidates = stashdb_api.search_studio(name)
+    
+    for candidate in candidates or []:
+        if candidate['name'].lower() == name.lower():
+            return candidate['id']
+    return None
+
+def resolve_missing_stashdb_ids(jobs: List[Tuple[str, object]], stashdb_api: StashDBAPI) -> int:
+    """Link entities that have no StashDB ID yet using batched name searches.
+    
+    Entities still unmatched afterwards (no exact name match or a failed lookup) are left for
+    the per-entity search in collect_entity_scenes.
+    """
+    resolved = 0
+    for kind in ('performer', 'studio'):
+        entities = [entity for entity_kind, entity in jobs if entity_kind == kind and not entity.stashdb_id]
+        if not entities:
+            continue
+        
+        if kind == 'performer':
+            lookup = stashdb_api.search_performers([entity.name for entity in entities])
+        else:
+            lookup = stashdb_api.search_studios([entity.name for entity in entities])
+        
+        for entity in entities:
+            for candidate in lookup['results'].get(entity.name) or []:
+                if candidate['name'].lower() == entity.name.lower():
+                    entity.stashdb_id = candidate['id']
+                    resolved += 1
+                    break
     
-    return results
+    if resolved:
+        logger.info(f"Resolved {resolved} missing StashDB IDs in batch")
+    return resolved
 
-def process_studio_scenes(studio: Studio, stashdb_api: StashDBAPI, stash_api: StashAPI, config: Config) -> Dict:
-    """Process ALL scenes for a specific studio, then filter locally"""
-    logger.info(f"Getting ALL scenes for studio: {studio.name}")
+def entity_watermark(entity, deep_resync: bool = False) -> Optional[Tuple[date, str]]:
+    """(release date, scene id) an incremental crawl can stop at, or None for a full walk"""
+    if deep_resync or not entity.latest_release_date:
+        return None
     
-    results = {'new_scenes': 0, 'filtered_scenes': 0}
+    # Periodically walk everything to pick up back-dated or re-tagged scenes
+    resync_days = get_deep_resync_days()
+    if resync_days and (not entity.last_full_sync or
+                        entity.last_full_sync < datetime.utcnow() - timedelta(days=resync_days)):
+        return None
     
-    try:
-        # Find studio in StashDB if not already linked
-        if not studio.stashdb_id:
-            stashdb_studios = stashdb_api.search_studio(studio.name)
-            if stashdb_studios:
-                # Try to match by name
-                for ss in stashdb_studios:
-                    if ss['name'].lower() == studio.name.lower():
-                        studio.stashdb_id = ss['id']
-                        break
-        
-        if not studio.stashdb_id:
-            logger.warning(f"Could not find StashDB ID for studio: {studio.name}")
-            return results
-        
-        # Get ALL scenes for this studio from StashDB - comprehensive approach
-        try:
-            max_pages = 50  # Studios can have many scenes - get up to 2500 scenes
-            all_scenes_processed = 0
+    return entity.latest_release_date, entity.latest_scene_id
+
+def is_newer_than_watermark(scene_data: Dict, watermark: Tuple[date, str]) -> bool:
+    """True if a scene was released after the watermark (same-day scenes count unless it is the mark itself)"""
+    scene_date = parse_date(scene_data.get('date'))
+    if not scene_date:
+        return False
+    watermark_date, watermark_scene_id = watermark
+    if scene_date > watermark_date:
+        return True
+    return scene_date == watermark_date and scene_data.get('id') != watermark_scene_id
+
+def reached_watermark(scenes: List[Dict], watermark: Optional[Tuple[date, str]]) -> bool:
+    """True if a page holds nothing newer than the watermark, so later pages cannot either"""
+    return bool(watermark) and not any(is_newer_than_watermark(scene, watermark) for scene in scenes)
+
+def newest_scene_mark(pages: List[List]) -> Optional[Tuple[date, str]]:
+    """Latest (release date, scene id) among collected pages"""
+    newest = None
+    for page in pages:
+        for scene_data, _ in page:
+            scene_date = parse_date(scene_data.get('date'))
+            if scene_date and (newest is None or scene_date > newest[0]):
+                newest = (scene_date, scene_data.get('id'))
+    return newest
+
+def iter_entity_scene_pages(kind: str, stashdb_id: str, name: str, stashdb_api: StashDBAPI,
+                            watermark: Tuple[date, str] = None, progress: Dict = None, start_page: int = 1):
+    """Yield (page_num, scenes) for a performer or studio, newest first.
+    
+    With a watermark, paging stops after the first page that holds nothing newer than it.
+    start_page > 1 continues a crawl whose earlier pages were already stored.
+    progress['complete'] is set once the crawl ends normally rather than on a fetch error.
+    """
+    if progress is None:
+        progress = {}
+    progress['complete'] = False
+    
+    if kind == 'performer':
+        fetch_page = stashdb_api.get_performer_scenes
+    else:
+        fetch_page = stashdb_api.get_studio_scenes
+    
+    # Page N+1 (and further, up to PREFETCH_DEPTH) downloads while page N is filtered and stored.
+    # The fetcher stops on the same conditions as the loop below, so an up-to-date entity costs one request.
+    pager = PrefetchingPager(
+        lambda page_num: fetch_page(stashdb_id, page=page_num).get('scenes', []),
+        is_last=lambda page_num, scenes: len(scenes) < SCENES_PER_PAGE or reached_watermark(scenes, watermark),
+        start=start_page,
+        max_pages=max(1, MAX_PAGES[kind] - start_page + 1),
+        name=f'{kind}-{stashdb_id}'
+    )
+    
+    with pager:
+        pages = iter(pager)
+        while True:
+            try:
+                page_num, scenes = next(pages)
+            except StopIteration:
+                break
+            except Exception as e:
+                logger.error(f"Error fetching scenes for {kind} {name}: {str(e)}")
+                return
             
-            for page_num in range(1, max_pages + 1):
-                try:
-                    scenes_result = stashdb_api.get_studio_scenes(studio.stashdb_id, page=page_num)
-                    scenes = scenes_result.get('scenes', [])
-                    
-                    if not scenes:
-                        logger.info(f"No more scenes found for {studio.name} on page {page_num}")
-                        break
-                    
-                    logger.info(f"Processing {len(scenes)} scenes for {studio.name} (page {page_num})")
-                    
-                    for scene_data in scenes:
-                        try:
-                            # Process each scene - this handles deduplication and filtering
-                            scene_results = process_scene(scene_data, stash_api, config, studio_id=studio.id)
-                            results['new_scenes'] += scene_results['new_scenes']
-                            results['filtered_scenes'] += scene_results['filtered_scenes']
-                            all_scenes_processed += 1
-                        except Exception as e:
-                            logger.error(f"Error processing scene for {studio.name}: {str(e)}")
-                            continue
-                    
-                    # If we got fewer scenes than requested, we've reached the end
-                    if len(scenes) < 50:
-                        logger.info(f"Reached end of scenes for {studio.name} (got {len(scenes)} on page {page_num})")
-                        break
-                        
-                except Exception as e:
-                    logger.error(f"Error fetching page {page_num} for studio {studio.name}: {str(e)}")
-                    break
+            if not scenes:
+                logger.info(f"No more scenes found for {name} on page {page_num}")
+                break
             
-            logger.info(f"Processed {all_scenes_processed} total scenes for studio {studio.name}")
+            logger.info(f"Processing {len(scenes)} scenes for {name} (page {page_num})")
+            yield page_num, scenes
             
-        except Exception as e:
-            logger.warning(f"Could not fetch scenes for studio {studio.name}: {str(e)}")
-            # Fallback: try search-based discovery
+            # If we got fewer scenes than requested, we've reached the end
+            if len(scenes) < SCENES_PER_PAGE:
+                logger.info(f"Reached end of scenes for {name} (got {len(scenes)} on page {page_num})")
+                break
+            
+            # Results are sorted by date, so nothing past this page is new either
+            if reached_watermark(scenes, watermark):
+                logger.info(f"Reached watermark for {name} on page {page_num} ({watermark[0]})")
+                break
+    
+    progress['complete'] = True
+
+def fallback_entity_scenes(kind: str, name: str, stashdb_api: StashDBAPI) -> List[Dict]:
+    """Search-based discovery used when paging through an entity's scenes fails"""
+    search_scenes = stashdb_api.search_scene(name)
+    logger.info(f"Fallback search found {len(search_scenes)} scenes for {name}")
+    
+    if kind == 'performer':
+        return search_scenes[:100]  # Limit fallback to 100 scenes
+    
+    # Filter scenes to only include those actually from this studio
+    studio_scenes = []
+    for scene in search_scenes:
+        scene_studio = scene.get('studio', {})
+        if scene_studio and scene_studio.get('name', '').lower() == name.lower():
+            studio_scenes.append(scene)
+    return studio_scenes[:200]  # Limit fallback to 200 scenes
+
+def collect_entity_scenes(kind: str, name: str, stashdb_id: Optional[str], stashdb_api: StashDBAPI, config: Config,
+                          watermark: Tuple[date, str] = None, start_page: int = 1) -> Dict:
+    """Fetch and filter every scene for one entity without touching the database.
+    
+    Returns the (possibly newly resolved) StashDB ID and a list of pages, each page a list of
+    (scene_data, (is_filtered, filter_reason)) tuples ready for the writer. 'complete' is only
+    True when paging finished cleanly, which is what allows the writer to move the watermark.
+    config may already be a compiled FilterEngine.
+    """
+    started = time.monotonic()
+    collected = {'stashdb_id': stashdb_id, 'pages': [], 'first_page': start_page, 'complete': False,
+                 'full_walk': watermark is None}
+    filters = FilterEngine.from_config(config)
+    
+    try:
+        # Find entity in StashDB if not already linked
+        if not stashdb_id:
+            stashdb_id = resolve_stashdb_id(kind, name, stashdb_api)
+            collected['stashdb_id'] = stashdb_id
+        
+        if not stashdb_id:
+            logger.warning(f"Could not find StashDB ID for {kind}: {name}")
+        else:
+            if watermark:
+                logger.info(f"Getting new scenes for {kind}: {name} (since {watermark[0]})")
+            else:
+                logger.info(f"Getting ALL scenes for {kind}: {name}")
             try:
-                studio_name = studio.name
-                search_scenes = stashdb_api.search_scene(studio_name)
-                logger.info(f"Fallback search found {len(search_scenes)} scenes for {studio.name}")
-                
-                # Filter scenes to only include those actually from this studio
-                studio_scenes = []
-                for scene in search_scenes:
-                    scene_studio = scene.get('studio', {})
-                    if scene_studio and scene_studio.get('name', '').lower() == studio_name.lower():
-                        studio_scenes.append(scene)
-                
-                for scene_data in studio_scenes[:200]:  # Limit fallback to 200 scenes
-                    try:
-                        scene_results = process_scene(scene_data, stash_api, config, studio_id=studio.id)
-                        results['new_scenes'] += scene_results['new_scenes']
-                        results['filtered_scenes'] += scene_results['filtered_scenes']
-                    except Exception as e:
-                        logger.error(f"Error processing fallback scene: {str(e)}")
-                        continue
-                        
+                progress = {}
+                for page_num, scenes in iter_entity_scene_pages(kind, stashdb_id, name, stashdb_api, watermark, progress,
+                                                                start_page):
+                    collected['pages'].append([(scene, filters.apply(scene)) for scene in scenes])
+                collected['complete'] = progress['complete']
             except Exception as e:
-                logger.error(f"Fallback search also failed for {studio.name}: {str(e)}")
+                logger.warning(f"Could not fetch scenes for {kind} {name}: {str(e)}")
+                # Fallback: try search-based discovery
+                try:
+                    scenes = fallback_entity_scenes(kind, name, stashdb_api)
+                    collected['pages'].append([(scene, filters.apply(scene)) for scene in scenes])
+                except Exception as e:
+                    logger.error(f"Fallback search also failed for {name}: {str(e)}")
     
     except Exception as e:
-        logger.error(f"Error processing studio {studio.name}: {str(e)}")
+        logger.error(f"Error collecting scenes for {kind} {name}: {str(e)}")
     
-    return results
+    collected['seconds'] = time.monotonic() - started
+    return collected
 
-def process_scene(scene_data: Dict, stash_api: StashAPI, config: Config, performer_id: int = None, studio_id: int = None) -> Dict:
-    """Process a single scene from StashDB with proper deduplication"""
-    results = {'new_scenes': 0, 'filtered_scenes': 0}
+def apply_collected_scenes(kind: str, entity, collected: Dict, ownership: OwnedLibraryIndex, config: Config,
+                           seen: 'SeenScenes' = None, tracker: DiscoveryRunTracker = None) -> Dict:
+    """Write one entity's collected scenes to the database (single-writer side)"""
+    results = {'new_scenes': 0, 'filtered_scenes': 0, 'pages': len(collected['pages'])}
     
-    scene_id = scene_data.get('id')
-    title = scene_data.get('title', 'Unknown Title')
+    if collected['stashdb_id'] and not entity.stashdb_id:
+        entity.stashdb_id = collected['stashdb_id']
     
-    # Check if scene already exists in our database
-    existing_scene = Scene.query.filter_by(stashdb_id=scene_id).first()
+    association = {'performer_id': entity.id} if kind == 'performer' else {'studio_id': entity.id}
+    all_scenes_processed = 0
+    results['page_writes'] = []
     
-    if existing_scene:
-        # Scene exists, but we might need to update associations
-        updated = False
-        
-        # Update performer association if not already set
-        if performer_id and not existing_scene.performer_id:
-            existing_scene.performer_id = performer_id
-            updated = True
-            logger.debug(f"Added performer association to existing scene: {title}")
-        
-        # Update studio association if not already set
-        if studio_id and not existing_scene.studio_id:
-            existing_scene.studio_id = studio_id
-            updated = True
-            logger.debug(f"Added studio association to existing scene: {title}")
-        
-        # Update last_updated if we made changes
-        if updated:
-            existing_scene.last_updated = datetime.utcnow()
-        
-        return results  # Don't count as new scene
-    
-    # Check if scene exists in Stash (already owned)
-    is_owned = stash_api.check_scene_exists(scene_id)
-    
-    # Apply filters
-    is_filtered, filter_reason = apply_filters(scene_data, config)
-    
-    # Create new scene record
-    scene = Scene(
-        stashdb_id=scene_id,
-        title=title,
-        release_date=parse_date(scene_data.get('date')),
-        duration=scene_data.get('duration'),
-        performer_id=performer_id,
-        studio_id=studio_id,
-        is_owned=is_owned,
-        is_filtered=is_filtered,
-        filter_reason=filter_reason
-    )
+    for page_num, page in enumerate(collected['pages'], start=collected.get('first_page', 1)):
+        try:
+            # One lookup and one insert per page - this handles deduplication and filtering
+            page_results = apply_scene_page(page, ownership, seen=seen, **association)
+        except Exception as e:
+            logger.error(f"Error writing page {page_num} for {entity.name}: {str(e)}")
+            continue
+        
+        results['new_scenes'] += page_results['new_scenes']
+        results['filtered_scenes'] += page_results['filtered_scenes']
+        all_scenes_processed += len(page)
+        if tracker:
+            tracker.page_written(kind, entity, page_num)
+        if page_results['inserted'] or page_results['associations_updated']:
+            results['page_writes'].append({
+                'page': page_num,
+                'inserted': page_results['inserted'],
+                'associations_updated': page_results['associations_updated'],
+                'seconds': page_results['seconds']
+            })
+    
+    if collected['stashdb_id']:
+        logger.info(f"Processed {all_scenes_processed} total scenes for {kind} {entity.name}")
+    
+    if collected.get('complete'):
+        advance_watermark(entity, collected)
     
-    # Set tags and categories
-    tags = scene_data.get('tags', [])
-    scene.set_tags([tag['name'] for tag in tags])
-    scene.set_categories([tag['category'] for tag in tags if tag.get('category')])
+    return results
+
+def advance_watermark(entity, collected: Dict):
+    """Move an entity's watermark forward after a clean crawl"""
+    newest = newest_scene_mark(collected['pages'])
+    if newest and (not entity.latest_release_date or newest[0] >= entity.latest_release_date):
+        entity.latest_release_date, entity.latest_scene_id = newest
+    
+    if collected.get('full_walk'):
+        entity.last_full_sync = datetime.utcnow()
+
+def needs_entity_crawl(entity, deep_resync: bool = False) -> bool:
+    """True if an entity's catalogue must be walked directly rather than relying on the feed"""
+    if deep_resync or not entity.last_full_sync:
+        return True
+    resync_days = get_deep_resync_days()
+    return bool(resync_days) and entity.last_full_sync < datetime.utcnow() - timedelta(days=resync_days)
+
+def get_feed_max_pages() -> int:
+    try:
+        return max(1, int(os.environ.get('DISCOVERY_FEED_MAX_PAGES', '50')))
+    except ValueError:
+        return 50
+
+def run_feed_discovery(jobs: List[Tuple[str, object]], stashdb_api: StashDBAPI, ownership: OwnedLibraryIndex,
+                       config: Config, results: Dict, seen: 'SeenScenes' = None) -> Dict:
+    """Read StashDB's newest-first scene stream down to the stored cursor and keep monitored scenes.
+    
+    Every scene is matched against in-memory maps of the monitored performers' and studios'
+    StashDB IDs (a studio also matches its sub-studios' scenes, as the studio crawl does), so
+    it is filtered and written once however many favorites it features. Raises if the feed
+    can't be read; pages already written are kept and the cursor stays where it was. The
+    cursor also stays put when DISCOVERY_FEED_MAX_PAGES ends the crawl before reaching it,
+    so the next run reads down to it again instead of skipping the unread scenes.
+    """
+    started = time.monotonic()
+    feed = {'pages': 0, 'scenes_seen': 0, 'matched': 0, 'new_scenes': 0, 'filtered_scenes': 0,
+            'entities': len(jobs), 'complete': False}
+    
+    filters = FilterEngine.from_config(config)
+    performers = {entity.stashdb_id: entity for kind, entity in jobs if kind == 'performer'}
+    studios = {entity.stashdb_id: entity for kind, entity in jobs if kind == 'studio'}
+    matched_scenes = {id(entity): [] for _, entity in jobs}
+    
+    cursor = DiscoveryCursor.query.filter_by(name=FEED_CURSOR_NAME).first()
+    if cursor and cursor.created_at:
+        since, since_scene_id = cursor.created_at, cursor.scene_id
+    else:
+        # First feed run: pick up where the entities' own crawls left off
+        since = min((entity.last_checked or entity.last_full_sync for _, entity in jobs), default=None)
+        since_scene_id = None
+        since = since or datetime.utcnow() - timedelta(days=1)
+    feed['since'] = since.isoformat()
+    logger.info(f"Reading StashDB scene feed back to {since} for {len(performers)} performers and {len(studios)} studios")
+    
+    newest = None
+    truncated = False
+    for page_num in range(1, get_feed_max_pages() + 1):
+        scenes = stashdb_api.get_scene_feed(page=page_num, limit=FEED_PAGE_SIZE).get('scenes', [])
+        feed['pages'] += 1
+        feed['scenes_seen'] += len(scenes)
+        
+        reached_cursor = False
+        groups = {}
+        for scene in scenes:
+            created = parse_stash_timestamp(scene.get('created'))
+            if created and (newest is None or created > newest[0]):
+                newest = (created, scene.get('id'))
+            if created and (created < since or (created == since and scene.get('id') == since_scene_id)):
+                reached_cursor = True
+                continue
+            
+            performer, studio = match_feed_scene(scene, performers, studios)
+            if not performer and not studio:
+                continue
+            
+            feed['matched'] += 1
+            for entity in (performer, studio):
+                if entity:
+                    matched_scenes[id(entity)].append(scene)
+            association = (performer.id if performer else None, studio.id if studio else None)
+            groups.setdefault(association, []).append((scene, filters.apply(scene)))
+        
+        # One set-based write per distinct performer/studio association on this page
+        for (performer_id, studio_id), page in groups.items():
+            page_results = apply_scene_page(page, ownership, performer_id=performer_id, studio_id=studio_id, seen=seen)
+            feed['new_scenes'] += page_results['new_scenes']
+            feed['filtered_scenes'] += page_results['filtered_scenes']
+        
+        if reached_cursor or len(scenes) < FEED_PAGE_SIZE:
+            break
+    else:
+        truncated = True
+        logger.warning(f"Feed crawl stopped after {feed['pages']} pages before reaching {since}; "
+                       f"keeping the cursor there so the next run reads the rest")
+    
+    if truncated:
+        # Scenes between the last page read and the cursor are still unread
+        mark = (since, since_scene_id)
+    else:
+        feed['complete'] = True
+        now = datetime.utcnow()
+        for kind, entity in jobs:
+            entity.last_checked = now
+            if matched_scenes[id(entity)]:
+                advance_watermark(entity, {'pages': [[(scene, None) for scene in matched_scenes[id(entity)]]]})
+        mark = newest
+    
+    if mark:
+        if not cursor:
+            cursor = DiscoveryCursor(name=FEED_CURSOR_NAME)
+            db.session.add(cursor)
+        cursor.created_at, cursor.scene_id = mark
+        feed['cursor'] = mark[0].isoformat()
+    
+    results['new_scenes'] += feed['new_scenes']
+    results['filtered_scenes'] += feed['filtered_scenes']
+    results['pages_fetched'] += feed['pages']
+    feed['seconds'] = round(time.monotonic() - started, 3)
+    logger.info(f"Feed discovery: {feed['scenes_seen']} scenes read, {feed['matched']} matched, {feed['new_scenes']} new in {feed['seconds']}s")
+    return feed
+
+def match_feed_scene(scene: Dict, performers: Dict, studios: Dict) -> Tuple[Optional[object], Optional[object]]:
+    """(first monitored performer, monitored studio) featured in a feed scene, either may be None"""
+    performer = None
+    for entry in scene.get('performers') or []:
+        performer = performers.get((entry.get('performer') or {}).get('id'))
+        if performer:
+            break
+    
+    studio = None
+    scene_studio = scene.get('studio') or {}
+    if scene_studio:
+        studio = studios.get(scene_studio.get('id')) or studios.get((scene_studio.get('parent') or {}).get('id'))
+    
+    return performer, studio
+
+def process_entity_scenes(kind: str, entity, stashdb_api: StashDBAPI, ownership: OwnedLibraryIndex, config: Config,
+                          deep_resync: bool = False, seen: 'SeenScenes' = None,
+                          tracker: DiscoveryRunTracker = None) -> Dict:
+    """Process an entity's scenes (new ones only, when it has a watermark), then filter locally"""
+    collected = collect_entity_scenes(kind, entity.name, entity.stashdb_id, stashdb_api, config,
+                                      entity_watermark(entity, deep_resync),
+                                      tracker.start_page(kind, entity) if tracker else 1)
+    return apply_collected_scenes(kind, entity, collected, ownership, config, seen, tracker)
+
+def apply_scene_page(page: List[Tuple[Dict, Tuple[bool, str]]], ownership: OwnedLibraryIndex,
+                     performer_id: int = None, studio_id: int = None, seen: 'SeenScenes' = None) -> Dict:
+    """Deduplicate and store one page of filtered StashDB scenes with set-based statements.
+    
+    Known scenes are found with a single IN (...) query and get their missing performer/studio
+    association in one UPDATE; new scenes and their WantedScene rows are each written with one
+    executemany INSERT. A freshly inserted scene cannot already be wanted, so no per-scene
+    WantedScene lookup is needed.
+    
+    With a run-scoped SeenScenes, scenes already evaluated earlier in the run are skipped and
+    association updates are queued on it instead of written per page.
+    """
+    started = time.perf_counter()
+    results = {'new_scenes': 0, 'filtered_scenes': 0, 'inserted': 0, 'associations_updated': 0,
+               'redundant_skipped': 0, 'wanted_ids': []}
+    
+    # Collapse repeats within the page, keeping StashDB's order
+    entries = {}
+    for scene_data, filter_result in page:
+        if scene_data.get('id'):
+            entries.setdefault(scene_data['id'], (scene_data, filter_result))
+    
+    claimed = set()
+    if seen is not None and entries:
+        claimed = seen.claim(entries)
+        repeats = set(entries) - claimed
+        if repeats:
+            seen.repeat(repeats, performer_id, studio_id)
+            results['redundant_skipped'] = len(repeats)
+            entries = {scene_id: entry for scene_id, entry in entries.items() if scene_id not in repeats}
+    
+    if not entries:
+        results['seconds'] = 0.0
+        return results
     
     try:
-        db.session.add(scene)
-        db.session.flush()  # Get the scene.id before committing
-        
-        if is_filtered:
-            results['filtered_scenes'] += 1
-            logger.debug(f"Filtered scene: {title} - {filter_reason}")
-        elif not is_owned:
-            # Check if a WantedScene already exists for this StashDB ID
-            existing_wanted = WantedScene.query.join(Scene).filter(
-                Scene.stashdb_id == scene_id
-            ).first()
+        existing_ids = {
+            row.stashdb_id for row in
+            db.session.query(Scene.stashdb_id).filter(Scene.stashdb_id.in_(list(entries))).all()
+        }
+        
+        # Scene exists, but we might need to update associations
+        if existing_ids and seen is not None:
+            seen.link(existing_ids, performer_id, studio_id)
+        elif existing_ids:
+            results['associations_updated'] = update_scene_associations(existing_ids, performer_id, studio_id)
+        
+        new_rows = []
+        wanted_meta = {}
+        for scene_id, (scene_data, (is_filtered, filter_reason)) in entries.items():
+            if scene_id in existing_ids:
+                continue
             
-            if not existing_wanted:
-                # Add to wanted list if not filtered, not owned, and not already wanted
-                wanted_scene = WantedScene(
-                    scene_id=scene.id,
-                    title=title,
-                    performer_name=get_performer_name_from_scene(scene_data),
-                    studio_name=get_studio_name_from_scene(scene_data),
-                    release_date=scene.release_date,
-                    status='wanted'
-                )
-                db.session.add(wanted_scene)
-                scene.is_wanted = True
-                results['new_scenes'] += 1
-                logger.info(f"Added new wanted scene: {title}")
-            else:
-                logger.debug(f"Scene already in wanted list: {title}")
-                scene.is_wanted = True
+            # Check if scene exists in Stash (already owned)
+            is_owned = ownership.is_owned(scene_id)
+            is_wanted = not is_filtered and not is_owned
+            title = scene_data.get('title', 'Unknown Title')
+            tags = scene_data.get('tags') or []
+            tag_names = [tag['name'] for tag in tags]
+            categories = [tag['category'] for tag in tags if tag.get('category')]
+            
+            new_rows.append({
+                'stashdb_id': scene_id,
+                'title': title,
+                'release_date': parse_date(scene_data.get('date')),
+                'duration': scene_data.get('duration'),
+                'tags': json.dumps(tag_names) if tag_names else None,
+                'categories': json.dumps(categories) if categories else None,
+                'performer_id': performer_id,
+                'studio_id': studio_id,
+                'is_owned': is_owned,
+                'is_wanted': is_wanted,
+                'is_filtered': is_filtered,
+                'filter_reason': filter_reason
+            })
+            
+            if is_filtered:
+                results['filtered_scenes'] += 1
+                logger.debug(f"Filtered scene: {title} - {filter_reason}")
+            elif is_wanted:
+                wanted_meta[scene_id] = scene_data
         
-    except Exception as e:
-        logger.error(f"Error adding scene {title}: {str(e)}")
-        db.session.rollback()
+        if new_rows:
+            db.session.execute(Scene.__table__.insert(), new_rows)
+            results['inserted'] = len(new_rows)
+            inserted_ids = dict(
+                db.session.query(Scene.stashdb_id, Scene.id).filter(
+                    Scene.stashdb_id.in_([row['stashdb_id'] for row in new_rows])
+                ).all()
+            )
+            store_scene_tags({inserted_ids[row['stashdb_id']]: entries[row['stashdb_id']][0].get('tags')
+                              for row in new_rows})
+        
+        if wanted_meta:
+            # Add to wanted list if not filtered and not owned
+            wanted_rows = []
+            for scene_id, scene_data in wanted_meta.items():
+                wanted_rows.append({
+                    'scene_id': inserted_ids[scene_id],
+                    'title': scene_data.get('title', 'Unknown Title'),
+                    'performer_name': get_performer_name_from_scene(scene_data),
+                    'studio_name': get_studio_name_from_scene(scene_data),
+                    'release_date': parse_date(scene_data.get('date')),
+                    'status': 'wanted'
+                })
+            db.session.execute(WantedScene.__table__.insert(), wanted_rows)
+            results['new_scenes'] = len(wanted_rows)
+            logger.info(f"Added {len(wanted_rows)} new wanted scenes")
+    
+    except Exception:
+        # Let a later sighting evaluate these scenes again instead of skipping them as repeats
+        if claimed:
+            seen.release(claimed)
         raise
     
+    results['wanted_ids'] = list(wanted_meta)
+    results['seconds'] = round(time.perf_counter() - started, 4)
+    logger.debug(f"Page write: {results['inserted']} inserted, {results['associations_updated']} associations updated in {results['seconds']}s")
     return results
 
-def apply_filters(scene_data: Dict, config: Config) -> Tuple[bool, str]:
-    """Apply category and duration filters to a scene"""
-    
-    # Get scene tags/categories
-    tags = scene_data.get('tags', [])
-    categories = [tag.get('category', '').lower() for tag in tags if tag.get('category')]
-    tag_names = [tag.get('name', '').lower() for tag in tags]
-    
-    # Debug logging
-    scene_title = scene_data.get('title', 'Unknown')
-    unwanted_categories = [cat.lower() for cat in config.get_unwanted_categories()]
-    
-    logger.info(f"DEBUG - Scene: {scene_title}")
-    logger.info(f"DEBUG - Tags from StashDB: {tag_names[:5]}...")  # First 5 tags
-    logger.info(f"DEBUG - Categories from StashDB: {categories}")
-    logger.info(f"DEBUG - Unwanted categories configured: {unwanted_categories}")
-    
-    # Check unwanted categories
-    for unwanted in unwanted_categories:
-        if unwanted in categories or unwanted in tag_names:
-            logger.info(f"FILTERED - Scene '{scene_title}' contains unwanted category/tag: {unwanted}")
-            return True, f"Contains unwanted category: {unwanted}"
-    
-    # Check required categories
-    required_categories = [cat.lower() for cat in config.get_required_categories()]
-    if required_categories:
-        has_required = False
-        for required in required_categories:
-            if required in categories or required in tag_names:
-                has_required = True
-                break
-        
-        if not has_required:
-            return True, f"Missing required categories: {', '.join(required_categories)}"
-    
-    # Check duration filters
-    duration = scene_data.get('duration')
-    if duration:
-        duration_minutes = duration / 60
-        
-        if config.min_duration_minutes > 0 and duration_minutes < config.min_duration_minutes:
-            return True, f"Duration too short: {duration_minutes:.1f} min < {config.min_duration_minutes} min"
-        
-        if config.max_duration_minutes > 0 and duration_minutes > config.max_duration_minutes:
-            return True, f"Duration too long: {duration_minutes:.1f} min > {config.max_duration_minutes} min"
+def update_scene_associations(stashdb_ids, performer_id: int = None, studio_id: int = None) -> int:
+    """Fill in missing performer/studio links on known scenes with one UPDATE per column"""
+    updated = 0
+    now = datetime.utcnow()
+    for column, value in ((Scene.performer_id, performer_id), (Scene.studio_id, studio_id)):
+        if not value:
+            continue
+        updated += db.session.query(Scene).filter(
+            Scene.stashdb_id.in_(list(stashdb_ids)),
+            column.is_(None)
+        ).update({column: value, Scene.last_updated: now}, synchronize_session=False)
+    return updated
+
+class SeenScenes:
+    """StashDB scenes already evaluated during one discovery run, keyed by scene id.
+    
+    The same scene turns up under each favorite performer in it and under its studio. Only the
+    first sighting is looked up, checked for ownership and written; later ones just queue their
+    performer/studio link, and flush() writes the queued links once at the end of the run.
+    Safe to share between pipeline threads; links are only queued by the single writer.
+    """
+    
+    def __init__(self):
+        self._seen = set()
+        self._links = {'performer_id': {}, 'studio_id': {}}
+        self._lock = threading.Lock()
+        self.redundant_skipped = 0
+        self.associations_updated = 0
+    
+    def __contains__(self, scene_id: str) -> bool:
+        with self._lock:
+            return scene_id in self._seen
+    
+    def claim(self, scene_ids) -> set:
+        """Mark scenes as seen; returns the ones not seen before"""
+        with self._lock:
+            fresh = set(scene_ids) - self._seen
+            self._seen.update(fresh)
+            return fresh
+    
+    def release(self, scene_ids):
+        """Forget scenes whose write failed, so they are not skipped as repeats"""
+        with self._lock:
+            self._seen.difference_update(scene_ids)
+    
+    def link(self, scene_ids, performer_id: int = None, studio_id: int = None):
+        """Queue associations for known scenes; the first performer/studio seen for a scene wins"""
+        for column, value in (('performer_id', performer_id), ('studio_id', studio_id)):
+            if value:
+                for scene_id in scene_ids:
+                    self._links[column].setdefault(scene_id, value)
+    
+    def repeat(self, scene_ids, performer_id: int = None, studio_id: int = None):
+        """Record repeat sightings that were skipped instead of evaluated again"""
+        self.link(scene_ids, performer_id, studio_id)
+        with self._lock:
+            self.redundant_skipped += len(scene_ids)
+    
+    def flush(self) -> int:
+        """Write queued associations, one UPDATE per performer or studio; returns rows updated"""
+        updated = 0
+        for column, links in self._links.items():
+            by_entity = {}
+            for scene_id, entity_id in links.items():
+                by_entity.setdefault(entity_id, []).append(scene_id)
+            for entity_id, scene_ids in by_entity.items():
+                # Chunked to stay under SQLite's bound-parameter limit
+                for start in range(0, len(scene_ids), 500):
+                    updated += update_scene_associations(scene_ids[start:start + 500], **{column: entity_id})
+            links.clear()
+        self.associations_updated += updated
+        return updated
+
+def apply_filters(scene_data: Dict, config) -> Tuple[bool, str]:
+    """Apply category and duration filters to a scene.
     
-    logger.info(f"PASSED - Scene '{scene_title}' passed all filters")
-    return False, ""
+    config is a Config or, in loops, a FilterEngine compiled from it once.
+    """
+    return FilterEngine.from_config(config).apply(scene_data)
 
 def add_wanted_scenes_to_whisparr(whisparr_api: WhisparrAPI, config: Config) -> Dict:
     """Add wanted scenes to Whisparr using StashDB UUID lookup"""
     results = {'added_count': 0, 'errors': [], 'skipped_count': 0}
     
     # Get scenes that need to be added to Whisparr
-    wanted_scenes = WantedScene.query.filter_by(
-        added_to_whisparr=False,
-        status='wanted'
-    ).limit(50).all()  # Limit to prevent overwhelming Whisparr
+    wanted_scenes = pending_whisparr_scenes(WHISPARR_BATCH_LIMIT)  # Limit to prevent overwhelming Whisparr
     
     logger.info(f"Processing {len(wanted_scenes)} wanted scenes for Whisparr addition")
     
-    for wanted in wanted_scenes:
+    # Download Whisparr's scene list once for the whole batch; adds update it in place
+    if wanted_scenes:
         try:
-            # Get the scene's StashDB UUID
-            scene = wanted.scene
-            if not scene or not scene.stashdb_id:
-                logger.warning(f"No StashDB ID found for scene: {wanted.title}")
-                results['errors'].append(f"No StashDB ID for {wanted.title}")
-                continue
-            
-            stashdb_uuid = scene.stashdb_id
-            logger.info(f"Processing scene: {wanted.title} (StashDB: {stashdb_uuid})")
-            
-            # Check if scene already exists in Whisparr by UUID
-            if whisparr_api.check_scene_exists_by_uuid(stashdb_uuid):
-                logger.info(f"Scene already exists in Whisparr: {wanted.title}")
-                wanted.added_to_whisparr = True
-                wanted.status = 'exists'
-                results['skipped_count'] += 1
-                continue
-            
-            # Add scene to Whisparr using UUID-based method
-            logger.info(f"Adding scene to Whisparr via UUID: {wanted.title}")
-            result = whisparr_api.add_scene_by_uuid(
-                stashdb_uuid=stashdb_uuid,
-                quality_profile_id=config.whisparr_quality_profile_id if hasattr(config, 'whisparr_quality_profile_id') else None,
-                root_folder_path='/data/media/y'  # From your config
-            )
-            
-            if result:
-                wanted.added_to_whisparr = True
-                wanted.whisparr_id = str(result.get('id', ''))
-                wanted.status = 'requested'
-                results['added_count'] += 1
-                logger.info(f"Successfully added scene to Whisparr: {wanted.title} (Whisparr ID: {result.get('id')})")
-            else:
-                error_msg = f"Failed to add {wanted.title} to Whisparr - no result returned"
-                logger.error(error_msg)
-                results['errors'].append(error_msg)
-                
+            whisparr_api.get_catalogue('scene', refresh=True)
         except Exception as e:
-            error_msg = f"Error adding {wanted.title} to Whisparr: {str(e)}"
-            logger.error(error_msg)
-            results['errors'].append(error_msg)
+            logger.warning(f"Could not load Whisparr catalogue: {str(e)}")
+    
+    quality_profile_id = getattr(config, 'whisparr_quality_profile_id', None)
+    for wanted in wanted_scenes:
+        # Get the scene's StashDB UUID
+        scene = wanted.scene
+        if not scene or not scene.stashdb_id:
+            logger.warning(f"No StashDB ID found for scene: {wanted.title}")
+            results['errors'].append(f"No StashDB ID for {wanted.title}")
+            continue
+        
+        outcome = push_scene_to_whisparr(whisparr_api, scene.stashdb_id, wanted.title, quality_profile_id)
+        apply_whisparr_outcome(wanted, outcome, results)
     
     logger.info(f"Whisparr addition completed: {results['added_count']} added, {results['skipped_count']} skipped, {len(results['errors'])} errors")
     return results
 
+def pending_whisparr_scenes(limit: int) -> List[WantedScene]:
+    return WantedScene.query.filter_by(
+        added_to_whisparr=False,
+        status='wanted'
+    ).limit(limit).all()
+
+def push_scene_to_whisparr(whisparr_api: WhisparrAPI, stashdb_uuid: str, title: str,
+                           quality_profile_id: int = None) -> Dict:
+    """Add one scene to Whisparr unless it is already there; touches no database state.
+    
+    Returns an outcome dict with status 'exists', 'requested' or 'error' for apply_whisparr_outcome.
+    """
+    try:
+        logger.info(f"Processing scene: {title} (StashDB: {stashdb_uuid})")
+        
+        # Check if scene already exists in Whisparr by UUID
+        if whisparr_api.check_scene_exists_by_uuid(stashdb_uuid):
+            logger.info(f"Scene already exists in Whisparr: {title}")
+            return {'status': 'exists'}
+        
+        # Add scene to Whisparr using UUID-based method
+        logger.info(f"Adding scene to Whisparr via UUID: {title}")
+        result = whisparr_api.add_scene_by_uuid(
+            stashdb_uuid=stashdb_uuid,
+            quality_profile_id=quality_profile_id,
+            root_folder_path='/data/media/y'  # From your config
+        )
+        
+        if result:
+            logger.info(f"Successfully added scene to Whisparr: {title} (Whisparr ID: {result.get('id')})")
+            return {'status': 'requested', 'whisparr_id': str(result.get('id', ''))}
+        
+        error_msg = f"Failed to add {title} to Whisparr - no result returned"
+        logger.error(error_msg)
+        return {'status': 'error', 'error': error_msg}
+        
+    except Exception as e:
+        error_msg = f"Error adding {title} to Whisparr: {str(e)}"
+        logger.error(error_msg)
+        return {'status': 'error', 'error': error_msg}
+
+def apply_whisparr_outcome(wanted: WantedScene, outcome: Dict, results: Dict):
+    """Record a push_scene_to_whisparr outcome on the WantedScene row and in the run results"""
+    if outcome['status'] == 'exists':
+        wanted.added_to_whisparr = True
+        wanted.status = 'exists'
+        results['skipped_count'] += 1
+    elif outcome['status'] == 'requested':
+        wanted.added_to_whisparr = True
+        wanted.whisparr_id = outcome['whisparr_id']
+        wanted.status = 'requested'
+        results['added_count'] += 1
+    else:
+        results['errors'].append(outcome['error'])
+
 def get_performer_name_from_scene(scene_data: Dict) -> str:
     """Extract main performer name from scene data"""
     performers = scene_data.get('performers', [])
@@ -487,92 +980,23 @@ def get_studio_name_from_scene(scene_data: Dict) -> str:
     studio = scene_data.get('studio', {})
     return studio.get('name', '') if studio else ''
 
-def cleanup_duplicate_scenes() -> Dict:
-    """Remove duplicate scenes and wanted scenes"""
+def cleanup_duplicate_scenes(dry_run: bool = False) -> Dict:
+    """Remove duplicate scenes and wanted scenes (dry_run only reports what would go)"""
     logger.info("Starting duplicate scene cleanup")
     
-    results = {
-        'status': 'success',
-        'removed_scenes': 0,
-        'removed_wanted': 0,
-        'updated_scenes': 0,
-        'errors': []
-    }
-    
     try:
-        # Find duplicate scenes (same stashdb_id)
-        duplicate_groups = db.session.query(
-            Scene.stashdb_id,
-            db.func.count(Scene.id).label('count')
-        ).group_by(Scene.stashdb_id).having(db.func.count(Scene.id) > 1).all()
-        
-        for stashdb_id, count in duplicate_groups:
-            # Get all scenes with this stashdb_id
-            duplicate_scenes = Scene.query.filter_by(stashdb_id=stashdb_id).order_by(Scene.discovered_date.asc()).all()
-            
-            if len(duplicate_scenes) > 1:
-                # Keep the first scene (oldest), merge data into it
-                primary_scene = duplicate_scenes[0]
-                
-                for duplicate in duplicate_scenes[1:]:
-                    try:
-                        # Merge performer and studio associations
-                        if not primary_scene.performer_id and duplicate.performer_id:
-                            primary_scene.performer_id = duplicate.performer_id
-                        
-                        if not primary_scene.studio_id and duplicate.studio_id:
-                            primary_scene.studio_id = duplicate.studio_id
-                        
-                        # Update wanted scenes to point to primary scene
-                        wanted_scenes = WantedScene.query.filter_by(scene_id=duplicate.id).all()
-                        for wanted in wanted_scenes:
-                            # Check if primary scene already has a wanted entry
-                            existing_wanted = WantedScene.query.filter_by(scene_id=primary_scene.id).first()
-                            if not existing_wanted:
-                                wanted.scene_id = primary_scene.id
-                            else:
-                                db.session.delete(wanted)
-                                results['removed_wanted'] += 1
-                        
-                        # Delete the duplicate scene
-                        db.session.delete(duplicate)
-                        results['removed_scenes'] += 1
-                        logger.info(f"Removed duplicate scene: {duplicate.title}")
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing duplicate scene {duplicate.title}: {str(e)}")
-                        results['errors'].append(f"Error processing duplicate {duplicate.title}: {str(e)}")
-                
-                # Update the primary scene
-                primary_scene.last_updated = datetime.utcnow()
-                results['updated_scenes'] += 1
-        
-        # Find and remove duplicate wanted scenes (same scene_id)
-        duplicate_wanted_groups = db.session.query(
-            WantedScene.scene_id,
-            db.func.count(WantedScene.id).label('count')
-        ).group_by(WantedScene.scene_id).having(db.func.count(WantedScene.id) > 1).all()
-        
-        for scene_id, count in duplicate_wanted_groups:
-            duplicate_wanted = WantedScene.query.filter_by(scene_id=scene_id).order_by(WantedScene.added_date.asc()).all()
-            
-            if len(duplicate_wanted) > 1:
-                # Keep the first wanted entry, remove the rest
-                for wanted in duplicate_wanted[1:]:
-                    db.session.delete(wanted)
-                    results['removed_wanted'] += 1
-                    logger.info(f"Removed duplicate wanted scene: {wanted.title}")
-        
-        db.session.commit()
-        
-        logger.info(f"Cleanup completed: {results['removed_scenes']} scenes, {results['removed_wanted']} wanted scenes removed")
-        
+        results = consolidate_duplicate_scenes(dry_run=dry_run)
+        results.update(status='success', errors=[])
     except Exception as e:
-        db.session.rollback()
         error_msg = f"Cleanup failed: {str(e)}"
         logger.error(error_msg)
-        results['status'] = 'error'
-        results['errors'].append(error_msg)
+        results = {
+            'status': 'error',
+            'removed_scenes': 0,
+            'removed_wanted': 0,
+            'updated_scenes': 0,
+            'errors': [error_msg]
+        }
     
     return results
 
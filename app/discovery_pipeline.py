@@ -0,0 +1,512 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .discovery_runs import DiscoveryRunTracker
+from .filter_engine import FilterEngine
+from .models import db, Scene, WantedScene, Config
+from .owned_index import OwnedLibraryIndex
+from .stashdb_api import StashDBAPI
+from .stashdb_queries import normalize_scene
+from .whisparr_api import WhisparrAPI
+from . import discovery
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# Stages in flow order; persist always runs on the calling thread (the only database writer)
+STAGES = ['fetch', 'normalize', 'dedup', 'filter', 'ownership', 'persist', 'whisparr']
+DEFAULT_STAGE_WORKERS = {'fetch': 2, 'normalize': 1, 'dedup': 1, 'filter': 1, 'ownership': 1, 'whisparr': 1}
+
+def get_stage_workers(stage: str) -> int:
+    """Threads for a pipeline stage (PIPELINE_<STAGE>_WORKERS)"""
+    default = DEFAULT_STAGE_WORKERS[stage]
+    if stage == 'fetch':
+        default = max(default, discovery.get_discovery_workers())
+    try:
+        return max(1, int(os.environ.get(f'PIPELINE_{stage.upper()}_WORKERS', str(default))))
+    except ValueError:
+        return default
+
+def get_queue_size() -> int:
+    """Items (pages) each stage's inbox holds before upstream blocks (PIPELINE_QUEUE_SIZE)"""
+    try:
+        return max(1, int(os.environ.get('PIPELINE_QUEUE_SIZE', '8')))
+    except ValueError:
+        return 8
+
+class PipelineStage:
+    """A pool of threads applying func to items from a bounded inbox.
+    
+    func(item) yields zero or more output items, which are put on the next stage's inbox.
+    When every worker has seen the end of its input, on_finish() signals the next stage.
+    Metrics track items in/out, time spent working and waiting, and inbox depth.
+    """
+    
+    def __init__(self, name: str, func: Callable[[object], Iterable], workers: int, inbox: queue.Queue,
+                 stop: threading.Event, errors: List[str]):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.stop = stop
+        self.errors = errors
+        self.emit: Callable[[object], None] = None
+        self.on_finish: Callable[[], None] = None
+        
+        self._lock = threading.Lock()
+        self._running = workers
+        self._threads = []
+        self.metrics = {'workers': workers, 'items_in': 0, 'items_out': 0, 'busy_seconds': 0.0,
+                        'wait_seconds': 0.0, 'max_queue_depth': 0, 'queue_depth_total': 0}
+        self._started = None
+        self._finished = None
+    
+    def start(self):
+        self._started = time.monotonic()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'pipeline-{self.name}-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def join(self, timeout: float = None):
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def report(self) -> Dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+        elapsed = ((self._finished or time.monotonic()) - self._started) if self._started else 0.0
+        gets = max(1, metrics['items_in'])
+        return {
+            'workers': metrics['workers'],
+            'items_in': metrics['items_in'],
+            'items_out': metrics['items_out'],
+            'seconds': round(elapsed, 3),
+            'items_per_second': round(metrics['items_in'] / elapsed, 2) if elapsed else None,
+            'busy_seconds': round(metrics['busy_seconds'], 3),
+            'wait_seconds': round(metrics['wait_seconds'], 3),
+            # Share of worker time spent doing work; the stage closest to 1.0 is the bottleneck
+            'utilization': round(metrics['busy_seconds'] / (elapsed * metrics['workers']), 3) if elapsed else None,
+            'avg_queue_depth': round(metrics['queue_depth_total'] / gets, 2),
+            'max_queue_depth': metrics['max_queue_depth']
+        }
+    
+    def _work(self):
+        try:
+            while not self.stop.is_set():
+                waited = time.monotonic()
+                depth = self.inbox.qsize()
+                try:
+                    item = self.inbox.get(timeout=0.1)
+                except queue.Empty:
+                    self._add('wait_seconds', time.monotonic() - waited)
+                    continue
+                self._add('wait_seconds', time.monotonic() - waited)
+                
+                if item is _DONE:
+                    break
+                
+                with self._lock:
+                    self.metrics['items_in'] += 1
+                    self.metrics['queue_depth_total'] += depth
+                    self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], depth)
+                
+                busy = time.monotonic()
+                try:
+                    for output in self.func(item) or ():
+                        self.emit(output)
+                        self._add('items_out', 1)
+                except Exception as e:
+                    error_msg = f"Pipeline stage {self.name} failed: {str(e)}"
+                    logger.error(error_msg)
+                    self.errors.append(error_msg)
+                self._add('busy_seconds', time.monotonic() - busy)
+        finally:
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last:
+                self._finished = time.monotonic()
+                self.on_finish()
+    
+    def _add(self, metric: str, amount):
+        with self._lock:
+            self.metrics[metric] += amount
+
+def put(target: queue.Queue, item, stop: threading.Event):
+    """Blocking put that gives up once the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+class PrecomputedOwnership:
+    """Ownership answers computed by the ownership stage, falling back to the index for the rest"""
+    
+    def __init__(self, owned: Dict[str, bool], fallback: OwnedLibraryIndex):
+        self.owned = owned
+        self.fallback = fallback
+    
+    def is_owned(self, stashdb_id: str) -> bool:
+        if stashdb_id in self.owned:
+            return self.owned[stashdb_id]
+        return self.fallback.is_owned(stashdb_id)
+
+class DiscoveryPipeline:
+    """fetch -> normalize -> dedup -> filter -> ownership -> persist -> whisparr.
+    
+    Every stage but persist runs on its own thread pool, linked by bounded queues so a slow
+    stage applies back-pressure instead of buffering the whole crawl. Items are pages of
+    scenes tagged with their entity, plus one end-of-entity marker per entity. Persist runs
+    on the calling thread, which also applies the Whisparr outcomes, so all database writes
+    still go through one session and one SQLite connection.
+    """
+    
+    def __init__(self, stashdb_api: StashDBAPI, ownership: OwnedLibraryIndex, config: Config,
+                 whisparr_api: WhisparrAPI = None, deep_resync: bool = False, seen: discovery.SeenScenes = None,
+                 tracker: DiscoveryRunTracker = None):
+        self.stashdb_api = stashdb_api
+        self.ownership = ownership
+        self.config = config
+        self.filters = FilterEngine.from_config(config)
+        self.whisparr_api = whisparr_api if config.auto_add_to_whisparr else None
+        self.quality_profile_id = getattr(config, 'whisparr_quality_profile_id', None)
+        self.deep_resync = deep_resync
+        self.seen = seen if seen is not None else discovery.SeenScenes()
+        self.tracker = tracker
+        
+        self.stop = threading.Event()
+        self.errors: List[str] = []
+        self.queue_size = get_queue_size()
+        self.writer_queue = queue.Queue(maxsize=self.queue_size)
+        self.stages: Dict[str, PipelineStage] = {}
+        self._catalogue_lock = threading.Lock()
+        self._catalogue_loaded = False
+    
+    def run(self, jobs: List[Tuple[str, object]], results: Dict) -> Dict:
+        entities = {(kind, entity.id): entity for kind, entity in jobs}
+        entity_state = {key: {'new_scenes': 0, 'filtered_scenes': 0, 'pages': 0, 'received': 0, 'page_writes': [],
+                              'written': set(), 'next_page': None, 'done': None, 'recorded': False} for key in entities}
+        whisparr_results = {'added_count': 0, 'skipped_count': 0, 'errors': []}
+        started = time.monotonic()
+        
+        # Jobs carry plain values only: worker threads never touch ORM objects
+        fetch_jobs = [{
+            'kind': kind,
+            'entity_id': entity.id,
+            'name': entity.name,
+            'stashdb_id': entity.stashdb_id,
+            'watermark': discovery.entity_watermark(entity, self.deep_resync),
+            'start_page': self.tracker.start_page(kind, entity) if self.tracker else 1
+        } for kind, entity in jobs]
+        
+        self._build_stages()
+        for stage in self.stages.values():
+            stage.start()
+        
+        # Fed from its own thread: with more jobs than the queues hold, feeding them here would
+        # block before this thread starts draining the writer queue
+        feeder = threading.Thread(target=self._feed, args=(fetch_jobs,), name='pipeline-feed', daemon=True)
+        feeder.start()
+        
+        whisparr_budget = discovery.WHISPARR_BATCH_LIMIT
+        if self.whisparr_api:
+            # Scenes left over from earlier runs go first, as in the sequential path
+            for wanted in discovery.pending_whisparr_scenes(whisparr_budget):
+                whisparr_budget -= self._queue_whisparr(wanted)
+        
+        persist = {'items_in': 0, 'busy_seconds': 0.0, 'max_queue_depth': 0}
+        upstream_done = False
+        whisparr_done = self.whisparr_api is None
+        try:
+            while not (upstream_done and whisparr_done):
+                depth = self.writer_queue.qsize()
+                persist['max_queue_depth'] = max(persist['max_queue_depth'], depth)
+                item = self.writer_queue.get()
+                
+                if item is _DONE:
+                    upstream_done = True
+                    if self.whisparr_api:
+                        for _ in range(self.stages['whisparr'].workers):
+                            self.stages['whisparr'].inbox.put(_DONE)
+                    continue
+                if item.get('whisparr_done'):
+                    whisparr_done = True
+                    continue
+                
+                busy = time.monotonic()
+                persist['items_in'] += 1
+                if 'outcome' in item:
+                    wanted = db.session.get(WantedScene, item['wanted_id'])
+                    if wanted:
+                        discovery.apply_whisparr_outcome(wanted, item['outcome'], whisparr_results)
+                else:
+                    whisparr_budget -= self._persist(item, entities, entity_state, results, whisparr_budget)
+                persist['busy_seconds'] += time.monotonic() - busy
+        except Exception:
+            self.stop.set()
+            raise
+        finally:
+            self.stop.set()
+            feeder.join(timeout=1)
+            for stage in self.stages.values():
+                stage.join(timeout=1)
+        
+        # Entities cut short (a stage error or a stop) still report their counts, without moving the watermark
+        for key, state in entity_state.items():
+            if not state['recorded']:
+                seconds = state['done']['seconds'] if state['done'] else 0.0
+                discovery.record_entity_results(key[0], entities[key], state, seconds, results)
+        
+        elapsed = time.monotonic() - started
+        report = {name: stage.report() for name, stage in self.stages.items()}
+        report['persist'] = {
+            'workers': 1,
+            'items_in': persist['items_in'],
+            'seconds': round(elapsed, 3),
+            'items_per_second': round(persist['items_in'] / elapsed, 2) if elapsed else None,
+            'busy_seconds': round(persist['busy_seconds'], 3),
+            'utilization': round(persist['busy_seconds'] / elapsed, 3) if elapsed else None,
+            'max_queue_depth': persist['max_queue_depth']
+        }
+        stage_report = {name: report[name] for name in STAGES if name in report}
+        busiest = max(stage_report, key=lambda name: stage_report[name].get('utilization') or 0)
+        
+        results['wanted_added'] = whisparr_results['added_count']
+        results['whisparr_skipped'] = whisparr_results['skipped_count']
+        results['errors'].extend(self.errors + whisparr_results['errors'])
+        logger.info(f"Discovery pipeline finished in {elapsed:.1f}s; busiest stage: {busiest}")
+        return {'stages': stage_report, 'bottleneck': busiest, 'seconds': round(elapsed, 3)}
+    
+    def _build_stages(self):
+        workers = {name: get_stage_workers(name) for name in DEFAULT_STAGE_WORKERS}
+        funcs = {
+            'fetch': self._fetch,
+            'normalize': self._normalize,
+            'dedup': self._dedup,
+            'filter': self._filter,
+            'ownership': self._check_ownership
+        }
+        order = ['fetch', 'normalize', 'dedup', 'filter', 'ownership']
+        if self.whisparr_api:
+            order.append('whisparr')
+            funcs['whisparr'] = self._push_to_whisparr
+        
+        for name in order:
+            # Whisparr items come from the writer thread, which must never block on a full inbox
+            inbox = queue.Queue() if name == 'whisparr' else queue.Queue(maxsize=self.queue_size)
+            self.stages[name] = PipelineStage(name, funcs[name], workers[name], inbox, self.stop, self.errors)
+        
+        linear = ['fetch', 'normalize', 'dedup', 'filter', 'ownership']
+        for current, following in zip(linear, linear[1:]):
+            self._link(self.stages[current], self.stages[following])
+        
+        ownership = self.stages['ownership']
+        ownership.emit = lambda item: put(self.writer_queue, item, self.stop)
+        ownership.on_finish = lambda: put(self.writer_queue, _DONE, self.stop)
+        
+        if self.whisparr_api:
+            whisparr = self.stages['whisparr']
+            whisparr.emit = lambda item: put(self.writer_queue, item, self.stop)
+            whisparr.on_finish = lambda: put(self.writer_queue, {'whisparr_done': True}, self.stop)
+    
+    def _feed(self, fetch_jobs: List[Dict]):
+        fetch = self.stages['fetch']
+        for job in fetch_jobs:
+            put(fetch.inbox, job, self.stop)
+        for _ in range(fetch.workers):
+            put(fetch.inbox, _DONE, self.stop)
+    
+    def _link(self, current: PipelineStage, following: PipelineStage):
+        current.emit = lambda item: put(following.inbox, item, self.stop)
+        
+        def finish():
+            for _ in range(following.workers):
+                put(following.inbox, _DONE, self.stop)
+        current.on_finish = finish
+    
+    # Stage functions: each takes one item and yields the items for the next stage
+    
+    def _fetch(self, job: Dict):
+        started = time.monotonic()
+        kind, name = job['kind'], job['name']
+        stashdb_id = job['stashdb_id'] or discovery.resolve_stashdb_id(kind, name, self.stashdb_api)
+        done = {'job': job, 'done': True, 'stashdb_id': stashdb_id, 'complete': False,
+                'full_walk': job['watermark'] is None, 'newest': None, 'pages': 0}
+        
+        if not stashdb_id:
+            logger.warning(f"Could not find StashDB ID for {kind}: {name}")
+        else:
+            try:
+                progress = {}
+                for page_num, scenes in discovery.iter_entity_scene_pages(kind, stashdb_id, name, self.stashdb_api,
+                                                                          job['watermark'], progress, job['start_page']):
+                    mark = discovery.newest_scene_mark([[(scene, None) for scene in scenes]])
+                    if mark and (done['newest'] is None or mark[0] > done['newest'][0]):
+                        done['newest'] = mark
+                    done['pages'] += 1
+                    yield {'job': job, 'page_num': page_num, 'scenes': scenes}
+                done['complete'] = progress['complete']
+            except Exception as e:
+                logger.warning(f"Could not fetch scenes for {kind} {name}: {str(e)}")
+                try:
+                    scenes = discovery.fallback_entity_scenes(kind, name, self.stashdb_api)
+                except Exception as e:
+                    logger.error(f"Fallback search also failed for {name}: {str(e)}")
+                    scenes = []
+                if scenes:
+                    done['pages'] += 1
+                    yield {'job': job, 'page_num': 1, 'scenes': scenes}
+        
+        done['seconds'] = time.monotonic() - started
+        yield done
+    
+    def _normalize(self, item: Dict):
+        if not item.get('done'):
+            item['scenes'] = [normalize_scene(scene) for scene in item['scenes'] if scene and scene.get('id')]
+        yield item
+    
+    def _dedup(self, item: Dict):
+        if not item.get('done'):
+            # Collapse repeats within the page, keeping StashDB's order, and drop scenes already
+            # written this run; persist only merges their association
+            unique = {}
+            item['repeat_ids'] = []
+            for scene in item['scenes']:
+                if scene['id'] in self.seen:
+                    item['repeat_ids'].append(scene['id'])
+                else:
+                    unique.setdefault(scene['id'], scene)
+            item['scenes'] = list(unique.values())
+        yield item
+    
+    def _filter(self, item: Dict):
+        if not item.get('done'):
+            item['page'] = [(scene, self.filters.apply(scene)) for scene in item['scenes']]
+        yield item
+    
+    def _check_ownership(self, item: Dict):
+        # With the index loaded these are set lookups; otherwise persist asks Stash for new rows only
+        if not item.get('done') and self.ownership.ready:
+            item['owned'] = {scene['id']: self.ownership.is_owned(scene['id']) for scene in item['scenes']}
+        yield item
+    
+    def _push_to_whisparr(self, item: Dict):
+        with self._catalogue_lock:
+            if not self._catalogue_loaded:
+                try:
+                    self.whisparr_api.get_catalogue('scene', refresh=True)
+                except Exception as e:
+                    logger.warning(f"Could not load Whisparr catalogue: {str(e)}")
+                self._catalogue_loaded = True
+        
+        outcome = discovery.push_scene_to_whisparr(self.whisparr_api, item['stashdb_id'], item['title'],
+                                                   self.quality_profile_id)
+        yield {'wanted_id': item['wanted_id'], 'outcome': outcome}
+    
+    # Writer side (calling thread)
+    
+    def _persist(self, item: Dict, entities: Dict, entity_state: Dict, results: Dict, whisparr_budget: int) -> int:
+        """Apply one page or end-of-entity marker; returns how many scenes were queued for Whisparr"""
+        job = item['job']
+        key = (job['kind'], job['entity_id'])
+        entity = entities[key]
+        state = entity_state[key]
+        
+        if item.get('done'):
+            state['done'] = item
+            self._finish_entity(key, entity, state, results)
+            return 0
+        
+        state['received'] += 1
+        association = {'performer_id': entity.id} if job['kind'] == 'performer' else {'studio_id': entity.id}
+        if item['repeat_ids']:
+            self.seen.repeat(set(item['repeat_ids']), **association)
+        try:
+            # Scenes claimed by another entity's page since the dedup stage are caught here
+            page_results = discovery.apply_scene_page(item['page'], PrecomputedOwnership(item.get('owned', {}), self.ownership),
+                                                      seen=self.seen, **association)
+        except Exception as e:
+            error_msg = f"Error writing page {item['page_num']} for {entity.name}: {str(e)}"
+            logger.error(error_msg)
+            self.errors.append(error_msg)
+            self._finish_entity(key, entity, state, results)
+            return 0
+        
+        state['pages'] += 1
+        state['new_scenes'] += page_results['new_scenes']
+        state['filtered_scenes'] += page_results['filtered_scenes']
+        if page_results['inserted'] or page_results['associations_updated']:
+            state['page_writes'].append({
+                'page': item['page_num'],
+                'inserted': page_results['inserted'],
+                'associations_updated': page_results['associations_updated'],
+                'seconds': page_results['seconds']
+            })
+        
+        if self.tracker:
+            # Only checkpoint an unbroken run of pages, since stages with several workers may reorder them
+            state['written'].add(item['page_num'])
+            if state['next_page'] is None:
+                state['next_page'] = job['start_page']
+            advanced = False
+            while state['next_page'] in state['written']:
+                state['next_page'] += 1
+                advanced = True
+            if advanced:
+                self.tracker.page_written(job['kind'], entity, state['next_page'] - 1)
+        self._finish_entity(key, entity, state, results)
+        
+        queued = 0
+        if self.whisparr_api and page_results['wanted_ids'] and whisparr_budget > 0:
+            wanted_rows = WantedScene.query.join(Scene, WantedScene.scene_id == Scene.id).filter(
+                Scene.stashdb_id.in_(page_results['wanted_ids'][:whisparr_budget])
+            ).all()
+            for wanted in wanted_rows:
+                queued += self._queue_whisparr(wanted)
+        return queued
+    
+    def _finish_entity(self, key: Tuple[str, int], entity, state: Dict, results: Dict):
+        """Once the end marker and every page before it are in (stages may reorder them), close the entity"""
+        done = state['done']
+        if state['recorded'] or not done or state['received'] < done['pages']:
+            return
+        
+        if done['stashdb_id'] and not entity.stashdb_id:
+            entity.stashdb_id = done['stashdb_id']
+        if done['complete']:
+            if done['newest'] and (not entity.latest_release_date or done['newest'][0] >= entity.latest_release_date):
+                entity.latest_release_date, entity.latest_scene_id = done['newest']
+            if done['full_walk']:
+                entity.last_full_sync = datetime.utcnow()
+        
+        discovery.record_entity_results(key[0], entity, state, done['seconds'], results)
+        state['recorded'] = True
+        if self.tracker:
+            self.tracker.entity_done(key[0], entity)
+    
+    def _queue_whisparr(self, wanted: WantedScene) -> int:
+        scene = wanted.scene
+        if not scene or not scene.stashdb_id:
+            logger.warning(f"No StashDB ID found for scene: {wanted.title}")
+            self.errors.append(f"No StashDB ID for {wanted.title}")
+            return 0
+        self.stages['whisparr'].inbox.put({'wanted_id': wanted.id, 'stashdb_id': scene.stashdb_id, 'title': wanted.title})
+        return 1
+
+def run_discovery_pipeline(jobs: List[Tuple[str, object]], stashdb_api: StashDBAPI, ownership: OwnedLibraryIndex,
+                           config: Config, results: Dict, whisparr_api: WhisparrAPI = None,
+                           deep_resync: bool = False, seen: discovery.SeenScenes = None,
+                           tracker: DiscoveryRunTracker = None) -> Dict:
+    """Run entity discovery (and the Whisparr step) through the staged pipeline"""
+    logger.info(f"Running discovery pipeline for {len(jobs)} entities")
+    pipeline = DiscoveryPipeline(stashdb_api, ownership, config, whisparr_api, deep_resync, seen, tracker)
+    return pipeline.run(jobs, results)
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from .models import db, DiscoveryRun
+
+logger = logging.getLogger(__name__)
+
+def get_checkpoint_seconds() -> int:
+    """Minimum seconds between checkpoint commits during a run (DISCOVERY_CHECKPOINT_SECONDS)"""
+    try:
+        return max(0, int(os.environ.get('DISCOVERY_CHECKPOINT_SECONDS', '30')))
+    except ValueError:
+        return 30
+
+def get_run_stale_seconds() -> int:
+    """A 'running' run without a checkpoint for this long is treated as dead (DISCOVERY_RUN_STALE_SECONDS)"""
+    try:
+        return max(60, int(os.environ.get('DISCOVERY_RUN_STALE_SECONDS', '900')))
+    except ValueError:
+        return 900
+
+def get_resume_hours() -> int:
+    """Interrupted runs older than this start over instead of resuming (DISCOVERY_RESUME_HOURS, 0 = never resume)"""
+    try:
+        return max(0, int(os.environ.get('DISCOVERY_RESUME_HOURS', '24')))
+    except ValueError:
+        return 24
+
+def entity_key(kind: str, entity) -> str:
+    return f'{kind}:{entity.id}'
+
+class DiscoveryRunTracker:
+    """Checkpoints a DiscoveryRun while discovery writes its results.
+    
+    Discovery calls page_written() after each stored page and entity_done() after each
+    finished performer/studio; at most every DISCOVERY_CHECKPOINT_SECONDS (and after every
+    entity) the session is committed together with the run's cursor and heartbeat, so a run
+    that dies keeps everything written up to its last checkpoint. Only the writer thread may
+    use a tracker.
+    """
+    
+    def __init__(self, run: DiscoveryRun, seen=None, interval: int = None):
+        self.run = run
+        self.seen = seen
+        self.interval = get_checkpoint_seconds() if interval is None else interval
+        self.completed = set(run.get_completed_entities())
+        self.resumed = bool(run.resume_count)
+        self.resume_entity = run.current_entity if self.resumed else None
+        self.resume_page = run.last_page or 0
+        self.checkpoints = 0
+        self._last_checkpoint = time.monotonic()
+    
+    @classmethod
+    def start(cls, trigger: str = None, deep_resync: bool = False, engine: str = None,
+              seen=None) -> Optional['DiscoveryRunTracker']:
+        """Resume the latest interrupted run, or begin a new one.
+        
+        Returns None when another run is still checkpointing (it is alive).
+        """
+        now = datetime.utcnow()
+        active = DiscoveryRun.query.filter_by(status='running').order_by(DiscoveryRun.started_at.desc()).first()
+        if active and active.heartbeat_at and active.heartbeat_at > now - timedelta(seconds=get_run_stale_seconds()):
+            logger.warning(f"Discovery run {active.id} is still in progress (last checkpoint {active.heartbeat_at})")
+            return None
+        
+        interrupted = DiscoveryRun.query.filter(
+            DiscoveryRun.status.in_(['running', 'failed'])
+        ).order_by(DiscoveryRun.started_at.desc()).first()
+        latest = DiscoveryRun.query.order_by(DiscoveryRun.started_at.desc()).first()
+        
+        resume_hours = get_resume_hours()
+        if (interrupted and interrupted is latest and resume_hours and
+                interrupted.started_at > now - timedelta(hours=resume_hours) and
+                (not deep_resync or interrupted.deep_resync)):
+            interrupted.status = 'running'
+            interrupted.resume_count = (interrupted.resume_count or 0) + 1
+            interrupted.heartbeat_at = now
+            db.session.commit()
+            logger.info(f"Resuming discovery run {interrupted.id}: {len(interrupted.get_completed_entities())} entities already done"
+                        + (f", {interrupted.current_entity} from page {interrupted.last_page + 1}" if interrupted.last_page else ''))
+            return cls(interrupted, seen)
+        
+        # Anything else left unfinished is given up on
+        DiscoveryRun.query.filter(DiscoveryRun.status.in_(['running', 'failed'])).update(
+            {DiscoveryRun.status: 'abandoned'}, synchronize_session=False
+        )
+        run = DiscoveryRun(status='running', trigger=trigger, engine=engine, deep_resync=deep_resync,
+                           started_at=now, heartbeat_at=now)
+        db.session.add(run)
+        db.session.commit()
+        logger.info(f"Started discovery run {run.id}")
+        return cls(run, seen)
+    
+    @property
+    def deep_resync(self) -> bool:
+        return bool(self.run.deep_resync)
+    
+    def is_done(self, kind: str, entity) -> bool:
+        return entity_key(kind, entity) in self.completed
+    
+    def start_page(self, kind: str, entity) -> int:
+        """First page to fetch: after the last checkpointed page for the entity a resumed run stopped in"""
+        if self.resume_entity and self.resume_entity == entity_key(kind, entity):
+            return self.resume_page + 1
+        return 1
+    
+    def page_written(self, kind: str, entity, page_num: int):
+        self.run.current_entity = entity_key(kind, entity)
+        self.run.last_page = page_num
+        self.checkpoint()
+    
+    def entity_done(self, kind: str, entity):
+        key = entity_key(kind, entity)
+        self.completed.add(key)
+        if self.resume_entity == key:
+            self.resume_entity = None
+        if self.run.current_entity == key:
+            self.run.current_entity = None
+            self.run.last_page = 0
+        self.checkpoint(force=True)
+    
+    def entities_done(self, jobs):
+        """Mark several entities finished with a single checkpoint (e.g. everything the feed covered)"""
+        self.completed.update(entity_key(kind, entity) for kind, entity in jobs)
+        self.checkpoint(force=True)
+    
+    def checkpoint(self, force: bool = False):
+        """Commit everything written so far along with the run's cursor"""
+        if not force and time.monotonic() - self._last_checkpoint < self.interval:
+            return
+        if self.seen is not None:
+            self.seen.flush()
+        self.run.set_completed_entities(sorted(self.completed))
+        self.run.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+        self.checkpoints += 1
+        self._last_checkpoint = time.monotonic()
+    
+    def finish(self, results: Dict):
+        """Record the outcome and final statistics; the caller commits"""
+        now = datetime.utcnow()
+        run = self.run
+        run.status = 'completed' if results.get('status') == 'success' else 'failed'
+        run.finished_at = now
+        run.heartbeat_at = now
+        if run.status == 'completed':
+            run.current_entity = None
+            run.last_page = 0
+        run.set_completed_entities(sorted(self.completed))
+        
+        # Counts accumulate over resumes of the same run
+        run.new_scenes = (run.new_scenes or 0) + results.get('new_scenes', 0)
+        run.filtered_scenes = (run.filtered_scenes or 0) + results.get('filtered_scenes', 0)
+        run.pages_fetched = (run.pages_fetched or 0) + results.get('pages_fetched', 0)
+        run.error_count = (run.error_count or 0) + len(results.get('errors', []))
+        
+        stats = run.get_stats()
+        stats.setdefault('attempts', []).append({
+            'started_at': results.get('started_at'),
+            'seconds': results.get('seconds'),
+            'new_scenes': results.get('new_scenes', 0),
+            'pages_fetched': results.get('pages_fetched', 0),
+            'redundant_skipped': results.get('redundant_skipped', 0),
+            'skipped_entities': results.get('skipped_entities', 0),
+            'checkpoints': self.checkpoints,
+            'errors': results.get('errors', [])[:20]
+        })
+        # Time spent running, not the wall time since the first attempt started
+        run.duration_seconds = round(sum(attempt['seconds'] or 0 for attempt in stats['attempts']), 3)
+        stats.setdefault('entity_timings', []).extend(results.get('entity_timings', []))
+        for report in ('feed', 'pipeline', 'owned_index'):
+            if report in results:
+                stats[report] = results[report]
+        run.stats = json.dumps(stats, default=str)
@@ -0,0 +1,127 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict
+
+from .models import db
+from .tag_bitmaps import get_tag_bitmaps
+
+logger = logging.getLogger(__name__)
+
+# Every scene sharing its StashDB id with another, numbered within its group: position 1 (the oldest
+# discovered) survives, the rest are merged into it
+BUILD_MERGE_MAP = """
+    CREATE TEMP TABLE scene_merge AS
+    SELECT id AS scene_id,
+           FIRST_VALUE(id) OVER duplicates AS survivor_id,
+           ROW_NUMBER() OVER duplicates AS position
+    FROM scenes
+    WHERE stashdb_id IN (SELECT stashdb_id FROM scenes GROUP BY stashdb_id HAVING COUNT(*) > 1)
+    WINDOW duplicates AS (PARTITION BY stashdb_id ORDER BY discovered_date, id)
+"""
+
+# The map is created outside the transaction and would outlive it on the pooled connection, so it
+# is dropped while the session still holds that connection (and before building it, after a failure)
+DROP_MERGE_MAP = "DROP TABLE IF EXISTS temp.scene_merge"
+
+# Wanted rows of a duplicate group beyond the first, taken in survivor-first order, plus
+# repeated wanted rows for a single scene
+SURPLUS_WANTED = """
+    SELECT wanted_id FROM (
+        SELECT w.id AS wanted_id,
+               ROW_NUMBER() OVER (PARTITION BY COALESCE(m.survivor_id, w.scene_id)
+                                  ORDER BY COALESCE(m.position, 1), w.added_date, w.id) AS position
+        FROM wanted_scenes w LEFT JOIN scene_merge m ON m.scene_id = w.scene_id
+    ) WHERE position > 1
+"""
+
+LOSERS = "SELECT scene_id FROM scene_merge WHERE position > 1"
+
+# Survivors keep their own performer/studio or take the first one a duplicate has (nulls sort last),
+# are owned if any copy was, and are wanted if a wanted row now points at them
+MERGE_SURVIVORS = """
+    UPDATE scenes SET
+        performer_id = merged.performer_id,
+        studio_id = merged.studio_id,
+        is_owned = merged.is_owned,
+        is_wanted = CASE WHEN EXISTS (SELECT 1 FROM wanted_scenes w WHERE w.scene_id = scenes.id)
+                         THEN 1 ELSE is_wanted END,
+        last_updated = :now
+    FROM (
+        SELECT DISTINCT m.survivor_id,
+               FIRST_VALUE(s.performer_id) OVER (PARTITION BY m.survivor_id ORDER BY s.performer_id IS NULL, m.position) AS performer_id,
+               FIRST_VALUE(s.studio_id) OVER (PARTITION BY m.survivor_id ORDER BY s.studio_id IS NULL, m.position) AS studio_id,
+               MAX(COALESCE(s.is_owned, 0)) OVER (PARTITION BY m.survivor_id) AS is_owned
+        FROM scene_merge m JOIN scenes s ON s.id = m.scene_id
+    ) AS merged
+    WHERE scenes.id = merged.survivor_id
+"""
+
+def _count(statement: str) -> int:
+    return db.session.execute(db.text(f"SELECT COUNT(*) FROM ({statement})")).scalar()
+
+def consolidate_duplicate_scenes(dry_run: bool = False, sample: int = 20) -> Dict:
+    """Merge scenes stored more than once under the same StashDB id with a few set-based statements.
+    
+    A window function numbers each duplicate group by discovery date into a temporary map; the
+    oldest scene survives and takes over the others' performer/studio links, ownership, tag
+    links and (at most one) wanted row, then the rest are deleted. The cost is a handful of
+    indexed joins whatever the number of groups. dry_run reports the same counts and a sample
+    of groups without changing anything.
+    """
+    started = time.perf_counter()
+    session = db.session
+    try:
+        session.execute(db.text(DROP_MERGE_MAP))
+        session.execute(db.text(BUILD_MERGE_MAP))
+        session.execute(db.text("CREATE INDEX temp.ix_scene_merge_scene ON scene_merge (scene_id, position)"))
+        session.execute(db.text("CREATE INDEX temp.ix_scene_merge_survivor ON scene_merge (survivor_id, position)"))
+        
+        report = {
+            'dry_run': dry_run,
+            'duplicate_groups': _count("SELECT scene_id FROM scene_merge WHERE position = 1"),
+            'removed_scenes': _count(LOSERS),
+            'removed_wanted': _count(SURPLUS_WANTED),
+            'moved_wanted': 0,
+            'moved_tag_links': 0
+        }
+        report['updated_scenes'] = report['duplicate_groups']
+        
+        if dry_run:
+            groups = session.execute(db.text(
+                "SELECT s.stashdb_id, m.survivor_id, GROUP_CONCAT(m.scene_id) FROM scene_merge m "
+                "JOIN scenes s ON s.id = m.survivor_id WHERE m.position > 1 "
+                "GROUP BY m.survivor_id ORDER BY m.survivor_id LIMIT :limit"
+            ), {'limit': sample}).all()
+            report['sample'] = [
+                {'stashdb_id': stashdb_id, 'keep': survivor_id, 'remove': [int(scene_id) for scene_id in removed.split(',')]}
+                for stashdb_id, survivor_id, removed in groups
+            ]
+            session.execute(db.text(DROP_MERGE_MAP))
+            session.rollback()
+        else:
+            session.execute(db.text(f"DELETE FROM wanted_scenes WHERE id IN ({SURPLUS_WANTED})"))
+            report['moved_wanted'] = session.execute(db.text(
+                "UPDATE wanted_scenes SET scene_id = (SELECT survivor_id FROM scene_merge m WHERE m.scene_id = wanted_scenes.scene_id), "
+                f"last_updated = :now WHERE scene_id IN ({LOSERS})"
+            ), {'now': datetime.utcnow()}).rowcount
+            report['moved_tag_links'] = session.execute(db.text(
+                "INSERT OR IGNORE INTO scene_tags (scene_id, tag_id) SELECT m.survivor_id, t.tag_id "
+                "FROM scene_tags t JOIN scene_merge m ON m.scene_id = t.scene_id WHERE m.position > 1"
+            )).rowcount
+            session.execute(db.text(f"DELETE FROM scene_tags WHERE scene_id IN ({LOSERS})"))
+            session.execute(db.text(MERGE_SURVIVORS), {'now': datetime.utcnow()})
+            session.execute(db.text(f"DELETE FROM scenes WHERE id IN ({LOSERS})"))
+            session.execute(db.text(DROP_MERGE_MAP))
+            session.commit()
+            if report['removed_scenes']:
+                get_tag_bitmaps().mark_stale()
+    except Exception:
+        session.rollback()
+        raise
+    
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(f"{'Duplicate check' if dry_run else 'Duplicate cleanup'}: {report['removed_scenes']} scenes in "
+                f"{report['duplicate_groups']} groups, {report['removed_wanted']} wanted entries "
+                f"{'to remove' if dry_run else 'removed'} in {report['seconds']}s")
+    return report
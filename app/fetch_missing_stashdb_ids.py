@@ -17,18 +17,20 @@ def fetch_missing_stashdb_ids():
         
         logger.info(f"Found {len(performers_missing_ids)} performers missing StashDB IDs")
         
+        # One batched request per STASHDB_BATCH_SIZE performers instead of one per performer
+        lookup = stashdb.search_performers([performer.name for performer in performers_missing_ids])
+        
         updated_count = 0
         for performer in performers_missing_ids:
-            try:
-                results = stashdb.search_performer(performer.name)
-                if results and len(results) > 0:
-                    performer.stashdb_id = results[0].get('id')
-                    logger.info(f"Found StashDB ID {performer.stashdb_id} for {performer.name}")
-                    updated_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Error searching StashDB for {performer.name}: {str(e)}")
+            if performer.name in lookup['errors']:
+                logger.error(f"Error searching StashDB for {performer.name}: {lookup['errors'][performer.name]}")
                 continue
+            
+            results = lookup['results'].get(performer.name)
+            if results and len(results) > 0:
+                performer.stashdb_id = results[0].get('id')
+                logger.info(f"Found StashDB ID {performer.stashdb_id} for {performer.name}")
+                updated_count += 1
         
         db.session.commit()
         return updated_count
@@ -0,0 +1,135 @@
+import logging
+import os
+import random
+from typing import AbstractSet, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reason codes returned by FilterEngine.evaluate
+UNWANTED_CATEGORY = 'unwanted_category'
+MISSING_REQUIRED = 'missing_required'
+TOO_SHORT = 'too_short'
+TOO_LONG = 'too_long'
+
+def get_filter_debug_sample() -> float:
+    """Share of scenes whose filter decision is logged at DEBUG (FILTER_DEBUG_SAMPLE, 0 = none, 1 = all)"""
+    try:
+        return min(1.0, max(0.0, float(os.environ.get('FILTER_DEBUG_SAMPLE', '0'))))
+    except ValueError:
+        return 0.0
+
+class FilterEngine:
+    """Category and duration filters compiled from Config once per run.
+
+    Unwanted and required terms become frozensets of lowercased names, matched against both
+    tag names and tag categories; duration bounds are kept in seconds. An engine holds no
+    database state, so worker threads can share one. Evaluating a scene walks its tags once
+    and returns a reason code instead of building a message.
+    """
+
+    def __init__(self, unwanted: Iterable[str] = (), required: Iterable[str] = (), min_duration_minutes: int = 0,
+                 max_duration_minutes: int = 0, debug_sample: float = None):
+        self.unwanted_display = tuple(term.lower() for term in unwanted)
+        self.required_display = tuple(term.lower() for term in required)
+        self.unwanted: FrozenSet[str] = frozenset(self.unwanted_display)
+        self.required: FrozenSet[str] = frozenset(self.required_display)
+        self.min_duration_minutes = min_duration_minutes or 0
+        self.max_duration_minutes = max_duration_minutes or 0
+        self.min_seconds = self.min_duration_minutes * 60 if self.min_duration_minutes > 0 else None
+        self.max_seconds = self.max_duration_minutes * 60 if self.max_duration_minutes > 0 else None
+        self.debug_sample = get_filter_debug_sample() if debug_sample is None else debug_sample
+        # Tag names and categories repeat across scenes; fold each distinct spelling once
+        self._folded: Dict[str, str] = {}
+
+    @classmethod
+    def from_config(cls, config) -> 'FilterEngine':
+        """Compile a Config (an already compiled engine is returned as is)"""
+        if isinstance(config, FilterEngine):
+            return config
+        return cls(
+            unwanted=config.get_unwanted_categories(),
+            required=config.get_required_categories(),
+            min_duration_minutes=config.min_duration_minutes or 0,
+            max_duration_minutes=config.max_duration_minutes or 0
+        )
+
+    def evaluate(self, scene_data: Dict) -> Tuple[bool, Optional[str], Optional[str]]:
+        """(is_filtered, reason code, matched term or None) for one StashDB scene"""
+        result = self._evaluate(scene_data)
+        if self.debug_sample and random.random() < self.debug_sample:
+            logger.debug(f"Filter {'rejected' if result[0] else 'passed'} '{scene_data.get('title', 'Unknown')}': "
+                         f"{result[1] or 'ok'} {result[2] or ''}")
+        return result
+
+    def apply(self, scene_data: Dict) -> Tuple[bool, str]:
+        """(is_filtered, filter_reason text) as stored on Scene rows"""
+        is_filtered, code, detail = self.evaluate(scene_data)
+        return is_filtered, self.describe(code, detail, scene_data.get('duration')) if is_filtered else ""
+
+    def fold_terms(self, values: Iterable[str]) -> Set[str]:
+        """Lowercased set of tag names and categories, for evaluate_terms"""
+        fold = self._fold
+        return {fold(value) for value in values if value}
+
+    def evaluate_terms(self, terms: AbstractSet[str], duration: int = None) -> Tuple[bool, Optional[str], Optional[str]]:
+        """Evaluate a stored scene given as folded terms (Scene keeps tag names and categories apart)"""
+        if self.unwanted:
+            hits = self.unwanted.intersection(terms)
+            if hits:
+                return True, UNWANTED_CATEGORY, self._first_unwanted(hits)
+        if self.required and self.required.isdisjoint(terms):
+            return True, MISSING_REQUIRED, None
+        return self._check_duration(duration)
+
+    def describe(self, code: str, detail: str = None, duration: int = None) -> str:
+        if code == UNWANTED_CATEGORY:
+            return f"Contains unwanted category: {detail}"
+        if code == MISSING_REQUIRED:
+            return f"Missing required categories: {', '.join(self.required_display)}"
+        if code == TOO_SHORT:
+            return f"Duration too short: {duration / 60:.1f} min < {self.min_duration_minutes} min"
+        if code == TOO_LONG:
+            return f"Duration too long: {duration / 60:.1f} min > {self.max_duration_minutes} min"
+        return ""
+
+    def _fold(self, value: str) -> str:
+        folded = self._folded.get(value)
+        if folded is None:
+            folded = self._folded[value] = value.lower()
+        return folded
+
+    def _first_unwanted(self, hits: AbstractSet[str]) -> str:
+        """The matched term listed first in the settings, whichever order the scene's tags came in"""
+        return next(term for term in self.unwanted_display if term in hits)
+
+    def _evaluate(self, scene_data: Dict) -> Tuple[bool, Optional[str], Optional[str]]:
+        unwanted, required = self.unwanted, self.required
+        has_required = not required
+        hits = set()
+
+        if unwanted or required:
+            for tag in scene_data.get('tags') or ():
+                for value in (tag.get('category'), tag.get('name')):
+                    if not value:
+                        continue
+                    term = self._fold(value)
+                    if term in unwanted:
+                        hits.add(term)
+                    if not has_required and term in required:
+                        has_required = True
+
+        if hits:
+            return True, UNWANTED_CATEGORY, self._first_unwanted(hits)
+        if not has_required:
+            return True, MISSING_REQUIRED, None
+
+        return self._check_duration(scene_data.get('duration'))
+
+    def _check_duration(self, duration: Optional[int]) -> Tuple[bool, Optional[str], Optional[str]]:
+        if duration:
+            if self.min_seconds is not None and duration < self.min_seconds:
+                return True, TOO_SHORT, None
+            if self.max_seconds is not None and duration > self.max_seconds:
+                return True, TOO_LONG, None
+
+        return False, None, None
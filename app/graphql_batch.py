@@ -0,0 +1,94 @@
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def get_batch_size() -> int:
+    """Maximum number of aliased lookups merged into one GraphQL document (STASHDB_BATCH_SIZE)"""
+    try:
+        return max(1, int(os.environ.get('STASHDB_BATCH_SIZE', '25')))
+    except ValueError:
+        return 25
+
+def build_aliased_query(field: str, arg_name: str, arg_type: str, selection: str, count: int) -> str:
+    """Build one document running `field` `count` times under the aliases q0..qN.
+    
+    Each alias gets its own variable ($v0..$vN) so values never need escaping.
+    """
+    variables = ', '.join(f'$v{i}: {arg_type}' for i in range(count))
+    fields = '\n'.join(f'    q{i}: {field}({arg_name}: $v{i}) {selection}' for i in range(count))
+    return f'query Batch{field[0].upper()}{field[1:]}({variables}) {{\n{fields}\n}}'
+
+def split_aliased_response(result: Dict, count: int) -> List[Tuple[Any, Optional[str]]]:
+    """Split a batched response back into one (data, error) pair per alias.
+    
+    GraphQL reports field errors with a path starting at the alias, so they are attached to
+    that item only; its siblings keep their data.
+    """
+    data = result.get('data') or {}
+    item_errors: Dict[str, List[str]] = {}
+    for error in result.get('errors') or []:
+        path = error.get('path') or []
+        if path:
+            item_errors.setdefault(str(path[0]), []).append(error.get('message', str(error)))
+    
+    items = []
+    for i in range(count):
+        alias = f'q{i}'
+        messages = item_errors.get(alias)
+        items.append((data.get(alias), '; '.join(messages) if messages else None))
+    return items
+
+def is_document_error(result: Dict) -> bool:
+    """True if the response carries errors not tied to an alias (e.g. a query validation failure)"""
+    if not result.get('data'):
+        return bool(result.get('errors'))
+    return any(not error.get('path') for error in result.get('errors') or [])
+
+class GraphQLBatcher:
+    """Runs many same-shaped GraphQL lookups as aliased batch documents.
+    
+    `send(query, variables)` must return the raw response body (data and errors) without
+    raising on GraphQL errors. A chunk rejected as a whole by the server is retried one lookup
+    at a time so a single bad value cannot take its neighbours down with it.
+    """
+    
+    def __init__(self, send: Callable[[str, Dict], Dict], batch_size: int = None):
+        self.send = send
+        self.batch_size = batch_size or get_batch_size()
+        self.stats = {'documents': 0, 'lookups': 0, 'errors': 0}
+    
+    def run(self, field: str, arg_name: str, arg_type: str, selection: str, values: List) -> List[Tuple[Any, Optional[str]]]:
+        """Look up every value, returning (data, error) pairs in the same order as values"""
+        items = []
+        for start in range(0, len(values), self.batch_size):
+            items.extend(self._run_chunk(field, arg_name, arg_type, selection, values[start:start + self.batch_size]))
+        
+        self.stats['lookups'] += len(values)
+        self.stats['errors'] += sum(1 for _, error in items if error)
+        return items
+    
+    def _run_chunk(self, field: str, arg_name: str, arg_type: str, selection: str, chunk: List) -> List[Tuple[Any, Optional[str]]]:
+        query = build_aliased_query(field, arg_name, arg_type, selection, len(chunk))
+        variables = {f'v{i}': value for i, value in enumerate(chunk)}
+        
+        try:
+            self.stats['documents'] += 1
+            result = self.send(query, variables)
+        except Exception as e:
+            # Transport failures affect every lookup alike; retrying them one by one won't help
+            return [(None, str(e))] * len(chunk)
+        
+        if not is_document_error(result):
+            return split_aliased_response(result, len(chunk))
+        
+        error_msg = f"GraphQL errors: {result.get('errors')}"
+        if len(chunk) == 1:
+            return [(None, error_msg)]
+        
+        logger.warning(f"Batched {field} lookup of {len(chunk)} items failed ({error_msg}), retrying individually")
+        items = []
+        for value in chunk:
+            items.extend(self._run_chunk(field, arg_name, arg_type, selection, [value]))
+        return items
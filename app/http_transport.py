@@ -0,0 +1,147 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting plus transient server/gateway errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+class HttpTransport:
+    """Shared HTTP layer for the Stash, StashDB and Whisparr clients.
+    
+    Keeps one keep-alive requests.Session per host (so stashdb.org pays for its TLS handshake
+    once, not per query), caps how many requests run against a host at the same time, and
+    retries 429/5xx responses with jittered exponential backoff. 429 is always retried because
+    the server rejected the request; 5xx and connection errors are only retried for idempotent
+    calls, which GraphQL read queries opt into via idempotent=True.
+    """
+    
+    def __init__(self, pool_size: int = None, timeout: float = None, max_retries: int = None,
+                 backoff: float = None, max_backoff: float = None, host_concurrency: int = None):
+        self.pool_size = pool_size or int(os.environ.get('HTTP_POOL_SIZE', '10'))
+        self.timeout = timeout or float(os.environ.get('REQUEST_TIMEOUT', '30'))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('HTTP_MAX_RETRIES', '3'))
+        self.backoff = backoff if backoff is not None else float(os.environ.get('HTTP_BACKOFF_SECONDS', '0.5'))
+        self.max_backoff = max_backoff or float(os.environ.get('HTTP_MAX_BACKOFF_SECONDS', '30'))
+        self.host_concurrency = host_concurrency or int(os.environ.get('HTTP_HOST_CONCURRENCY', '8'))
+        
+        self._sessions: Dict[str, requests.Session] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+    
+    def request(self, method: str, url: str, idempotent: bool = None, limiter=None, **kwargs) -> requests.Response:
+        """Send a request through the pooled session for url's host.
+        
+        Accepts the same keyword arguments as requests.Session.request, plus an optional
+        limiter (see rate_limiter.AdaptiveRateLimiter) that gates and observes each attempt.
+        Returns the final response (callers still call raise_for_status) or raises the last
+        connection error.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', self.timeout)
+        
+        host = urlsplit(url).netloc
+        session = self._session_for(host)
+        semaphore = self._semaphore_for(host)
+        attempt = 0
+        
+        while True:
+            # The limiter (if any) sees every attempt, including retries
+            ticket = limiter.acquire() if limiter else None
+            try:
+                with semaphore:
+                    self._count('requests')
+                    response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if limiter:
+                    limiter.release(ticket, error=e.__class__.__name__)
+                if not idempotent or attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"{method} {host} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                response = None
+            except Exception as e:
+                if limiter:
+                    limiter.release(ticket, error=e.__class__.__name__)
+                raise
+            else:
+                if limiter:
+                    limiter.release(ticket, response)
+            
+            if response is not None:
+                retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff_delay(attempt, response.headers.get('Retry-After'))
+                logger.warning(f"{method} {host} returned {response.status_code}, retrying in {delay:.1f}s")
+                response.close()
+            
+            # Sleep outside the semaphore so other requests to the host can proceed
+            self._count('retries')
+            attempt += 1
+            time.sleep(delay)
+    
+    def _count(self, key: str):
+        """Bump a stats counter; requests run on many threads at once"""
+        with self._lock:
+            self.stats[key] += 1
+    
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with full jitter, honouring a numeric Retry-After header"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+    
+    def _session_for(self, host: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                # Retries are handled in request() so urllib3's own retry stays off
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return session
+    
+    def _semaphore_for(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.host_concurrency)
+                self._semaphores[host] = semaphore
+            return semaphore
+    
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport() -> HttpTransport:
+    """Process-wide transport shared by all API clients"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HttpTransport()
+        return _transport
@@ -0,0 +1,160 @@
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+from .models import db, LogEntry
+
+logger = logging.getLogger(__name__)
+
+# Loggers never stored: our own (a failed write must not log itself back into the queue),
+# SQL echo, and per-request/per-job chatter
+EXCLUDED_LOGGERS = (__name__, 'sqlalchemy', 'werkzeug', 'urllib3', 'apscheduler')
+
+def get_log_queue_size() -> int:
+    try:
+        return max(1, int(os.environ.get('LOG_QUEUE_SIZE', '10000')))
+    except ValueError:
+        return 10000
+
+def get_log_batch_size() -> int:
+    try:
+        return max(1, int(os.environ.get('LOG_BATCH_SIZE', '200')))
+    except ValueError:
+        return 200
+
+def get_log_flush_seconds() -> float:
+    try:
+        return max(0.1, float(os.environ.get('LOG_FLUSH_SECONDS', '2')))
+    except ValueError:
+        return 2.0
+
+class DatabaseLogHandler(logging.Handler):
+    """Logging handler that stores records as LogEntry rows without touching the caller's session.
+    
+    emit() only appends to a bounded in-memory queue; when the queue is full the record is
+    dropped and counted instead of blocking the caller. A background thread writes the queue
+    with one executemany INSERT per batch on its own connection, whenever batch_size records
+    are waiting or flush_seconds have passed.
+    """
+    
+    def __init__(self, engine, level=logging.INFO, capacity: int = None, batch_size: int = None,
+                 flush_seconds: float = None, start: bool = True):
+        super().__init__(level)
+        self.engine = engine
+        self.batch_size = batch_size or get_log_batch_size()
+        self.flush_seconds = flush_seconds or get_log_flush_seconds()
+        self.queue = queue.Queue(maxsize=capacity or get_log_queue_size())
+        self.stats = {'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+        self._stats_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        if start:
+            self.start()
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='db-log-writer', daemon=True)
+            self._thread.start()
+    
+    def emit(self, record: logging.LogRecord):
+        if record.name.startswith(EXCLUDED_LOGGERS):
+            return
+        try:
+            entry = {
+                'level': record.levelname,
+                'message': record.getMessage(),
+                # Short module name ("discovery"), or the category passed as extra={'db_module': ...}
+                'module': getattr(record, 'db_module', None) or record.name.rsplit('.', 1)[-1],
+                'timestamp': datetime.utcfromtimestamp(record.created)
+            }
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self._stats_lock:
+                self.stats['dropped'] += 1
+            return
+        if self.queue.qsize() >= self.batch_size:
+            self._flush_requested.set()
+    
+    def flush(self):
+        """Write everything queued so far, on the calling thread (waits for a batch already being written)"""
+        self._write_pending()
+    
+    def close(self):
+        self._stopping.set()
+        self._flush_requested.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self._write_pending()
+        super().close()
+    
+    def status(self) -> Dict:
+        with self._stats_lock:
+            return dict(self.stats, queued=self.queue.qsize(), capacity=self.queue.maxsize)
+    
+    def _run(self):
+        while not self._stopping.is_set():
+            self._flush_requested.wait(self.flush_seconds)
+            self._flush_requested.clear()
+            self._write_pending()
+    
+    def _write_pending(self):
+        with self._write_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    break
+                self._write(batch)
+    
+    def _take(self, limit: int) -> List[Dict]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _write(self, batch: List[Dict]):
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(LogEntry.__table__.insert(), batch)
+            with self._stats_lock:
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+        except Exception as e:
+            with self._stats_lock:
+                self.stats['failed'] += len(batch)
+            logger.warning(f"Dropped {len(batch)} log records that could not be stored: {str(e)}")
+
+_handler = None
+_handler_lock = threading.Lock()
+
+def get_database_log_handler():
+    """The installed DatabaseLogHandler, or None"""
+    return _handler
+
+def install_database_logging(app):
+    """Attach one DatabaseLogHandler to the root logger for this process (LOG_TO_DATABASE, LOG_DB_LEVEL).
+    
+    logging.shutdown() flushes and closes it at interpreter exit, so short cron runs keep their logs.
+    """
+    global _handler
+    if os.environ.get('LOG_TO_DATABASE', 'true').lower() != 'true':
+        return None
+    with _handler_lock:
+        if _handler is None:
+            with app.app_context():
+                engine = db.engine
+            level = getattr(logging, os.environ.get('LOG_DB_LEVEL', 'INFO').upper(), logging.INFO)
+            _handler = DatabaseLogHandler(engine, level=level)
+            logging.getLogger().addHandler(_handler)
+        return _handler
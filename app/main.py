@@ -10,6 +10,10 @@ from .stash_api import StashAPI
 from .stashdb_api import StashDBAPI
 from .whisparr_api import WhisparrAPI
 from .scheduler import setup_scheduler
+from .additional_routes import register_additional_routes
+from .database import configure_database
+from .log_sink import install_database_logging
+from .tag_bitmaps import warm_tag_bitmaps
 
 def create_app():
     # Set template and static folders relative to project root
@@ -27,12 +31,14 @@ def create_app():
     
     # Initialize database
     db.init_app(app)
+    configure_database(app)
     
     # Setup logging
     logging.basicConfig(
         level=getattr(logging, os.environ.get('LOG_LEVEL', 'INFO')),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
+    install_database_logging(app)
     
     # Initialize APIs
     stash_api = StashAPI()
@@ -40,4 +46,9 @@ def create_app():
     whisparr_api = WhisparrAPI()
     
     # Routes
-
+    register_additional_routes(app)
+    
+    # Tag bitmaps for filter simulation
+    warm_tag_bitmaps(app)
+    
+    return app
@@ -17,6 +17,15 @@ class Performer(db.Model):
     last_checked = db.Column(db.DateTime, default=datetime.utcnow)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Discovery watermark - newest scene already seen, so incremental runs can stop early
+    latest_release_date = db.Column(db.Date, nullable=True)
+    latest_scene_id = db.Column(db.String(50), nullable=True)
+    last_full_sync = db.Column(db.DateTime, nullable=True)  # Last walk of the whole catalogue
+    
+    # Adaptive check schedule learned from release cadence
+    next_check_due = db.Column(db.DateTime, nullable=True)  # None = due now
+    check_interval_hours = db.Column(db.Float, nullable=True)
+    
     # Relationships
     scenes = db.relationship('Scene', backref='performer', lazy=True)
     
@@ -49,6 +58,15 @@ class Studio(db.Model):
     last_checked = db.Column(db.DateTime, default=datetime.utcnow)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Discovery watermark - newest scene already seen, so incremental runs can stop early
+    latest_release_date = db.Column(db.Date, nullable=True)
+    latest_scene_id = db.Column(db.String(50), nullable=True)
+    last_full_sync = db.Column(db.DateTime, nullable=True)  # Last walk of the whole catalogue
+    
+    # Adaptive check schedule learned from release cadence
+    next_check_due = db.Column(db.DateTime, nullable=True)  # None = due now
+    check_interval_hours = db.Column(db.Float, nullable=True)
+    
     # Relationships
     scenes = db.relationship('Scene', backref='studio', lazy=True)
     
@@ -58,11 +76,18 @@ class Studio(db.Model):
 class Scene(db.Model):
     """Model for discovered scenes"""
     __tablename__ = 'scenes'
+    __table_args__ = (
+        # Release history per entity, wanted/filtered lists in page order, cleanup of old filtered scenes
+        db.Index('ix_scenes_performer_release', 'performer_id', 'release_date'),
+        db.Index('ix_scenes_studio_release', 'studio_id', 'release_date'),
+        db.Index('ix_scenes_wanted_release', 'is_wanted', 'release_date'),
+        db.Index('ix_scenes_filtered_discovered', 'is_filtered', 'discovered_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     stashdb_id = db.Column(db.String(50), unique=True, nullable=False)
     title = db.Column(db.String(500), nullable=False)
-    release_date = db.Column(db.Date, nullable=True)
+    release_date = db.Column(db.Date, nullable=True, index=True)
     duration = db.Column(db.Integer, nullable=True)  # in seconds
     tags = db.Column(db.Text)  # JSON string of tags
     categories = db.Column(db.Text)  # JSON string of categories
@@ -113,7 +138,10 @@ class Scene(db.Model):
 class WantedScene(db.Model):
     """Model for scenes wanted in Whisparr"""
     __tablename__ = 'wanted_scenes'
-    __table_args__ = (db.UniqueConstraint('scene_id', name='uq_wanted_scenes_scene_id'),)
+    __table_args__ = (
+        db.UniqueConstraint('scene_id', name='uq_wanted_scenes_scene_id'),
+        db.Index('ix_wanted_scenes_pending', 'status', 'added_to_whisparr'),  # Whisparr push queue
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     scene_id = db.Column(db.Integer, db.ForeignKey('scenes.id'), nullable=False)
@@ -121,7 +149,7 @@ class WantedScene(db.Model):
     title = db.Column(db.String(500), nullable=False)
     performer_name = db.Column(db.String(200), nullable=True)
     studio_name = db.Column(db.String(200), nullable=True)
-    release_date = db.Column(db.Date, nullable=True)
+    release_date = db.Column(db.Date, nullable=True, index=True)
     
     # Status
     status = db.Column(db.String(50), default='wanted')  # wanted, requested, downloaded, failed
@@ -138,6 +166,123 @@ class WantedScene(db.Model):
     def __repr__(self):
         return f'<WantedScene {self.title}>'
 
+class Tag(db.Model):
+    """StashDB tag with its category; scenes link to tags through scene_tags"""
+    __tablename__ = 'tags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    stashdb_id = db.Column(db.String(50), unique=True, nullable=True)  # None until discovery sees a backfilled tag
+    name = db.Column(db.String(200), unique=True, nullable=False)
+    category = db.Column(db.String(200), nullable=True, index=True)
+    
+    def __repr__(self):
+        return f'<Tag {self.name}>'
+
+class SceneTag(db.Model):
+    """Scene-to-tag link; the (tag_id, scene_id) index answers "scenes with tag X" without a scan"""
+    __tablename__ = 'scene_tags'
+    __table_args__ = (db.Index('ix_scene_tags_tag_id', 'tag_id', 'scene_id'),)
+    
+    scene_id = db.Column(db.Integer, db.ForeignKey('scenes.id', ondelete='CASCADE'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+
+class OwnedScene(db.Model):
+    """Local index of StashDB IDs already present in the Stash library"""
+    __tablename__ = 'owned_scenes'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    stash_scene_id = db.Column(db.String(50), nullable=False, index=True)  # Scene ID in Stash
+    stashdb_id = db.Column(db.String(100), nullable=False, index=True)
+    endpoint = db.Column(db.String(200), nullable=True)
+    stash_updated_at = db.Column(db.DateTime, nullable=True)  # Stash's updated_at, used for incremental refresh
+    indexed_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<OwnedScene {self.stashdb_id}>'
+
+class DiscoveryCursor(db.Model):
+    """Position reached in a StashDB scene stream (e.g. the global new-scenes feed)"""
+    __tablename__ = 'discovery_cursors'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=True)  # StashDB 'created' time of the newest scene seen
+    scene_id = db.Column(db.String(50), nullable=True)  # StashDB ID of that scene
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DiscoveryCursor {self.name} {self.created_at}>'
+
+class DiscoveryRun(db.Model):
+    """One discovery run: state, checkpoint cursor and final statistics"""
+    __tablename__ = 'discovery_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running', index=True)  # running, completed, failed, abandoned
+    trigger = db.Column(db.String(20), nullable=True)  # scheduled, manual
+    engine = db.Column(db.String(20), nullable=True)
+    deep_resync = db.Column(db.Boolean, default=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)  # Last checkpoint
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_seconds = db.Column(db.Float, nullable=True)
+    resume_count = db.Column(db.Integer, default=0)
+    
+    # Checkpoint: entities finished so far ("performer:12", JSON list) and the page last written
+    completed_entities = db.Column(db.Text, default='[]')
+    current_entity = db.Column(db.String(50), nullable=True)
+    last_page = db.Column(db.Integer, default=0)
+    
+    new_scenes = db.Column(db.Integer, default=0)
+    filtered_scenes = db.Column(db.Integer, default=0)
+    pages_fetched = db.Column(db.Integer, default=0)
+    error_count = db.Column(db.Integer, default=0)
+    stats = db.Column(db.Text)  # JSON: per-entity timings and engine/pipeline reports
+    
+    def get_completed_entities(self):
+        """Get completed entity keys as list"""
+        try:
+            return json.loads(self.completed_entities) if self.completed_entities else []
+        except:
+            return []
+    
+    def set_completed_entities(self, keys):
+        """Set completed entity keys from list"""
+        self.completed_entities = json.dumps(keys) if keys else '[]'
+    
+    def get_stats(self):
+        try:
+            return json.loads(self.stats) if self.stats else {}
+        except:
+            return {}
+    
+    def to_dict(self, include_stats: bool = False):
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'trigger': self.trigger,
+            'engine': self.engine,
+            'deep_resync': self.deep_resync,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_seconds': self.duration_seconds,
+            'resume_count': self.resume_count,
+            'completed_entities': len(self.get_completed_entities()),
+            'current_entity': self.current_entity,
+            'last_page': self.last_page,
+            'new_scenes': self.new_scenes,
+            'filtered_scenes': self.filtered_scenes,
+            'pages_fetched': self.pages_fetched,
+            'error_count': self.error_count
+        }
+        if include_stats:
+            data['stats'] = self.get_stats()
+        return data
+    
+    def __repr__(self):
+        return f'<DiscoveryRun {self.id} {self.status}>'
+
 class Config(db.Model):
     """Model for application configuration"""
     __tablename__ = 'config'
@@ -208,7 +353,7 @@ class LogEntry(db.Model):
     level = db.Column(db.String(20), nullable=False)  # INFO, WARNING, ERROR
     message = db.Column(db.Text, nullable=False)
     module = db.Column(db.String(100), nullable=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<LogEntry {self.level}: {self.message[:50]}...>'
@@ -0,0 +1,147 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from .models import db, OwnedScene
+from .stash_api import StashAPI
+
+logger = logging.getLogger(__name__)
+
+class OwnedLibraryIndex:
+    """Set of StashDB scene IDs already in the Stash library, persisted in owned_scenes.
+    
+    The table is built once from a paginated export of every scene's stash_ids and then kept
+    current by re-reading only scenes whose updated_at moved. Scenes deleted from Stash don't
+    bump updated_at, so the whole index is rebuilt every OWNED_INDEX_REBUILD_DAYS days.
+    Lookups are plain set membership; if the index could not be loaded, is_owned falls back
+    to asking Stash per scene.
+    """
+    
+    def __init__(self, stash_api: StashAPI = None, page_size: int = None):
+        self.stash_api = stash_api or StashAPI()
+        self.page_size = page_size or int(os.environ.get('OWNED_INDEX_PAGE_SIZE', '1000'))
+        self.rebuild_days = int(os.environ.get('OWNED_INDEX_REBUILD_DAYS', '7'))
+        self._owned_ids: Optional[Set[str]] = None
+        self.fallback_checks = 0
+    
+    @property
+    def ready(self) -> bool:
+        return self._owned_ids is not None
+    
+    def refresh(self, full: bool = False) -> Dict:
+        """Bring the owned_scenes table up to date with Stash and load it into memory"""
+        results = {'mode': 'incremental', 'scenes_scanned': 0, 'owned_ids': 0}
+        
+        try:
+            last_updated, oldest_indexed = db.session.query(
+                db.func.max(OwnedScene.stash_updated_at),
+                db.func.min(OwnedScene.indexed_date)
+            ).one()
+            
+            stale = oldest_indexed is None or (
+                self.rebuild_days and oldest_indexed < datetime.utcnow() - timedelta(days=self.rebuild_days)
+            )
+            
+            if full or stale or last_updated is None:
+                results['mode'] = 'full'
+                results['scenes_scanned'] = self._rebuild()
+            else:
+                results['scenes_scanned'] = self._apply_changes_since(last_updated)
+            
+            db.session.commit()
+            self.load()
+            results['owned_ids'] = len(self._owned_ids)
+            logger.info(f"Owned library index refreshed ({results['mode']}): {results['scenes_scanned']} scenes scanned, {results['owned_ids']} StashDB IDs owned")
+        
+        except Exception as e:
+            db.session.rollback()
+            self._owned_ids = None
+            logger.error(f"Failed to refresh owned library index, falling back to per-scene checks: {str(e)}")
+            results['error'] = str(e)
+        
+        return results
+    
+    def load(self) -> Set[str]:
+        """Load the persisted index into memory"""
+        self._owned_ids = {row.stashdb_id for row in db.session.query(OwnedScene.stashdb_id).all()}
+        return self._owned_ids
+    
+    def is_owned(self, stashdb_id: str) -> bool:
+        """Check if a StashDB scene is already in the library"""
+        if self._owned_ids is not None:
+            return stashdb_id in self._owned_ids
+        
+        self.fallback_checks += 1
+        return self.stash_api.check_scene_exists(stashdb_id)
+    
+    def __contains__(self, stashdb_id: str) -> bool:
+        return self.is_owned(stashdb_id)
+    
+    def _rebuild(self) -> int:
+        """Replace the whole table with a fresh export (fetched fully before anything is deleted)"""
+        scenes = self._export()
+        db.session.query(OwnedScene).delete(synchronize_session=False)
+        self._insert_rows(scenes)
+        return len(scenes)
+    
+    def _apply_changes_since(self, last_updated: datetime) -> int:
+        """Re-index only the scenes Stash reports as updated since the newest one we have"""
+        scenes = self._export(updated_since=last_updated.replace(tzinfo=timezone.utc).isoformat())
+        if not scenes:
+            return 0
+        
+        changed_ids = [scene['id'] for scene in scenes]
+        for start in range(0, len(changed_ids), 500):
+            db.session.query(OwnedScene).filter(
+                OwnedScene.stash_scene_id.in_(changed_ids[start:start + 500])
+            ).delete(synchronize_session=False)
+        self._insert_rows(scenes)
+        return len(scenes)
+    
+    def _export(self, updated_since: str = None) -> List[Dict]:
+        """Page through Stash's scenes (only id, updated_at and stash_ids)"""
+        scenes = []
+        page = 1
+        
+        while True:
+            result = self.stash_api.get_scene_stash_ids(page=page, per_page=self.page_size, updated_since=updated_since)
+            items = result.get('scenes', [])
+            scenes.extend(items)
+            
+            if len(items) < self.page_size or len(scenes) >= result.get('count', 0):
+                break
+            page += 1
+        
+        return scenes
+    
+    def _insert_rows(self, scenes: List[Dict]):
+        now = datetime.utcnow()
+        rows = []
+        for scene in scenes:
+            updated_at = parse_stash_timestamp(scene.get('updated_at'))
+            for stash_id in scene.get('stash_ids') or []:
+                if stash_id.get('stash_id'):
+                    rows.append({
+                        'stash_scene_id': str(scene['id']),
+                        'stashdb_id': stash_id['stash_id'],
+                        'endpoint': stash_id.get('endpoint'),
+                        'stash_updated_at': updated_at,
+                        'indexed_date': now
+                    })
+        
+        if rows:
+            db.session.execute(OwnedScene.__table__.insert(), rows)
+
+def parse_stash_timestamp(value: str) -> Optional[datetime]:
+    """Parse Stash's RFC 3339 timestamps into naive UTC datetimes"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        logger.warning(f"Could not parse Stash timestamp: {value}")
+        return None
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
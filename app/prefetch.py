@@ -0,0 +1,115 @@
+import logging
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+def get_prefetch_depth() -> int:
+    """Pages fetched ahead of the consumer (PREFETCH_DEPTH, 0 = fetch inline)"""
+    try:
+        return max(0, int(os.environ.get('PREFETCH_DEPTH', '2')))
+    except ValueError:
+        return 2
+
+class PrefetchingPager:
+    """Iterate over (page_num, result) while later pages are fetched on a background thread.
+    
+    fetch_page(page_num) is called for page_num = start, start + 1, ... until is_last(page_num,
+    result) is true or max_pages is reached. At most `depth` fetched pages wait in the buffer,
+    so the fetcher stays a bounded distance ahead of the consumer. A consumer that stops early
+    (end of new data, a watermark) should close() the pager - or use it as a context manager -
+    which stops the fetcher after the request it is making. An exception from fetch_page is
+    re-raised to the consumer at the page where it happened.
+    """
+    
+    def __init__(self, fetch_page: Callable[[int], Any], is_last: Callable[[int, Any], bool] = None,
+                 start: int = 1, max_pages: int = None, depth: int = None, name: str = 'pager'):
+        self.fetch_page = fetch_page
+        self.is_last = is_last or (lambda page_num, result: not result)
+        self.start = start
+        self.max_pages = max_pages
+        self.depth = get_prefetch_depth() if depth is None else max(0, depth)
+        self.name = name
+        self._buffer = queue.Queue(maxsize=max(1, self.depth))
+        self._cancelled = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    def __iter__(self) -> Iterator[Tuple[int, Any]]:
+        if self.depth == 0:
+            yield from self._fetch_inline()
+            return
+        
+        self._thread = threading.Thread(target=self._produce, name=f'prefetch-{self.name}', daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._buffer.get()
+                if item is _END:
+                    return
+                page_num, result, error = item
+                if error is not None:
+                    raise error
+                yield page_num, result
+        finally:
+            self.close()
+    
+    def close(self):
+        """Stop fetching further pages and release the background thread"""
+        self._cancelled.set()
+        # Drain so a fetcher blocked on a full buffer can see the cancellation
+        while True:
+            try:
+                self._buffer.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=0.1)
+    
+    def _page_numbers(self):
+        page_num = self.start
+        while self.max_pages is None or page_num < self.start + self.max_pages:
+            yield page_num
+            page_num += 1
+    
+    def _fetch_inline(self) -> Iterator[Tuple[int, Any]]:
+        for page_num in self._page_numbers():
+            result = self.fetch_page(page_num)
+            yield page_num, result
+            if self.is_last(page_num, result):
+                return
+    
+    def _produce(self):
+        try:
+            for page_num in self._page_numbers():
+                if self._cancelled.is_set():
+                    return
+                try:
+                    result = self.fetch_page(page_num)
+                except Exception as e:
+                    self._put((page_num, None, e))
+                    return
+                if not self._put((page_num, result, None)) or self.is_last(page_num, result):
+                    return
+        finally:
+            self._put(_END)
+    
+    def _put(self, item) -> bool:
+        """Block until the buffer has room; False if the pager was closed meanwhile"""
+        while not self._cancelled.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
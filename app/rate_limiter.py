@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean the server wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+class AdaptiveRateLimiter:
+    """Token bucket plus an AIMD concurrency window for requests to a shared service.
+    
+    Every request takes a token (refilled at `rate` per second, up to `burst`) and a slot in
+    the concurrency window. Healthy responses grow both additively; a 429/503, a 5xx, a
+    connection error or a response slower than slow_seconds halves both, at most once per
+    cooldown so one burst of failures counts as one event. Retry-After pauses all requests.
+    rate never exceeds max_rate, which should be set at or below the service's published limit.
+    """
+    
+    def __init__(self, name: str, max_rate: float = None, min_rate: float = None, max_window: int = None,
+                 slow_seconds: float = None, cooldown: float = 2.0):
+        self.name = name
+        self.max_rate = max_rate or float(os.environ.get('STASHDB_MAX_REQUESTS_PER_SECOND', '5'))
+        self.min_rate = min(self.max_rate, min_rate or float(os.environ.get('STASHDB_MIN_REQUESTS_PER_SECOND', '0.2')))
+        self.max_window = max(1, max_window or int(os.environ.get('STASHDB_MAX_CONCURRENCY', '4')))
+        self.slow_seconds = slow_seconds or float(os.environ.get('STASHDB_SLOW_RESPONSE_SECONDS', '5'))
+        self.cooldown = cooldown
+        
+        # Start halfway and let healthy responses ramp up to the ceiling
+        self.rate = max(self.min_rate, self.max_rate / 2)
+        self.rate_step = self.max_rate / 50
+        self.window = max(1.0, self.max_window / 2)
+        self.burst = max(1.0, self.max_rate)
+        self.tokens = 1.0
+        
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.throttle_events = deque(maxlen=50)
+        self.counters = {'requests': 0, 'throttled': 0, 'slow': 0, 'errors': 0, 'wait_seconds': 0.0}
+        self.avg_latency = None
+    
+    def acquire(self) -> float:
+        """Block until a token and a window slot are free; returns a ticket for release()"""
+        requested = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= int(self.window):
+                    wait = None
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    self.counters['requests'] += 1
+                    self.counters['wait_seconds'] += now - requested
+                    return now
+                
+                self._cond.wait(wait)
+    
+    def release(self, ticket: float, response=None, error: str = None):
+        """Record the outcome of a request started with acquire()"""
+        latency = time.monotonic() - ticket
+        status_code = getattr(response, 'status_code', None)
+        
+        with self._cond:
+            self.in_flight -= 1
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+            
+            if status_code in THROTTLE_STATUSES:
+                self.counters['throttled'] += 1
+                self._pause(response.headers.get('Retry-After'))
+                self._decrease(f'HTTP {status_code}')
+            elif error or (status_code is not None and status_code >= 500):
+                self.counters['errors'] += 1
+                self._decrease(error or f'HTTP {status_code}')
+            elif latency > self.slow_seconds:
+                self.counters['slow'] += 1
+                self._decrease(f'slow response ({latency:.1f}s)')
+            else:
+                self._increase()
+            
+            self._cond.notify_all()
+    
+    def status(self) -> Dict:
+        with self._cond:
+            return {
+                'name': self.name,
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'window': round(self.window, 2),
+                'max_window': self.max_window,
+                'in_flight': self.in_flight,
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 1),
+                'avg_latency': round(self.avg_latency, 3) if self.avg_latency is not None else None,
+                'counters': dict(self.counters, wait_seconds=round(self.counters['wait_seconds'], 1)),
+                'throttle_events': list(self.throttle_events)
+            }
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+    
+    def _increase(self):
+        # Additive increase: about one extra window slot per window's worth of healthy responses
+        self.window = min(float(self.max_window), self.window + 1 / self.window)
+        self.rate = min(self.max_rate, self.rate + self.rate_step)
+    
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        
+        self.window = max(1.0, self.window / 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.throttle_events.append({
+            'time': datetime.utcnow().isoformat(),
+            'reason': reason,
+            'rate': round(self.rate, 3),
+            'window': round(self.window, 2)
+        })
+        logger.warning(f"{self.name} throttled ({reason}): rate {self.rate:.2f}/s, window {self.window:.1f}")
+    
+    def _pause(self, retry_after: Optional[str]):
+        if not retry_after:
+            return
+        try:
+            self.paused_until = max(self.paused_until, time.monotonic() + min(float(retry_after), 300.0))
+        except ValueError:
+            pass
+
+_stashdb_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_stashdb_limiter() -> AdaptiveRateLimiter:
+    """Process-wide limiter shared by every StashDBAPI instance"""
+    global _stashdb_limiter
+    with _limiter_lock:
+        if _stashdb_limiter is None:
+            _stashdb_limiter = AdaptiveRateLimiter('StashDB')
+        return _stashdb_limiter
@@ -0,0 +1,145 @@
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from .filter_engine import FilterEngine
+from .models import db, Scene, WantedScene, Performer, Studio
+from .scene_tags import scenes_with_terms, unlinked_scenes_query, uncategorised_scenes_query
+from .tag_bitmaps import get_tag_bitmaps
+
+logger = logging.getLogger(__name__)
+
+# Rows read per round trip, and ids per IN (...) clause (SQLite's bound-parameter limit)
+READ_BATCH = 5000
+WRITE_CHUNK = 500
+
+def _load_list(value: str) -> List[str]:
+    if not value:
+        return []
+    try:
+        loaded = json.loads(value)
+    except ValueError:
+        return []
+    return loaded if isinstance(loaded, list) else []
+
+def _chunks(ids: List[int]):
+    for start in range(0, len(ids), WRITE_CHUNK):
+        yield ids[start:start + WRITE_CHUNK]
+
+def refilter_stored_scenes(config, dry_run: bool = False) -> Dict:
+    """Re-apply the current filters to every stored scene, from its stored tags only (no network).
+    
+    Scenes carrying an unwanted or required term are looked up through the scene_tags index,
+    then every scene's duration and current verdict is read in batches and only changed
+    verdicts are kept; the changes are written as set-based UPDATE/INSERT/DELETE statements,
+    grouped by filter reason. Newly filtered scenes
+    leave the wanted list unless they were already sent to Whisparr; scenes that now pass and
+    are not owned are added to it.
+    """
+    started = time.monotonic()
+    engine = FilterEngine.from_config(config)
+    
+    newly_filtered: Dict[str, List[int]] = defaultdict(list)  # reason -> scene ids
+    reason_changed: Dict[str, List[int]] = defaultdict(list)
+    unfiltered: List[int] = []
+    by_code = Counter()
+    scanned = 0
+    
+    # Only the filter terms matter: read the scenes carrying them through the tag index, plus
+    # the JSON columns of any scene the scene_tags backfill has not covered, and the JSON
+    # categories of scenes linked to tags whose category is not known yet
+    matches = scenes_with_terms(engine.unwanted | engine.required)
+    for scene_id, tags, categories in unlinked_scenes_query().yield_per(READ_BATCH):
+        matches[scene_id] = engine.fold_terms(_load_list(tags) + _load_list(categories))
+    for scene_id, categories in uncategorised_scenes_query().yield_per(READ_BATCH):
+        matches[scene_id] = matches.get(scene_id, set()) | engine.fold_terms(_load_list(categories))
+    no_terms = frozenset()
+    
+    rows = db.session.query(
+        Scene.id, Scene.duration, Scene.is_filtered, Scene.filter_reason
+    ).yield_per(READ_BATCH)
+    for scene_id, duration, was_filtered, old_reason in rows:
+        scanned += 1
+        terms = matches.get(scene_id, no_terms)
+        is_filtered, code, term = engine.evaluate_terms(terms, duration)
+        
+        if is_filtered:
+            reason = engine.describe(code, term, duration)
+            if not was_filtered:
+                newly_filtered[reason].append(scene_id)
+                by_code[code] += 1
+            elif reason != old_reason:
+                reason_changed[reason].append(scene_id)
+        elif was_filtered:
+            unfiltered.append(scene_id)
+    
+    report = {
+        'scanned': scanned,
+        'newly_filtered': sum(len(ids) for ids in newly_filtered.values()),
+        'unfiltered': len(unfiltered),
+        'reason_changed': sum(len(ids) for ids in reason_changed.values()),
+        'wanted_added': 0,
+        'wanted_removed': 0,
+        'dry_run': dry_run,
+        'newly_filtered_by_code': dict(by_code)
+    }
+    
+    if not dry_run:
+        try:
+            for reason, ids in newly_filtered.items():
+                for chunk in _chunks(ids):
+                    db.session.query(Scene).filter(Scene.id.in_(chunk)).update(
+                        {Scene.is_filtered: True, Scene.filter_reason: reason, Scene.is_wanted: False},
+                        synchronize_session=False
+                    )
+                    # Scenes already requested from Whisparr keep their history
+                    report['wanted_removed'] += db.session.query(WantedScene).filter(
+                        WantedScene.scene_id.in_(chunk),
+                        WantedScene.status == 'wanted',
+                        db.func.coalesce(WantedScene.added_to_whisparr, False) == False
+                    ).delete(synchronize_session=False)
+            
+            for reason, ids in reason_changed.items():
+                for chunk in _chunks(ids):
+                    db.session.query(Scene).filter(Scene.id.in_(chunk)).update(
+                        {Scene.filter_reason: reason}, synchronize_session=False
+                    )
+            
+            now = datetime.utcnow()
+            for chunk in _chunks(unfiltered):
+                db.session.query(Scene).filter(Scene.id.in_(chunk)).update(
+                    {Scene.is_filtered: False, Scene.filter_reason: None}, synchronize_session=False
+                )
+                not_owned = db.func.coalesce(Scene.is_owned, False) == False
+                wanted_rows = db.select(
+                    Scene.id, Scene.title, Performer.name, Studio.name, Scene.release_date,
+                    db.literal('wanted'), db.literal(False), db.literal(now)
+                ).outerjoin(Performer, Scene.performer_id == Performer.id).outerjoin(
+                    Studio, Scene.studio_id == Studio.id
+                ).where(
+                    Scene.id.in_(chunk), not_owned,
+                    ~db.exists().where(WantedScene.scene_id == Scene.id)
+                )
+                report['wanted_added'] += db.session.execute(db.insert(WantedScene).from_select(
+                    ['scene_id', 'title', 'performer_name', 'studio_name', 'release_date',
+                     'status', 'added_to_whisparr', 'added_date'],
+                    wanted_rows
+                )).rowcount
+                db.session.query(Scene).filter(Scene.id.in_(chunk), not_owned).update(
+                    {Scene.is_wanted: True}, synchronize_session=False
+                )
+            
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        get_tag_bitmaps().mark_stale()
+    
+    report['seconds'] = round(time.monotonic() - started, 3)
+    logger.info(f"Re-filtered {scanned} stored scenes in {report['seconds']}s: {report['newly_filtered']} newly filtered, "
+                f"{report['unfiltered']} no longer filtered, {report['wanted_added']} added to and "
+                f"{report['wanted_removed']} removed from the wanted list" + (" (dry run)" if dry_run else ""))
+    return report
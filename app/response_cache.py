@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default freshness per query kind, in seconds (override with STASHDB_CACHE_TTL_<KIND>)
+DEFAULT_TTLS = {
+    'tags': 7 * 86400,
+    'search': 86400,
+    'scene': 86400,
+    'trending': 6 * 3600
+}
+
+class ResponseCache:
+    """SQLite-backed cache for StashDB responses that change slowly.
+    
+    Entries are keyed by a hash of the query kind, normalised query text and variables, and
+    live in their own database file so cache churn never contends with the main database.
+    Expired entries are still served for STASHDB_CACHE_STALE_SECONDS while a background
+    thread refetches them; beyond that they count as misses. Once the table grows past
+    max_entries the least recently read entries are evicted.
+    """
+    
+    def __init__(self, path: str = None, max_entries: int = None, stale_seconds: int = None):
+        if path is None:
+            default_dir = os.path.dirname(os.environ.get('DATABASE_PATH', '/app/data/stash_filter.db'))
+            path = os.environ.get('STASHDB_CACHE_PATH', os.path.join(default_dir, 'stashdb_cache.db'))
+        self.path = path
+        self.enabled = bool(path) and os.environ.get('STASHDB_CACHE_ENABLED', 'true').lower() == 'true'
+        self.max_entries = max_entries or int(os.environ.get('STASHDB_CACHE_MAX_ENTRIES', '5000'))
+        self.stale_seconds = stale_seconds if stale_seconds is not None else int(os.environ.get('STASHDB_CACHE_STALE_SECONDS', '86400'))
+        self.ttls = {
+            kind: int(os.environ.get(f'STASHDB_CACHE_TTL_{kind.upper()}', str(ttl)))
+            for kind, ttl in DEFAULT_TTLS.items()
+        }
+        
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._writes_since_evict = 0
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'revalidations': 0, 'evictions': 0, 'errors': 0}
+        
+        if self.enabled:
+            try:
+                self._create_table()
+            except Exception as e:
+                logger.error(f"StashDB response cache disabled, could not open {self.path}: {str(e)}")
+                self.enabled = False
+    
+    @staticmethod
+    def make_key(kind: str, query: str, variables: Dict = None) -> str:
+        normalised_query = ' '.join(query.split())
+        payload = json.dumps([kind, normalised_query, variables or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def fetch(self, kind: str, query: str, variables: Dict, loader: Callable[[], Any]) -> Any:
+        """Return a cached response for (query, variables), calling loader() on a miss.
+        
+        Anything loader() raises propagates and nothing is cached.
+        """
+        if not self.enabled:
+            return loader()
+        
+        key = self.make_key(kind, query, variables)
+        entry = self._read(key)
+        if entry is not None:
+            value, age = entry
+            ttl = self.ttls.get(kind, 0)
+            if age < ttl:
+                self._count('hits')
+                return value
+            if age < ttl + self.stale_seconds:
+                self._count('stale_hits')
+                self._revalidate(key, kind, loader)
+                return value
+        
+        self._count('misses')
+        value = loader()
+        self.put(key, kind, value)
+        return value
+    
+    def get(self, kind: str, query: str, variables: Dict = None) -> Tuple[bool, Any]:
+        """(found, value) for a fresh entry; stale entries count as misses here"""
+        if not self.enabled:
+            return False, None
+        
+        entry = self._read(self.make_key(kind, query, variables))
+        if entry is not None and entry[1] < self.ttls.get(kind, 0):
+            self._count('hits')
+            return True, entry[0]
+        
+        self._count('misses')
+        return False, None
+    
+    def set(self, kind: str, query: str, variables: Dict, value: Any):
+        if self.enabled:
+            self.put(self.make_key(kind, query, variables), kind, value)
+    
+    def put(self, key: str, kind: str, value: Any):
+        try:
+            now = time.time()
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, kind, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                    (key, kind, json.dumps(value), now, now)
+                )
+            
+            with self._lock:
+                self._writes_since_evict += 1
+                evict = self._writes_since_evict >= 100
+                if evict:
+                    self._writes_since_evict = 0
+            if evict:
+                self.evict()
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Could not write StashDB response cache entry: {str(e)}")
+    
+    def evict(self) -> int:
+        """Drop the least recently read entries beyond max_entries"""
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                '''DELETE FROM response_cache WHERE key IN (
+                       SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                   )''',
+                (self.max_entries,)
+            )
+        evicted = cursor.rowcount or 0
+        if evicted:
+            self._count('evictions', evicted)
+            logger.info(f"Evicted {evicted} StashDB response cache entries")
+        return evicted
+    
+    def clear(self, kind: str = None):
+        conn = self._connection()
+        with conn:
+            if kind:
+                conn.execute('DELETE FROM response_cache WHERE kind = ?', (kind,))
+            else:
+                conn.execute('DELETE FROM response_cache')
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.counters)
+        stats['enabled'] = self.enabled
+        if self.enabled:
+            try:
+                stats['entries'] = self._connection().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+            except Exception as e:
+                stats['entries'] = None
+                logger.warning(f"Could not count StashDB response cache entries: {str(e)}")
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else None
+        return stats
+    
+    def _read(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, age in seconds) for key, touching its last_access, or None"""
+        try:
+            conn = self._connection()
+            row = conn.execute('SELECT value, created_at FROM response_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            with conn:
+                conn.execute('UPDATE response_cache SET last_access = ? WHERE key = ?', (now, key))
+            return json.loads(row[0]), now - row[1]
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Could not read StashDB response cache: {str(e)}")
+            return None
+    
+    def _revalidate(self, key: str, kind: str, loader: Callable[[], Any]):
+        """Refetch a stale entry in the background, at most once at a time per key"""
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        
+        def refresh():
+            try:
+                self.put(key, kind, loader())
+                self._count('revalidations')
+            except Exception as e:
+                self._count('errors')
+                logger.warning(f"Background refresh of cached StashDB {kind} response failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+        
+        threading.Thread(target=refresh, name='stashdb-cache-refresh', daemon=True).start()
+    
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+    
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so each thread opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+    
+    def _create_table(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_last_access ON response_cache (last_access)')
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide StashDB response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
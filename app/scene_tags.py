@@ -0,0 +1,161 @@
+import logging
+from typing import Dict, Iterable, List, Set
+
+from .models import db, Scene, Tag, SceneTag
+
+logger = logging.getLogger(__name__)
+
+# ids per IN (...) clause, under SQLite's bound-parameter limit
+CHUNK = 500
+
+def _chunks(values: List):
+    for start in range(0, len(values), CHUNK):
+        yield values[start:start + CHUNK]
+
+def resolve_tag_ids(tags: List[Dict]) -> Dict[str, int]:
+    """{tag name: tags.id} for StashDB tag dicts, inserting unknown tags.
+    
+    Tags are matched by StashDB id, then by name; a tag backfilled from a name only gets its
+    StashDB id and category filled in here.
+    """
+    names = [tag['name'] for tag in tags]
+    stashdb_ids = [tag['id'] for tag in tags if tag.get('id')]
+    by_stashdb_id, by_name = {}, {}
+    for chunk in _chunks(names):
+        for row in Tag.query.filter(Tag.name.in_(chunk)).all():
+            by_name[row.name] = row
+    for chunk in _chunks(stashdb_ids):
+        for row in Tag.query.filter(Tag.stashdb_id.in_(chunk)).all():
+            by_stashdb_id[row.stashdb_id] = row
+    
+    tag_ids = {}
+    new_rows = []
+    for tag in tags:
+        name = tag['name']
+        row = by_stashdb_id.get(tag.get('id')) or by_name.get(name)
+        if row is None:
+            new_rows.append({'stashdb_id': tag.get('id'), 'name': name, 'category': tag.get('category')})
+            continue
+        if tag.get('id') and row.stashdb_id is None:
+            row.stashdb_id = tag['id']
+        if tag.get('category') and row.category != tag['category']:
+            row.category = tag['category']
+        # Renamed on StashDB
+        if row.name != name and name not in by_name:
+            row.name = name
+        tag_ids[name] = row.id
+    
+    if new_rows:
+        db.session.execute(Tag.__table__.insert().prefix_with('OR IGNORE'), new_rows)
+        for chunk in _chunks([row['name'] for row in new_rows]):
+            tag_ids.update(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(chunk)).all())
+    return tag_ids
+
+def store_scene_tags(scene_tags: Dict[int, List[Dict]]) -> int:
+    """Link stored scenes ({scenes.id: StashDB tag list}) to their tags; returns links written"""
+    tags = {}
+    for tag_list in scene_tags.values():
+        for tag in tag_list or ():
+            if tag.get('name'):
+                tags.setdefault(tag['name'], tag)
+    if not tags:
+        return 0
+    
+    tag_ids = resolve_tag_ids(list(tags.values()))
+    links = [
+        {'scene_id': scene_id, 'tag_id': tag_ids[name]}
+        for scene_id, tag_list in scene_tags.items()
+        for name in {tag['name'] for tag in tag_list or () if tag.get('name')}
+    ]
+    db.session.execute(SceneTag.__table__.insert().prefix_with('OR IGNORE'), links)
+    return len(links)
+
+def delete_scene_tags(scene_ids: List[int]) -> int:
+    """Remove the tag links of scenes about to be deleted"""
+    deleted = 0
+    for chunk in _chunks(list(scene_ids)):
+        deleted += db.session.query(SceneTag).filter(SceneTag.scene_id.in_(chunk)).delete(synchronize_session=False)
+    return deleted
+
+def scenes_with_terms(terms: Iterable[str]) -> Dict[int, Set[str]]:
+    """{scene id: matched terms} for scenes with a tag whose lowercased name or category is in terms.
+    
+    The tag table is small, so terms are resolved against it first; scenes are then read
+    through the (tag_id, scene_id) index for just the matching tags.
+    """
+    terms = list({term.lower() for term in terms})
+    if not terms:
+        return {}
+    
+    tag_terms: Dict[int, Set[str]] = {}
+    for chunk in _chunks(terms):
+        wanted = set(chunk)
+        for tag_id, name, category in db.session.query(
+                Tag.id, db.func.lower(Tag.name), db.func.lower(Tag.category)
+        ).filter(db.or_(db.func.lower(Tag.name).in_(chunk), db.func.lower(Tag.category).in_(chunk))).all():
+            tag_terms.setdefault(tag_id, set()).update(term for term in (name, category) if term in wanted)
+    
+    matches: Dict[int, Set[str]] = {}
+    for chunk in _chunks(list(tag_terms)):
+        for scene_id, tag_id in db.session.query(SceneTag.scene_id, SceneTag.tag_id).filter(SceneTag.tag_id.in_(chunk)).all():
+            matches.setdefault(scene_id, set()).update(tag_terms[tag_id])
+    return matches
+
+def unlinked_scenes_query():
+    """Scenes that have JSON tags but no scene_tags links (stored before migration 010 ran)"""
+    return db.session.query(Scene.id, Scene.tags, Scene.categories).filter(
+        Scene.tags.isnot(None),
+        ~db.exists().where(SceneTag.scene_id == Scene.id)
+    )
+
+def uncategorised_scenes_query():
+    """Scenes linked to a tag with no known category, with their JSON categories.
+    
+    Migration 010 only learns a tag's category from scenes whose name and category lists line
+    up, so backfilled tags can lack one until discovery sees them again; the scene's own
+    categories column still holds what StashDB reported for it.
+    """
+    uncategorised = db.select(SceneTag.scene_id).join(Tag, Tag.id == SceneTag.tag_id).where(Tag.category.is_(None))
+    return db.session.query(Scene.id, Scene.categories).filter(
+        Scene.categories.isnot(None),
+        Scene.id.in_(uncategorised)
+    )
+
+def tag_statistics(limit: int = 50, category: str = None) -> Dict:
+    """Per-tag and per-category scene counts (total, filtered, wanted, owned), from the join table"""
+    counts = (
+        db.func.count(SceneTag.scene_id),
+        db.func.sum(db.case((Scene.is_filtered == True, 1), else_=0)),
+        db.func.sum(db.case((Scene.is_wanted == True, 1), else_=0)),
+        db.func.sum(db.case((Scene.is_owned == True, 1), else_=0))
+    )
+    
+    tag_query = db.session.query(Tag.name, Tag.category, *counts).join(
+        SceneTag, SceneTag.tag_id == Tag.id
+    ).join(Scene, Scene.id == SceneTag.scene_id).group_by(Tag.id)
+    if category:
+        tag_query = tag_query.filter(Tag.category == category)
+    tags = [
+        {'name': name, 'category': tag_category, 'scenes': scenes, 'filtered': filtered or 0,
+         'wanted': wanted or 0, 'owned': owned or 0}
+        for name, tag_category, scenes, filtered, wanted, owned in
+        tag_query.order_by(counts[0].desc()).limit(limit).all()
+    ]
+    
+    # A scene with several tags in one category counts once for it
+    per_scene = db.session.query(Tag.category.label('category'), Scene.id.label('scene_id'),
+                                 Scene.is_filtered, Scene.is_wanted, Scene.is_owned).join(
+        SceneTag, SceneTag.tag_id == Tag.id
+    ).join(Scene, Scene.id == SceneTag.scene_id).filter(Tag.category.isnot(None)).distinct().subquery()
+    categories = [
+        {'category': name, 'scenes': scenes, 'filtered': filtered or 0, 'wanted': wanted or 0, 'owned': owned or 0}
+        for name, scenes, filtered, wanted, owned in db.session.query(
+            per_scene.c.category,
+            db.func.count(per_scene.c.scene_id),
+            db.func.sum(db.case((per_scene.c.is_filtered == True, 1), else_=0)),
+            db.func.sum(db.case((per_scene.c.is_wanted == True, 1), else_=0)),
+            db.func.sum(db.case((per_scene.c.is_owned == True, 1), else_=0))
+        ).group_by(per_scene.c.category).order_by(db.func.count(per_scene.c.scene_id).desc()).all()
+    ]
+    
+    return {'tags': tags, 'categories': categories}
@@ -1,11 +1,12 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import logging
 import os
-from datetime import datetime
 
+from .check_schedule import use_adaptive_schedule, get_schedule_tick_minutes
+from .cleanup import run_cleanup
 from .discovery import run_discovery_task
-from .models import db, LogEntry
 
 logger = logging.getLogger(__name__)
 
@@ -13,14 +14,24 @@ def setup_scheduler():
     """Setup the background scheduler for daily tasks"""
     scheduler = BackgroundScheduler()
     
-    # Daily discovery task - runs at 6 AM
-    scheduler.add_job(
-        func=scheduled_discovery,
-        trigger=CronTrigger(hour=6, minute=0),
-        id='daily_discovery',
-        name='Daily Scene Discovery',
-        replace_existing=True
-    )
+    if use_adaptive_schedule():
+        # Frequent ticks; each run only crawls the entities whose release cadence makes them due
+        scheduler.add_job(
+            func=scheduled_discovery,
+            trigger=IntervalTrigger(minutes=get_schedule_tick_minutes()),
+            id='adaptive_discovery',
+            name='Adaptive Scene Discovery',
+            replace_existing=True
+        )
+    else:
+        # Daily discovery task - runs at 6 AM
+        scheduler.add_job(
+            func=scheduled_discovery,
+            trigger=CronTrigger(hour=6, minute=0),
+            id='daily_discovery',
+            name='Daily Scene Discovery',
+            replace_existing=True
+        )
     
     # Weekly cleanup task - runs on Sundays at 2 AM
     scheduler.add_job(
@@ -34,102 +45,65 @@ def setup_scheduler():
     try:
         scheduler.start()
         logger.info("Scheduler started successfully")
-        log_message("INFO", "Scheduler started successfully", "scheduler")
     except Exception as e:
         logger.error(f"Failed to start scheduler: {str(e)}")
-        log_message("ERROR", f"Failed to start scheduler: {str(e)}", "scheduler")
 
 def scheduled_discovery():
     """Scheduled task for daily scene discovery"""
     logger.info("Starting scheduled discovery task")
-    log_message("INFO", "Starting scheduled discovery task", "scheduler")
     
     try:
-        result = run_discovery_task()
+        result = run_discovery_task(trigger='scheduled')
+        if result.get('status') == 'busy':
+            logger.warning(result['message'], extra={'db_module': 'discovery'})
+            return
+        if result.get('status') == 'not_due':
+            # Routine on adaptive ticks; kept out of the database log
+            logger.info(result['message'])
+            return
         
         # Log the results
         message = f"Discovery completed: {result.get('new_scenes', 0)} new scenes, {result.get('wanted_added', 0)} added to wanted list"
-        logger.info(message)
-        log_message("INFO", message, "discovery")
+        logger.info(message, extra={'db_module': 'discovery'})
         
     except Exception as e:
         error_msg = f"Scheduled discovery failed: {str(e)}"
-        logger.error(error_msg)
-        log_message("ERROR", error_msg, "discovery")
+        logger.error(error_msg, extra={'db_module': 'discovery'})
 
 def scheduled_cleanup():
     """Scheduled task for weekly database cleanup"""
     logger.info("Starting scheduled cleanup task")
-    log_message("INFO", "Starting scheduled cleanup task", "scheduler")
     
     try:
-        from .models import Scene, WantedScene, LogEntry
-        from datetime import datetime, timedelta
-        
-        cleanup_count = 0
-        
-        # Clean up old log entries (keep only last 30 days)
-        old_logs = LogEntry.query.filter(
-            LogEntry.timestamp < datetime.utcnow() - timedelta(days=30)
-        ).all()
+        report = run_cleanup()
         
-        for log in old_logs:
-            db.session.delete(log)
-            cleanup_count += 1
-        
-        # Clean up filtered scenes older than 90 days
-        old_filtered_scenes = Scene.query.filter(
-            Scene.is_filtered == True,
-            Scene.discovered_date < datetime.utcnow() - timedelta(days=90)
-        ).all()
-        
-        for scene in old_filtered_scenes:
-            # Also remove associated wanted entries
-            wanted_entries = WantedScene.query.filter_by(scene_id=scene.id).all()
-            for wanted in wanted_entries:
-                db.session.delete(wanted)
-            
-            db.session.delete(scene)
-            cleanup_count += 1
-        
-        db.session.commit()
-        
-        message = f"Cleanup completed: {cleanup_count} records removed"
-        logger.info(message)
-        log_message("INFO", message, "cleanup")
+        message = (f"Cleanup completed: {report['rows_deleted']} records removed "
+                   f"({report['logs_deleted']} logs, {report['scenes_deleted']} filtered scenes, "
+                   f"{report['wanted_deleted']} wanted entries, {report['scene_tags_deleted']} tag links) "
+                   f"in {report['delete_seconds']}s, {report['rows_per_second']} rows/s; "
+                   f"{report['vacuum']['bytes_freed'] // 1024} KiB reclaimed")
+        logger.info(message, extra={'db_module': 'cleanup'})
+        return report
         
     except Exception as e:
         error_msg = f"Scheduled cleanup failed: {str(e)}"
-        logger.error(error_msg)
-        log_message("ERROR", error_msg, "cleanup")
+        logger.error(error_msg, extra={'db_module': 'cleanup'})
 
-def manual_discovery():
-    """Manually trigger discovery task"""
-    logger.info("Manual discovery triggered")
-    log_message("INFO", "Manual discovery triggered", "manual")
+def manual_discovery(deep_resync: bool = False):
+    """Manually trigger discovery task (deep_resync walks every catalogue in full)"""
+    logger.info("Manual discovery triggered", extra={'db_module': 'manual'})
     
     try:
-        result = run_discovery_task()
+        result = run_discovery_task(deep_resync=deep_resync, trigger='manual')
         return result
     except Exception as e:
         error_msg = f"Manual discovery failed: {str(e)}"
-        logger.error(error_msg)
-        log_message("ERROR", error_msg, "discovery")
+        logger.error(error_msg, extra={'db_module': 'discovery'})
         raise
 
 def log_message(level: str, message: str, module: str = None):
-    """Log a message to the database"""
-    try:
-        log_entry = LogEntry(
-            level=level,
-            message=message,
-            module=module,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        logger.error(f"Failed to log message to database: {str(e)}")
+    """Log a message to the database (kept for callers; records go through the buffered log sink)"""
+    logger.log(getattr(logging, level.upper(), logging.INFO), message, extra={'db_module': module})
 
 # Standalone script for cron execution
 if __name__ == "__main__":
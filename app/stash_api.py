@@ -4,6 +4,9 @@ import os
 import logging
 from typing import Dict, List, Optional
 
+from .http_transport import get_transport
+from .prefetch import PrefetchingPager
+
 logger = logging.getLogger(__name__)
 
 class StashAPI:
@@ -18,6 +21,7 @@ class StashAPI:
             'Content-Type': 'application/json',
             'ApiKey': self.api_key
         }
+        self.transport = get_transport()
     
     def _make_request(self, query: str, variables: Dict = None) -> Dict:
         """Make a GraphQL request to Stash"""
@@ -27,11 +31,13 @@ class StashAPI:
         }
         
         try:
-            response = requests.post(
+            # GraphQL queries are reads, so they are safe to retry on 5xx
+            response = self.transport.request(
+                'POST',
                 self.graphql_endpoint,
                 headers=self.headers,
                 json=payload,
-                timeout=30
+                idempotent=True
             )
             
             # Log the response for debugging
@@ -72,63 +78,61 @@ class StashAPI:
     def _get_all_favorites_paginated(self, entity_type: str) -> List[Dict]:
         """Get all favorites of a specific type using pagination"""
         all_favorites = []
-        page = 1
         per_page = 100
         
-        while True:
-            if entity_type == 'performers':
-                query = '''
-                query GetPerformers($page: Int!, $per_page: Int!) {
-                    findPerformers(filter: { page: $page, per_page: $per_page }) {
-                        count
-                        performers {
-                            id
-                            name
-                            favorite
-                        }
+        if entity_type == 'performers':
+            query = '''
+            query GetPerformers($page: Int!, $per_page: Int!) {
+                findPerformers(filter: { page: $page, per_page: $per_page }) {
+                    count
+                    performers {
+                        id
+                        name
+                        favorite
                     }
                 }
-                '''
-            else:  # studios
-                query = '''
-                query GetStudios($page: Int!, $per_page: Int!) {
-                    findStudios(filter: { page: $page, per_page: $per_page }) {
-                        count
-                        studios {
-                            id
-                            name
-                            favorite
-                        }
+            }
+            '''
+            result_field, items_field = 'findPerformers', 'performers'
+        else:  # studios
+            query = '''
+            query GetStudios($page: Int!, $per_page: Int!) {
+                findStudios(filter: { page: $page, per_page: $per_page }) {
+                    count
+                    studios {
+                        id
+                        name
+                        favorite
                     }
                 }
-                '''
-            
+            }
+            '''
+            result_field, items_field = 'findStudios', 'studios'
+        
+        def fetch_page(page):
+            data = self._make_request(query, {'page': page, 'per_page': per_page})
+            return data.get(result_field, {})
+        
+        def is_last(page, result):
+            # Check if we've got all pages
+            items = result.get(items_field, [])
+            return len(items) < per_page or (page * per_page) >= result.get('count', 0)
+        
+        # The next page downloads while this one is filtered
+        with PrefetchingPager(fetch_page, is_last, name=f'stash-{entity_type}') as pager:
+            pages_read = 0
             try:
-                variables = {'page': page, 'per_page': per_page}
-                data = self._make_request(query, variables)
-                
-                if entity_type == 'performers':
-                    items = data.get('findPerformers', {}).get('performers', [])
-                    total_count = data.get('findPerformers', {}).get('count', 0)
-                else:
-                    items = data.get('findStudios', {}).get('studios', [])
-                    total_count = data.get('findStudios', {}).get('count', 0)
-                
-                # Filter only favorites
-                favorites_on_page = [item for item in items if item.get('favorite', False)]
-                all_favorites.extend(favorites_on_page)
-                
-                logger.info(f"Page {page} for {entity_type}: {len(favorites_on_page)} favorites out of {len(items)} items")
-                
-                # Check if we've got all pages
-                if len(items) < per_page or (page * per_page) >= total_count:
-                    break
+                for page, result in pager:
+                    pages_read = page
+                    items = result.get(items_field, [])
+                    
+                    # Filter only favorites
+                    favorites_on_page = [item for item in items if item.get('favorite', False)]
+                    all_favorites.extend(favorites_on_page)
                     
-                page += 1
-                
+                    logger.info(f"Page {page} for {entity_type}: {len(favorites_on_page)} favorites out of {len(items)} items")
             except Exception as e:
-                logger.error(f"Error getting {entity_type} page {page}: {str(e)}")
-                break
+                logger.error(f"Error getting {entity_type} page {pages_read + 1}: {str(e)}")
         
         logger.info(f"Found {len(all_favorites)} total favorite {entity_type}")
         return all_favorites
@@ -230,6 +234,40 @@ class StashAPI:
             logger.error(f"Error checking scene existence: {str(e)}")
             return False
     
+    def get_scene_stash_ids(self, page: int = 1, per_page: int = 1000, updated_since: str = None) -> Dict:
+        """Bulk export of scene IDs with their stash_ids, optionally only scenes updated after a timestamp"""
+        query = '''
+        query FindSceneStashIDs($filter: FindFilterType!, $scene_filter: SceneFilterType) {
+            findScenes(filter: $filter, scene_filter: $scene_filter) {
+                count
+                scenes {
+                    id
+                    updated_at
+                    stash_ids {
+                        stash_id
+                        endpoint
+                    }
+                }
+            }
+        }
+        '''
+        
+        variables = {
+            'filter': {
+                'page': page,
+                'per_page': per_page,
+                'sort': 'updated_at',
+                'direction': 'ASC'
+            },
+            'scene_filter': {}
+        }
+        
+        if updated_since:
+            variables['scene_filter']['updated_at'] = {'value': updated_since, 'modifier': 'GREATER_THAN'}
+        
+        data = self._make_request(query, variables)
+        return data.get('findScenes', {})
+    
     def get_performer_scenes(self, performer_id: str) -> List[Dict]:
         """Get scenes for a specific performer"""
         query = '''
@@ -5,8 +5,30 @@ import logging
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
+from .graphql_batch import GraphQLBatcher
+from .http_transport import get_transport
+from .prefetch import PrefetchingPager
+from .rate_limiter import get_stashdb_limiter
+from .response_cache import get_response_cache
+from .stashdb_queries import (
+    find_scene_query, normalize_scene, normalize_scenes, query_scenes_query, scene_selection, search_scenes_query
+)
+
 logger = logging.getLogger(__name__)
 
+# Response cache kind for each batched lookup field
+BATCH_CACHE_KINDS = {
+    'searchPerformer': 'search',
+    'searchStudio': 'search',
+    'findPerformer': 'search',
+    'findStudio': 'search',
+    'findScene': 'scene'
+}
+
+# Selections shared by the batched lookups
+NAME_SELECTION = '{ id name }'
+SCENE_DETAIL_SELECTION = scene_selection('detail')
+
 class StashDBAPI:
     """API client for StashDB"""
     
@@ -19,20 +41,42 @@ class StashDBAPI:
             'Content-Type': 'application/json',
             'ApiKey': self.api_key
         }
+        self.transport = get_transport()
+        self.batcher = GraphQLBatcher(self._post_graphql)
+        self.cache = get_response_cache()
+        self.limiter = get_stashdb_limiter()
     
     def _make_request(self, query: str, variables: Dict = None) -> Dict:
         """Make a GraphQL request to StashDB"""
+        result = self._post_graphql(query, variables)
+        if 'errors' in result:
+            error_msg = f"StashDB GraphQL errors: {result['errors']}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        return result.get('data', {})
+    
+    def _cached_request(self, kind: str, query: str, variables: Dict = None) -> Dict:
+        """Make a GraphQL request through the response cache (see ResponseCache for TTLs per kind)"""
+        return self.cache.fetch(kind, query, variables, lambda: self._make_request(query, variables))
+    
+    def _post_graphql(self, query: str, variables: Dict = None) -> Dict:
+        """POST a GraphQL document and return the raw body, including any GraphQL errors"""
         payload = {
             'query': query,
             'variables': variables or {}
         }
         
         try:
-            response = requests.post(
+            # GraphQL queries are reads, so they are safe to retry on 5xx; every attempt
+            # goes through the shared StashDB rate limiter
+            response = self.transport.request(
+                'POST',
                 self.graphql_endpoint,
                 headers=self.headers,
                 json=payload,
-                timeout=30
+                idempotent=True,
+                limiter=self.limiter
             )
             
             # Log the response for debugging
@@ -41,13 +85,7 @@ class StashDBAPI:
             
             response.raise_for_status()
             
-            result = response.json()
-            if 'errors' in result:
-                error_msg = f"StashDB GraphQL errors: {result['errors']}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-            
-            return result.get('data', {})
+            return response.json()
             
         except requests.exceptions.RequestException as e:
             logger.error(f"StashDB API request failed: {str(e)}")
@@ -69,7 +107,7 @@ class StashDBAPI:
         variables = {'term': name}
         
         try:
-            data = self._make_request(query, variables)
+            data = self._cached_request('search', query, variables)
             results = data.get('searchPerformer', [])
             logger.info(f"Found {len(results)} results for performer: {name}")
             return results
@@ -91,7 +129,7 @@ class StashDBAPI:
         variables = {'term': name}
         
         try:
-            data = self._make_request(query, variables)
+            data = self._cached_request('search', query, variables)
             results = data.get('searchStudio', [])
             logger.info(f"Found {len(results)} results for studio: {name}")
             return results
@@ -106,32 +144,13 @@ class StashDBAPI:
     
     def search_scene(self, title: str, year: int = None) -> List[Dict]:
         """Search for scene by title in StashDB"""
-        query = '''
-        query SearchScene($term: String!) {
-            searchScene(term: $term) {
-                id
-                title
-                date
-                duration
-                studio {
-                    id
-                    name
-                }
-                performers {
-                    performer {
-                        id
-                        name
-                    }
-                }
-            }
-        }
-        '''
+        query = search_scenes_query('discovery')
         
         variables = {'term': title}
         
         try:
             data = self._make_request(query, variables)
-            results = data.get('searchScene', [])
+            results = normalize_scenes(data.get('searchScene') or [])
             
             # Filter by year if provided
             if year and results:
@@ -234,45 +253,9 @@ class StashDBAPI:
             logger.error(f"Fallback error getting studio scenes: {str(e)}")
             return {'count': 0, 'scenes': []}
     
-    def get_performer_scenes(self, performer_id: str, page: int = 1, limit: int = 50) -> Dict:
+    def get_performer_scenes(self, performer_id: str, page: int = 1, limit: int = 50, projection: str = 'discovery') -> Dict:
         """Get scenes for a specific performer from StashDB using correct queryScenes schema"""
-        query = '''
-        query GetPerformerScenes($input: SceneQueryInput!) {
-            queryScenes(input: $input) {
-                count
-                scenes {
-                    id
-                    title
-                    date
-                    duration
-                    director
-                    studio {
-                        id
-                        name
-                    }
-                    performers {
-                        performer {
-                            id
-                            name
-                        }
-                    }
-                    tags {
-                        id
-                        name
-                    }
-                    images {
-                        url
-                        width
-                        height
-                    }
-                    urls {
-                        url
-                        type
-                    }
-                }
-            }
-        }
-        '''
+        query = query_scenes_query('GetPerformerScenes', projection)
         
         variables = {
             'input': {
@@ -287,7 +270,7 @@ class StashDBAPI:
         try:
             data = self._make_request(query, variables)
             query_result = data.get('queryScenes', {})
-            scenes = query_result.get('scenes', [])
+            scenes = normalize_scenes(query_result.get('scenes') or [])
             count = query_result.get('count', 0)
             
             logger.info(f"Found {len(scenes)} scenes for performer ID {performer_id} (total: {count})")
@@ -298,45 +281,9 @@ class StashDBAPI:
             # Fallback to search-based method
             return self._get_performer_scenes_fallback(performer_id)
     
-    def get_studio_scenes(self, studio_id: str, page: int = 1, limit: int = 50) -> Dict:
+    def get_studio_scenes(self, studio_id: str, page: int = 1, limit: int = 50, projection: str = 'discovery') -> Dict:
         """Get scenes for a specific studio from StashDB using correct queryScenes schema"""
-        query = '''
-        query GetStudioScenes($input: SceneQueryInput!) {
-            queryScenes(input: $input) {
-                count
-                scenes {
-                    id
-                    title
-                    date
-                    duration
-                    director
-                    studio {
-                        id
-                        name
-                    }
-                    performers {
-                        performer {
-                            id
-                            name
-                        }
-                    }
-                    tags {
-                        id
-                        name
-                    }
-                    images {
-                        url
-                        width
-                        height
-                    }
-                    urls {
-                        url
-                        type
-                    }
-                }
-            }
-        }
-        '''
+        query = query_scenes_query('GetStudioScenes', projection)
         
         variables = {
             'input': {
@@ -351,7 +298,7 @@ class StashDBAPI:
         try:
             data = self._make_request(query, variables)
             query_result = data.get('queryScenes', {})
-            scenes = query_result.get('scenes', [])
+            scenes = normalize_scenes(query_result.get('scenes') or [])
             count = query_result.get('count', 0)
             
             logger.info(f"Found {len(scenes)} scenes for studio ID {studio_id} (total: {count})")
@@ -362,6 +309,28 @@ class StashDBAPI:
             # Fallback to search-based method
             return self._get_studio_scenes_fallback(studio_id)
     
+    def get_scene_feed(self, page: int = 1, limit: int = 100) -> Dict:
+        """Get StashDB's global scene stream, most recently created first"""
+        query = query_scenes_query('GetSceneFeed', 'feed')
+        
+        variables = {
+            'input': {
+                'page': page,
+                'per_page': limit,
+                'sort': 'CREATED_AT',
+                'direction': 'DESC'
+            }
+        }
+        
+        # No fallback: the caller needs to know the feed is unavailable so it can crawl per entity
+        data = self._make_request(query, variables)
+        query_result = data.get('queryScenes', {})
+        scenes = normalize_scenes(query_result.get('scenes') or [])
+        count = query_result.get('count', 0)
+        
+        logger.info(f"Fetched {len(scenes)} scenes from the StashDB feed (page {page})")
+        return {'count': count, 'scenes': scenes}
+    
     def get_recent_scenes(self, days: int = 7, page: int = 1) -> Dict:
         """Get recently added scenes from StashDB"""
         # Since we can't query by date, search for some popular terms
@@ -391,78 +360,101 @@ class StashDBAPI:
     
     def get_scene_details(self, scene_id: str) -> Optional[Dict]:
         """Get detailed information about a specific scene"""
-        query = '''
-        query GetScene($id: ID!) {
-            findScene(id: $id) {
-                id
-                title
-                date
-                duration
-                director
-                code
-                details
-                studio {
-                    id
-                    name
-                }
-                performers {
-                    performer {
-                        id
-                        name
-                    }
-                }
-                tags {
-                    id
-                    name
-                    description
-                }
-                images {
-                    url
-                    width
-                    height
-                }
-                urls {
-                    url
-                    type
-                }
-            }
-        }
-        '''
+        query = find_scene_query('detail')
         
         variables = {'id': scene_id}
         
         try:
-            data = self._make_request(query, variables)
-            return data.get('findScene')
+            data = self._cached_request('scene', query, variables)
+            return normalize_scene(data.get('findScene'))
         except Exception as e:
             logger.error(f"Error getting scene details: {str(e)}")
             return None
     
+    def search_performers(self, names: List[str]) -> Dict:
+        """Search for many performers by name, batching the lookups into aliased queries"""
+        return self._batch_lookup('searchPerformer', 'term', 'String!', NAME_SELECTION, names)
+    
+    def search_studios(self, names: List[str]) -> Dict:
+        """Search for many studios by name, batching the lookups into aliased queries"""
+        return self._batch_lookup('searchStudio', 'term', 'String!', NAME_SELECTION, names)
+    
+    def find_performers(self, performer_ids: List[str]) -> Dict:
+        """Get id/name for many performers in batched findPerformer queries"""
+        return self._batch_lookup('findPerformer', 'id', 'ID!', NAME_SELECTION, performer_ids)
+    
+    def find_studios(self, studio_ids: List[str]) -> Dict:
+        """Get id/name for many studios in batched findStudio queries"""
+        return self._batch_lookup('findStudio', 'id', 'ID!', NAME_SELECTION, studio_ids)
+    
+    def get_scenes_details(self, scene_ids: List[str]) -> Dict:
+        """Get detailed information for many scenes in batched findScene queries"""
+        lookup = self._batch_lookup('findScene', 'id', 'ID!', SCENE_DETAIL_SELECTION, scene_ids)
+        for scene in lookup['results'].values():
+            normalize_scene(scene)
+        return lookup
+    
+    def _batch_lookup(self, field: str, arg_name: str, arg_type: str, selection: str, values: List[str]) -> Dict:
+        """Run one lookup per unique value as batched documents.
+        
+        Returns {'results': {value: data}, 'errors': {value: message}}; a value whose own lookup
+        failed appears only in 'errors', so callers can tell "not found" from "could not ask".
+        """
+        unique_values = list(dict.fromkeys(v for v in values if v))
+        lookup = {'results': {}, 'errors': {}}
+        
+        # Only values without a fresh cached answer go to StashDB
+        cache_kind = BATCH_CACHE_KINDS.get(field)
+        cache_query = f'{field} {selection}'
+        missing = []
+        for value in unique_values:
+            found, data = self.cache.get(cache_kind, cache_query, {arg_name: value}) if cache_kind else (False, None)
+            if found:
+                lookup['results'][value] = data
+            else:
+                missing.append(value)
+        
+        if not missing:
+            return lookup
+        
+        items = self.batcher.run(field, arg_name, arg_type, selection, missing)
+        for value, (data, error) in zip(missing, items):
+            if error:
+                logger.error(f"StashDB {field} failed for {value}: {error}")
+                lookup['errors'][value] = error
+            else:
+                lookup['results'][value] = data
+                if cache_kind:
+                    self.cache.set(cache_kind, cache_query, {arg_name: value}, data)
+        
+        logger.info(f"StashDB {field}: {len(unique_values)} lookups ({len(unique_values) - len(missing)} cached), {len(lookup['errors'])} failed")
+        return lookup
+    
     def get_all_tags(self, limit: int = 100) -> List[Dict]:
         """Get all available tags from StashDB for category filtering using pagination"""
         all_tags = []
-        page = 1
         total_count = None
+        max_pages = 50  # Max 50 pages = 5000 tags
         
-        while True:
-            query = '''
-            query GetAllTags($input: TagQueryInput!) {
-                queryTags(input: $input) {
-                    count
-                    tags {
+        query = '''
+        query GetAllTags($input: TagQueryInput!) {
+            queryTags(input: $input) {
+                count
+                tags {
+                    id
+                    name
+                    description
+                    category {
                         id
                         name
                         description
-                        category {
-                            id
-                            name
-                            description
-                        }
                     }
                 }
             }
-            '''
-            
+        }
+        '''
+        
+        def fetch_page(page):
             variables = {
                 'input': {
                     'page': page,
@@ -471,38 +463,35 @@ class StashDBAPI:
                     'direction': 'ASC'
                 }
             }
-            
+            return self._cached_request('tags', query, variables).get('queryTags', {})
+        
+        def is_last(page, result):
+            tags = result.get('tags', [])
+            return len(tags) < limit or page * limit >= result.get('count', 0)
+        
+        # Later pages download while earlier ones are collected
+        page = 0
+        with PrefetchingPager(fetch_page, is_last, max_pages=max_pages, name='stashdb-tags') as pager:
             try:
-                data = self._make_request(query, variables)
-                query_result = data.get('queryTags', {})
-                tags = query_result.get('tags', [])
-                count = query_result.get('count', 0)
-                
-                # Set total count from first request
-                if total_count is None:
-                    total_count = count
-                    logger.info(f"Found {total_count} total tags in StashDB, fetching in batches of {limit}")
-                
-                if not tags:
-                    break
+                for page, query_result in pager:
+                    tags = query_result.get('tags', [])
                     
-                all_tags.extend(tags)
-                logger.info(f"Retrieved page {page}: {len(tags)} tags (total so far: {len(all_tags)})")
-                
-                # Check if we've got all tags
-                if len(all_tags) >= total_count or len(tags) < limit:
-                    break
+                    # Set total count from first request
+                    if total_count is None:
+                        total_count = query_result.get('count', 0)
+                        logger.info(f"Found {total_count} total tags in StashDB, fetching in batches of {limit}")
                     
-                page += 1
-                
-                # Safety check to prevent infinite loops
-                if page > 50:  # Max 50 pages = 5000 tags
-                    logger.warning(f"Reached maximum page limit, stopping pagination")
-                    break
+                    if not tags:
+                        break
                     
+                    all_tags.extend(tags)
+                    logger.info(f"Retrieved page {page}: {len(tags)} tags (total so far: {len(all_tags)})")
             except Exception as e:
-                logger.error(f"Error getting tags from StashDB page {page}: {str(e)}")
-                break
+                logger.error(f"Error getting tags from StashDB page {page + 1}: {str(e)}")
+        
+        # Safety check to prevent infinite loops
+        if page >= max_pages and total_count and len(all_tags) < total_count:
+            logger.warning(f"Reached maximum page limit, stopping pagination")
         
         logger.info(f"Retrieved {len(all_tags)} tags from StashDB (total available: {total_count})")
         return all_tags
@@ -557,7 +546,7 @@ class StashDBAPI:
             variables['input']['gender'] = gender.upper()
         
         try:
-            data = self._make_request(query, variables)
+            data = self._cached_request('trending', query, variables)
             query_result = data.get('queryPerformers', {})
             performers = query_result.get('performers', [])
             count = query_result.get('count', 0)
@@ -653,7 +642,7 @@ class StashDBAPI:
             variables['input']['gender'] = gender.upper()
         
         try:
-            data = self._make_request(query, variables)
+            data = self._cached_request('trending', query, variables)
             query_result = data.get('queryPerformers', {})
             performers = query_result.get('performers', [])
             count = query_result.get('count', 0)
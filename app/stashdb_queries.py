@@ -0,0 +1,86 @@
+from typing import Dict, List
+
+# Named field sets for StashDB scenes. 'discovery' is what discovery stores and filters on;
+# 'feed' adds what the global feed needs to match scenes to monitored entities (creation
+# time and parent studio); 'detail' adds the descriptive fields shown for a single scene.
+SCENE_PROJECTIONS = {
+    'discovery': '''
+        id
+        title
+        date
+        duration
+        studio { id name }
+        performers { performer { id name } }
+        tags { id name category { id name } }
+    ''',
+    'feed': '''
+        id
+        title
+        date
+        duration
+        created
+        studio { id name parent { id } }
+        performers { performer { id name } }
+        tags { id name category { id name } }
+    ''',
+    'detail': '''
+        id
+        title
+        date
+        duration
+        director
+        code
+        details
+        studio { id name }
+        performers { performer { id name } }
+        tags { id name description category { id name } }
+        images { url width height }
+        urls { url type }
+    '''
+}
+
+def scene_selection(projection: str = 'discovery') -> str:
+    """Selection set ({ ... }) for a scene projection"""
+    if projection not in SCENE_PROJECTIONS:
+        raise ValueError(f"Unknown scene projection: {projection}")
+    return '{' + SCENE_PROJECTIONS[projection] + '}'
+
+def query_scenes_query(operation_name: str, projection: str = 'discovery') -> str:
+    """Paged queryScenes document returning count and scenes"""
+    return f'''
+    query {operation_name}($input: SceneQueryInput!) {{
+        queryScenes(input: $input) {{
+            count
+            scenes {scene_selection(projection)}
+        }}
+    }}
+    '''
+
+def search_scenes_query(projection: str = 'discovery') -> str:
+    return f'''
+    query SearchScene($term: String!) {{
+        searchScene(term: $term) {scene_selection(projection)}
+    }}
+    '''
+
+def find_scene_query(projection: str = 'detail') -> str:
+    return f'''
+    query GetScene($id: ID!) {{
+        findScene(id: $id) {scene_selection(projection)}
+    }}
+    '''
+
+def normalize_scene(scene: Dict) -> Dict:
+    """Flatten each tag's category object to its name, which is what the filters compare against"""
+    if not scene:
+        return scene
+    for tag in scene.get('tags') or []:
+        category = tag.get('category')
+        if isinstance(category, dict):
+            tag['category'] = category.get('name')
+    return scene
+
+def normalize_scenes(scenes: List[Dict]) -> List[Dict]:
+    for scene in scenes:
+        normalize_scene(scene)
+    return scenes
@@ -0,0 +1,241 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List
+
+from .filter_engine import FilterEngine, UNWANTED_CATEGORY, MISSING_REQUIRED, TOO_SHORT, TOO_LONG
+from .models import db, Scene, Tag, SceneTag
+from .scene_tags import uncategorised_scenes_query
+
+logger = logging.getLogger(__name__)
+
+# Filtered/wanted flags change outside discovery (re-filter, other workers); reread them this often
+STATE_TTL_SECONDS = 60
+
+def bitmap_from_ids(ids: Iterable[int]) -> int:
+    """Bitmap (a Python int, bit n = scene id n) built in one pass instead of one OR per id"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for scene_id in ids:
+        bits[scene_id >> 3] |= 1 << (scene_id & 7)
+    return int.from_bytes(bits, 'little')
+
+def ids_from_bitmap(bitmap: int, limit: int) -> List[int]:
+    """Lowest scene ids set in a bitmap"""
+    ids = []
+    while bitmap and len(ids) < limit:
+        low = bitmap & -bitmap
+        ids.append(low.bit_length() - 1)
+        bitmap ^= low
+    return ids
+
+class TagBitmapIndex:
+    """In-memory bitmaps over the scenes table for what-if filter simulation.
+    
+    Each lowercased tag name and category maps to a bitmap of the scene ids carrying it, and
+    durations are bucketed by whole minute, which is exact for minute-based bounds. A filter
+    is then a handful of ORs/ANDs over these and its effect a popcount, so a simulation takes
+    milliseconds regardless of how many scenes are stored. A scene's tags never change once
+    written, so the term bitmaps are only extended with scenes newer than the last one
+    indexed, and rebuilt when a tag is renamed or learns its category; scene membership and
+    filtered/wanted flags are reread every STATE_TTL_SECONDS.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+    
+    def _reset(self):
+        self.terms: Dict[str, int] = {}
+        self.tag_terms: Dict[int, List[str]] = {}  # tag id -> lowercased name and category
+        self.minutes: Dict[int, int] = {}  # duration // 60 -> scenes
+        self.whole_minutes = 0  # scenes whose duration is an exact number of minutes
+        self.scenes = 0
+        self.filtered = 0
+        self.wanted = 0
+        self.max_scene_id = 0
+        self.built = False
+        self._state_loaded = 0.0
+    
+    def refresh(self, force_state: bool = False):
+        """Index scenes stored since the last refresh, and reread flags if they are stale"""
+        with self._lock:
+            started = time.perf_counter()
+            # SQLite reuses the highest ids after deletes; start over rather than miss scenes
+            if (db.session.query(db.func.max(Scene.id)).scalar() or 0) < self.max_scene_id:
+                self._reset()
+            tag_terms = {
+                tag_id: [term.lower() for term in (name, category) if term]
+                for tag_id, name, category in db.session.query(Tag.id, Tag.name, Tag.category).all()
+            }
+            # Scenes already indexed under a tag's old name or missing category would keep them
+            if any(self.tag_terms.get(tag_id, terms) != terms for tag_id, terms in tag_terms.items()):
+                self._reset()
+            self.tag_terms = tag_terms
+            added = self._add_scenes_after(self.max_scene_id)
+            if force_state or added or time.monotonic() - self._state_loaded > STATE_TTL_SECONDS:
+                self._load_state()
+            if not self.built:
+                self.built = True
+                logger.info(f"Built tag bitmap index: {added} scenes, {len(self.terms)} terms "
+                            f"in {time.perf_counter() - started:.2f}s")
+    
+    def mark_stale(self):
+        """Reread filtered/wanted flags on the next refresh (after a bulk change such as a re-filter)"""
+        self._state_loaded = 0.0
+    
+    def _add_scenes_after(self, after_id: int) -> int:
+        term_ids: Dict[str, List[int]] = {}
+        minute_ids: Dict[int, List[int]] = {}
+        whole = []
+        max_id = after_id
+        count = 0
+        
+        for scene_id, duration in db.session.query(Scene.id, Scene.duration).filter(Scene.id > after_id).yield_per(5000):
+            count += 1
+            max_id = max(max_id, scene_id)
+            if duration:
+                minute_ids.setdefault(duration // 60, []).append(scene_id)
+                if duration % 60 == 0:
+                    whole.append(scene_id)
+        if not count:
+            return 0
+        
+        for scene_id, tag_id in db.session.query(SceneTag.scene_id, SceneTag.tag_id).filter(
+                SceneTag.scene_id > after_id).yield_per(20000):
+            for term in self.tag_terms.get(tag_id, ()):
+                term_ids.setdefault(term, []).append(scene_id)
+        
+        # Scenes stored before scene_tags existed still only have their JSON columns, and scenes
+        # linked to a tag without a category still have theirs in the JSON categories column
+        json_columns = itertools.chain(
+            db.session.query(Scene.id, Scene.tags, Scene.categories).filter(
+                Scene.id > after_id, Scene.tags.isnot(None),
+                ~db.exists().where(SceneTag.scene_id == Scene.id)).yield_per(5000),
+            ((scene_id, None, categories) for scene_id, categories in
+             uncategorised_scenes_query().filter(Scene.id > after_id).yield_per(5000))
+        )
+        for scene_id, tags, categories in json_columns:
+            terms = set()
+            for value in (tags, categories):
+                try:
+                    terms.update(term.lower() for term in json.loads(value or '[]') if term)
+                except (ValueError, TypeError, AttributeError):
+                    continue
+            for term in terms:
+                term_ids.setdefault(term, []).append(scene_id)
+        
+        for term, ids in term_ids.items():
+            self.terms[term] = self.terms.get(term, 0) | bitmap_from_ids(ids)
+        for minute, ids in minute_ids.items():
+            self.minutes[minute] = self.minutes.get(minute, 0) | bitmap_from_ids(ids)
+        self.whole_minutes |= bitmap_from_ids(whole)
+        self.max_scene_id = max_id
+        return count
+    
+    def _load_state(self):
+        scene_ids, filtered, wanted = [], [], []
+        for scene_id, is_filtered, is_wanted in db.session.query(
+                Scene.id, Scene.is_filtered, Scene.is_wanted).yield_per(20000):
+            scene_ids.append(scene_id)
+            if is_filtered:
+                filtered.append(scene_id)
+            if is_wanted:
+                wanted.append(scene_id)
+        self.scenes = bitmap_from_ids(scene_ids)
+        self.filtered = bitmap_from_ids(filtered)
+        self.wanted = bitmap_from_ids(wanted)
+        self._state_loaded = time.monotonic()
+    
+    def _union(self, terms: Iterable[str]) -> int:
+        bitmap = 0
+        for term in terms:
+            bitmap |= self.terms.get(term, 0)
+        return bitmap
+    
+    def simulate(self, engine: FilterEngine, sample: int = 20) -> Dict:
+        """Which stored scenes a filter configuration would filter, compared with today's flags.
+        
+        Reasons follow FilterEngine's precedence: unwanted term, then missing required term,
+        then duration; scenes without a duration pass the duration bounds.
+        """
+        with self._lock:
+            self.refresh()
+            return self._simulate(engine, sample)
+    
+    def _simulate(self, engine: FilterEngine, sample: int) -> Dict:
+        started = time.perf_counter()
+        scenes = self.scenes
+        
+        by_reason = {}
+        remaining = scenes
+        by_reason[UNWANTED_CATEGORY] = self._union(engine.unwanted) & remaining
+        remaining &= ~by_reason[UNWANTED_CATEGORY]
+        by_reason[MISSING_REQUIRED] = remaining & ~self._union(engine.required) if engine.required else 0
+        remaining &= ~by_reason[MISSING_REQUIRED]
+        
+        short = 0
+        if engine.min_seconds is not None:
+            for minute, bitmap in self.minutes.items():
+                if minute < engine.min_duration_minutes:
+                    short |= bitmap
+        by_reason[TOO_SHORT] = short & remaining
+        remaining &= ~by_reason[TOO_SHORT]
+        
+        long = 0
+        if engine.max_seconds is not None:
+            for minute, bitmap in self.minutes.items():
+                if minute > engine.max_duration_minutes:
+                    long |= bitmap
+                elif minute == engine.max_duration_minutes:
+                    long |= bitmap & ~self.whole_minutes
+        by_reason[TOO_LONG] = long & remaining
+        
+        would_filter = 0
+        for bitmap in by_reason.values():
+            would_filter |= bitmap
+        newly_filtered = would_filter & ~self.filtered
+        unfiltered = self.filtered & scenes & ~would_filter
+        
+        sample_ids = ids_from_bitmap(newly_filtered, sample)
+        titles = dict(db.session.query(Scene.id, Scene.title).filter(Scene.id.in_(sample_ids)).all()) if sample_ids else {}
+        
+        return {
+            'scenes': scenes.bit_count(),
+            'would_filter': would_filter.bit_count(),
+            'currently_filtered': (self.filtered & scenes).bit_count(),
+            'newly_filtered': newly_filtered.bit_count(),
+            'unfiltered': unfiltered.bit_count(),
+            'wanted_affected': (newly_filtered & self.wanted).bit_count(),
+            'by_reason': {code: bitmap.bit_count() for code, bitmap in by_reason.items()},
+            'terms': {term: (self.terms.get(term, 0) & scenes).bit_count()
+                      for term in engine.unwanted_display + engine.required_display},
+            'sample': [{'id': scene_id, 'title': titles.get(scene_id)} for scene_id in sample_ids],
+            'milliseconds': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_tag_bitmaps() -> TagBitmapIndex:
+    """Process-wide tag bitmap index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TagBitmapIndex()
+        return _index
+
+def warm_tag_bitmaps(app):
+    """Build the index in the background at startup so the first simulation is fast"""
+    def build():
+        with app.app_context():
+            try:
+                get_tag_bitmaps().refresh()
+            except Exception as e:
+                logger.warning(f"Could not build tag bitmap index: {str(e)}")
+    
+    threading.Thread(target=build, name='tag-bitmaps', daemon=True).start()
@@ -2,11 +2,54 @@ import requests
 import json
 import os
 import logging
+import threading
+import time
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from .http_transport import get_transport
+
 logger = logging.getLogger(__name__)
 
+# Fields Whisparr uses for a scene's StashDB UUID, depending on version and endpoint
+STASHDB_ID_FIELDS = ('stashId', 'stashdb_id', 'foreignId', 'stashdbId')
+
+class WhisparrCatalogue:
+    """In-memory index of a Whisparr item list, keyed by StashDB UUID and by title"""
+    
+    def __init__(self, items: List[Dict]):
+        self.items = []
+        self.by_stashdb_id = {}
+        self.years_by_title = {}
+        for item in items or []:
+            self.add(item)
+    
+    def add(self, item: Dict):
+        """Index a single item (e.g. the response of a successful add)"""
+        if not item:
+            return
+        self.items.append(item)
+        
+        for field in STASHDB_ID_FIELDS:
+            if item.get(field):
+                self.by_stashdb_id[item[field]] = item
+        
+        title = item.get('title', '').lower()
+        if title:
+            self.years_by_title.setdefault(title, set()).add(item.get('year'))
+    
+    def has_stashdb_id(self, stashdb_uuid: str) -> bool:
+        return stashdb_uuid in self.by_stashdb_id
+    
+    def has_title(self, title: str, year: int = None) -> bool:
+        years = self.years_by_title.get(title.lower())
+        if not years:
+            return False
+        return year is None or year in years
+    
+    def __len__(self):
+        return len(self.items)
+
 class WhisparrAPI:
     """API client for Whisparr"""
     
@@ -18,6 +61,12 @@ class WhisparrAPI:
             'Content-Type': 'application/json',
             'X-Api-Key': self.api_key
         }
+        self.transport = get_transport()
+        
+        # Catalogue indexes per list endpoint ('scene', 'movie'): endpoint -> (loaded_at, WhisparrCatalogue)
+        self.catalogue_ttl = int(os.environ.get('WHISPARR_CATALOGUE_TTL', '300'))
+        self._catalogues = {}
+        self._catalogue_lock = threading.Lock()
     
     def _make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
         """Make an API request to Whisparr"""
@@ -34,20 +83,20 @@ class WhisparrAPI:
         try:
             if method.upper() == 'GET':
                 # Always use URL params for GET requests
-                response = requests.get(url, headers={'Content-Type': 'application/json'}, 
-                                      params={'apikey': self.api_key}, timeout=30)
+                response = self.transport.request('GET', url, headers={'Content-Type': 'application/json'},
+                                                  params={'apikey': self.api_key})
             elif method.upper() == 'POST':
                 logger.info(f"Whisparr POST request to {url} with data: {json.dumps(data, indent=2) if data else 'None'}")
                 if params:
                     # Use URL params for scene endpoint (like bash script)
-                    response = requests.post(url, headers=headers, json=data, params=params, timeout=30)
+                    response = self.transport.request('POST', url, headers=headers, json=data, params=params)
                 else:
                     # Use headers for other endpoints
-                    response = requests.post(url, headers=headers, json=data, timeout=30)
+                    response = self.transport.request('POST', url, headers=headers, json=data)
             elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, json=data, timeout=30)
+                response = self.transport.request('PUT', url, headers=headers, json=data)
             elif method.upper() == 'DELETE':
-                response = requests.delete(url, headers=headers, timeout=30)
+                response = self.transport.request('DELETE', url, headers=headers)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
@@ -70,9 +119,35 @@ class WhisparrAPI:
                     logger.error("Could not decode Whisparr error response")
             raise Exception(f"Failed to connect to Whisparr: {str(e)}")
     
-    def get_movies(self) -> List[Dict]:
-        """Get all movies from Whisparr"""
+    def get_catalogue(self, endpoint: str = 'scene', refresh: bool = False) -> WhisparrCatalogue:
+        """Indexed copy of GET /api/v3/<endpoint>, downloaded at most once per WHISPARR_CATALOGUE_TTL seconds"""
+        with self._catalogue_lock:
+            cached = self._catalogues.get(endpoint)
+            if cached and not refresh and time.monotonic() - cached[0] < self.catalogue_ttl:
+                return cached[1]
+            
+            catalogue = WhisparrCatalogue(self._make_request('GET', endpoint))
+            self._catalogues[endpoint] = (time.monotonic(), catalogue)
+            logger.info(f"Loaded Whisparr {endpoint} catalogue: {len(catalogue)} items")
+            return catalogue
+    
+    def invalidate_catalogue(self):
+        """Drop cached catalogues so the next lookup downloads them again"""
+        with self._catalogue_lock:
+            self._catalogues.clear()
+    
+    def _remember_added(self, endpoint: str, item: Dict):
+        """Add a newly created item to the loaded catalogue of the endpoint that created it"""
+        with self._catalogue_lock:
+            cached = self._catalogues.get(endpoint)
+            if cached:
+                cached[1].add(item)
+    
+    def get_movies(self, use_catalogue: bool = False) -> List[Dict]:
+        """Get all movies from Whisparr (use_catalogue reuses the cached list when fresh)"""
         try:
+            if use_catalogue:
+                return self.get_catalogue('movie').items
             return self._make_request('GET', 'movie')
         except Exception as e:
             logger.error(f"Error getting movies: {str(e)}")
@@ -129,6 +204,7 @@ class WhisparrAPI:
         try:
             result = self._make_request('POST', 'movie', required_fields)
             logger.info(f"Successfully added movie: {required_fields['title']}")
+            self._remember_added('movie', result)
             return result
         except Exception as e:
             logger.error(f"Error adding movie: {str(e)}")
@@ -157,6 +233,7 @@ class WhisparrAPI:
         try:
             result = self._make_request('POST', 'movie', required_fields)
             logger.info(f"Successfully added manual movie: {required_fields['title']}")
+            self._remember_added('movie', result)
             return result
         except Exception as e:
             logger.error(f"Error adding manual movie: {str(e)}")
@@ -224,14 +301,7 @@ class WhisparrAPI:
     def check_movie_exists(self, title: str, year: int = None) -> bool:
         """Check if a movie already exists in Whisparr"""
         try:
-            movies = self.get_movies()
-            
-            for movie in movies:
-                if movie.get('title', '').lower() == title.lower():
-                    if year is None or movie.get('year') == year:
-                        return True
-            
-            return False
+            return self.get_catalogue('movie').has_title(title, year)
         except Exception as e:
             logger.error(f"Error checking movie existence: {str(e)}")
             return False
@@ -260,6 +330,7 @@ class WhisparrAPI:
                 endpoint += '?deleteFiles=true'
             
             self._make_request('DELETE', endpoint)
+            self.invalidate_catalogue()
             logger.info(f"Successfully deleted movie ID: {movie_id}")
             return True
         except Exception as e:
@@ -369,6 +440,7 @@ class WhisparrAPI:
             
             if result:
                 logger.info(f"Successfully added scene to Whisparr: {scene_data.get('title', 'Unknown')} (ID: {result.get('id')})")
+                self._remember_added('scene', result)
                 return result
             else:
                 logger.warning("Scene endpoint returned no result, trying movie fallback...")
@@ -446,6 +518,7 @@ class WhisparrAPI:
             
             if result:
                 logger.info(f"Successfully added scene as movie: {movie_data['title']} (ID: {result.get('id')})")
+                self._remember_added('movie', result)
                 return result
             else:
                 logger.error("Movie endpoint returned no result")
@@ -528,24 +601,8 @@ class WhisparrAPI:
     def check_scene_exists_by_uuid(self, stashdb_uuid: str) -> bool:
         """Check if a scene already exists in Whisparr by StashDB UUID"""
         try:
-            # Get all scenes and check for matching StashDB ID
-            scenes = self._make_request('GET', 'scene')
-            
-            if not scenes:
-                return False
-            
-            for scene in scenes:
-                # Check various possible StashDB ID fields
-                scene_stashdb_id = (
-                    scene.get('stashId') or 
-                    scene.get('stashdb_id') or 
-                    scene.get('foreignId') or
-                    scene.get('stashdbId')
-                )
-                if scene_stashdb_id == stashdb_uuid:
-                    return True
-            
-            return False
+            # Look the UUID up in the cached scene catalogue
+            return self.get_catalogue('scene').has_stashdb_id(stashdb_uuid)
             
         except Exception as e:
             logger.error(f"Error checking scene existence by UUID {stashdb_uuid}: {str(e)}")
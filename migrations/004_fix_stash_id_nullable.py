@@ -22,6 +22,13 @@ def upgrade_database(db_path):
             conn.close()
             return True
         
+        # Skip if stash_id is already nullable, otherwise re-running this would drop
+        # columns added by later migrations
+        if _stash_id_is_nullable(cursor):
+            logger.info("stash_id is already nullable, skipping migration")
+            conn.close()
+            return True
+        
         # Create new table with nullable stash_id
         cursor.execute('''
             CREATE TABLE performers_new (
@@ -63,3 +70,27 @@ def upgrade_database(db_path):
 def downgrade_database(db_path):
     """Downgrade not supported for this migration"""
     pass
+
+def _stash_id_is_nullable(cursor):
+    """True if performers.stash_id has no NOT NULL constraint"""
+    cursor.execute("PRAGMA table_info(performers)")
+    for column in cursor.fetchall():
+        if column[1] == 'stash_id':
+            return column[3] == 0
+    return False
+
+def check_migration_status(db_path):
+    """Check if this migration has been applied"""
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='performers'")
+        if not cursor.fetchone():
+            return False
+        return _stash_id_is_nullable(cursor)
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+    finally:
+        if 'conn' in locals():
+            conn.close()
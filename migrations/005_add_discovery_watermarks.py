@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Migration: Add discovery watermarks to performers and studios
+Version: 005
+Date: 2026-10-17
+Description: Track the newest release date / scene id already seen per entity so discovery
+can stop paging once it reaches known scenes, plus the time of the last full catalogue walk
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WATERMARK_COLUMNS = [
+    ('latest_release_date', 'DATE'),
+    ('latest_scene_id', 'VARCHAR(50)'),
+    ('last_full_sync', 'DATETIME'),
+]
+
+TABLES = ['performers', 'studios']
+
+
+def upgrade_database(db_path):
+    """Apply the migration to upgrade the database."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting migration 005: Add discovery watermarks")
+        
+        for table in TABLES:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+            if not cursor.fetchone():
+                logger.info(f"{table} table doesn't exist yet, skipping")
+                continue
+            
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [column[1] for column in cursor.fetchall()]
+            
+            for column_name, column_type in WATERMARK_COLUMNS:
+                if column_name in columns:
+                    logger.info(f"{table}.{column_name} already exists")
+                    continue
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}")
+                logger.info(f"Added {table}.{column_name}")
+        
+        # Create migration tracking table if it doesn't exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migration_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version VARCHAR(10) NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                applied_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                success BOOLEAN DEFAULT 1 NOT NULL
+            )
+        """)
+        
+        # Record this migration
+        cursor.execute("""
+            INSERT OR IGNORE INTO migration_history (version, name, applied_date, success)
+            VALUES ('005', 'add_discovery_watermarks', ?, 1)
+        """, (datetime.utcnow().isoformat(),))
+        
+        conn.commit()
+        logger.info("Migration 005 completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 005 failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def downgrade_database(db_path):
+    """Rollback the migration (downgrade the database)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting rollback of migration 005")
+        
+        for table in TABLES:
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [column[1] for column in cursor.fetchall()]
+            
+            for column_name, _ in WATERMARK_COLUMNS:
+                if column_name in columns:
+                    # DROP COLUMN needs SQLite 3.35+, which ships with Python 3.11
+                    cursor.execute(f"ALTER TABLE {table} DROP COLUMN {column_name}")
+                    logger.info(f"Dropped {table}.{column_name}")
+        
+        # Remove migration record
+        cursor.execute("DELETE FROM migration_history WHERE version = '005'")
+        
+        conn.commit()
+        logger.info("Migration 005 rollback completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 005 rollback failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def check_migration_status(db_path):
+    """Check if this migration has been applied."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # The columns themselves are the source of truth: create_all() adds them on fresh installs
+        for table in TABLES:
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [column[1] for column in cursor.fetchall()]
+            if not columns or any(name not in columns for name, _ in WATERMARK_COLUMNS):
+                return False
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    import os
+    
+    # Default database path
+    db_path = os.environ.get('DATABASE_PATH', '/app/data/stash_filter.db')
+    
+    if len(sys.argv) < 2:
+        print("Usage: python 005_add_discovery_watermarks.py [upgrade|downgrade|status]")
+        sys.exit(1)
+    
+    command = sys.argv[1].lower()
+    
+    if command == "upgrade":
+        if check_migration_status(db_path):
+            print("Migration 005 already applied")
+        else:
+            success = upgrade_database(db_path)
+            print("Migration 005 applied successfully" if success else "Migration 005 failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "downgrade":
+        if not check_migration_status(db_path):
+            print("Migration 005 not applied, nothing to rollback")
+        else:
+            success = downgrade_database(db_path)
+            print("Migration 005 rollback successful" if success else "Migration 005 rollback failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "status":
+        applied = check_migration_status(db_path)
+        print(f"Migration 005 status: {'Applied' if applied else 'Not Applied'}")
+    
+    else:
+        print("Invalid command. Use: upgrade, downgrade, or status")
+        sys.exit(1)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Migration: Add owned_scenes index table
+Version: 006
+Date: 2026-10-17
+Description: Local copy of every StashDB stash_id in the Stash library so discovery can check
+ownership with a set lookup instead of one findScenes request per scene
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def upgrade_database(db_path):
+    """Apply the migration to upgrade the database."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting migration 006: Add owned_scenes table")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS owned_scenes (
+                id INTEGER NOT NULL PRIMARY KEY,
+                stash_scene_id VARCHAR(50) NOT NULL,
+                stashdb_id VARCHAR(100) NOT NULL,
+                endpoint VARCHAR(200),
+                stash_updated_at DATETIME,
+                indexed_date DATETIME
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_owned_scenes_stash_scene_id
+            ON owned_scenes (stash_scene_id)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_owned_scenes_stashdb_id
+            ON owned_scenes (stashdb_id)
+        """)
+        
+        logger.info("Created owned_scenes table and indexes")
+        
+        # Create migration tracking table if it doesn't exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migration_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version VARCHAR(10) NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                applied_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                success BOOLEAN DEFAULT 1 NOT NULL
+            )
+        """)
+        
+        # Record this migration
+        cursor.execute("""
+            INSERT OR IGNORE INTO migration_history (version, name, applied_date, success)
+            VALUES ('006', 'add_owned_scenes', ?, 1)
+        """, (datetime.utcnow().isoformat(),))
+        
+        conn.commit()
+        logger.info("Migration 006 completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 006 failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def downgrade_database(db_path):
+    """Rollback the migration (downgrade the database)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting rollback of migration 006")
+        
+        cursor.execute("DROP TABLE IF EXISTS owned_scenes")
+        cursor.execute("DELETE FROM migration_history WHERE version = '006'")
+        
+        conn.commit()
+        logger.info("Migration 006 rollback completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 006 rollback failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def check_migration_status(db_path):
+    """Check if this migration has been applied."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT name FROM sqlite_master 
+            WHERE type='table' AND name='owned_scenes'
+        """)
+        
+        return cursor.fetchone() is not None
+        
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    import os
+    
+    # Default database path
+    db_path = os.environ.get('DATABASE_PATH', '/app/data/stash_filter.db')
+    
+    if len(sys.argv) < 2:
+        print("Usage: python 006_add_owned_scenes.py [upgrade|downgrade|status]")
+        sys.exit(1)
+    
+    command = sys.argv[1].lower()
+    
+    if command == "upgrade":
+        if check_migration_status(db_path):
+            print("Migration 006 already applied")
+        else:
+            success = upgrade_database(db_path)
+            print("Migration 006 applied successfully" if success else "Migration 006 failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "downgrade":
+        if not check_migration_status(db_path):
+            print("Migration 006 not applied, nothing to rollback")
+        else:
+            success = downgrade_database(db_path)
+            print("Migration 006 rollback successful" if success else "Migration 006 rollback failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "status":
+        applied = check_migration_status(db_path)
+        print(f"Migration 006 status: {'Applied' if applied else 'Not Applied'}")
+    
+    else:
+        print("Invalid command. Use: upgrade, downgrade, or status")
+        sys.exit(1)
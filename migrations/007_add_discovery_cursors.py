@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Migration: Add discovery_cursors table
+Version: 007
+Date: 2026-10-17
+Description: Stores how far the feed discovery engine has read StashDB's global scene stream
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def upgrade_database(db_path):
+    """Apply the migration to upgrade the database."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting migration 007: Add discovery_cursors table")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS discovery_cursors (
+                id INTEGER NOT NULL PRIMARY KEY,
+                name VARCHAR(50) NOT NULL UNIQUE,
+                created_at DATETIME,
+                scene_id VARCHAR(50),
+                updated_date DATETIME
+            )
+        """)
+        
+        logger.info("Created discovery_cursors table")
+        
+        # Create migration tracking table if it doesn't exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migration_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version VARCHAR(10) NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                applied_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                success BOOLEAN DEFAULT 1 NOT NULL
+            )
+        """)
+        
+        # Record this migration
+        cursor.execute("""
+            INSERT OR IGNORE INTO migration_history (version, name, applied_date, success)
+            VALUES ('007', 'add_discovery_cursors', ?, 1)
+        """, (datetime.utcnow().isoformat(),))
+        
+        conn.commit()
+        logger.info("Migration 007 completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 007 failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def downgrade_database(db_path):
+    """Rollback the migration (downgrade the database)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting rollback of migration 007")
+        
+        cursor.execute("DROP TABLE IF EXISTS discovery_cursors")
+        cursor.execute("DELETE FROM migration_history WHERE version = '007'")
+        
+        conn.commit()
+        logger.info("Migration 007 rollback completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 007 rollback failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def check_migration_status(db_path):
+    """Check if this migration has been applied."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT name FROM sqlite_master 
+            WHERE type='table' AND name='discovery_cursors'
+        """)
+        
+        return cursor.fetchone() is not None
+        
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    import os
+    
+    # Default database path
+    db_path = os.environ.get('DATABASE_PATH', '/app/data/stash_filter.db')
+    
+    if len(sys.argv) < 2:
+        print("Usage: python 007_add_discovery_cursors.py [upgrade|downgrade|status]")
+        sys.exit(1)
+    
+    command = sys.argv[1].lower()
+    
+    if command == "upgrade":
+        if check_migration_status(db_path):
+            print("Migration 007 already applied")
+        else:
+            success = upgrade_database(db_path)
+            print("Migration 007 applied successfully" if success else "Migration 007 failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "downgrade":
+        if not check_migration_status(db_path):
+            print("Migration 007 not applied, nothing to rollback")
+        else:
+            success = downgrade_database(db_path)
+            print("Migration 007 rollback successful" if success else "Migration 007 rollback failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "status":
+        applied = check_migration_status(db_path)
+        print(f"Migration 007 status: {'Applied' if applied else 'Not Applied'}")
+    
+    else:
+        print("Invalid command. Use: upgrade, downgrade, or status")
+        sys.exit(1)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Migration: Add discovery_runs table
+Version: 008
+Date: 2026-10-17
+Description: Records discovery run state and checkpoints so interrupted runs can resume
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def upgrade_database(db_path):
+    """Apply the migration to upgrade the database."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting migration 008: Add discovery_runs table")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS discovery_runs (
+                id INTEGER NOT NULL PRIMARY KEY,
+                status VARCHAR(20) NOT NULL,
+                "trigger" VARCHAR(20),
+                engine VARCHAR(20),
+                deep_resync BOOLEAN,
+                started_at DATETIME,
+                heartbeat_at DATETIME,
+                finished_at DATETIME,
+                duration_seconds FLOAT,
+                resume_count INTEGER,
+                completed_entities TEXT,
+                current_entity VARCHAR(50),
+                last_page INTEGER,
+                new_scenes INTEGER,
+                filtered_scenes INTEGER,
+                pages_fetched INTEGER,
+                error_count INTEGER,
+                stats TEXT
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_discovery_runs_status ON discovery_runs (status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_discovery_runs_started_at ON discovery_runs (started_at)")
+        
+        logger.info("Created discovery_runs table")
+        
+        # Create migration tracking table if it doesn't exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migration_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version VARCHAR(10) NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                applied_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                success BOOLEAN DEFAULT 1 NOT NULL
+            )
+        """)
+        
+        # Record this migration
+        cursor.execute("""
+            INSERT OR IGNORE INTO migration_history (version, name, applied_date, success)
+            VALUES ('008', 'add_discovery_runs', ?, 1)
+        """, (datetime.utcnow().isoformat(),))
+        
+        conn.commit()
+        logger.info("Migration 008 completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 008 failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def downgrade_database(db_path):
+    """Rollback the migration (downgrade the database)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting rollback of migration 008")
+        
+        cursor.execute("DROP TABLE IF EXISTS discovery_runs")
+        cursor.execute("DELETE FROM migration_history WHERE version = '008'")
+        
+        conn.commit()
+        logger.info("Migration 008 rollback completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 008 rollback failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def check_migration_status(db_path):
+    """Check if this migration has been applied."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT name FROM sqlite_master 
+            WHERE type='table' AND name='discovery_runs'
+        """)
+        
+        return cursor.fetchone() is not None
+        
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    import os
+    
+    # Default database path
+    db_path = os.environ.get('DATABASE_PATH', '/app/data/stash_filter.db')
+    
+    if len(sys.argv) < 2:
+        print("Usage: python 008_add_discovery_runs.py [upgrade|downgrade|status]")
+        sys.exit(1)
+    
+    command = sys.argv[1].lower()
+    
+    if command == "upgrade":
+        if check_migration_status(db_path):
+            print("Migration 008 already applied")
+        else:
+            success = upgrade_database(db_path)
+            print("Migration 008 applied successfully" if success else "Migration 008 failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "downgrade":
+        if not check_migration_status(db_path):
+            print("Migration 008 not applied, nothing to rollback")
+        else:
+            success = downgrade_database(db_path)
+            print("Migration 008 rollback successful" if success else "Migration 008 rollback failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "status":
+        applied = check_migration_status(db_path)
+        print(f"Migration 008 status: {'Applied' if applied else 'Not Applied'}")
+    
+    else:
+        print("Invalid command. Use: upgrade, downgrade, or status")
+        sys.exit(1)
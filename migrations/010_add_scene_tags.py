@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Migration: Add tags and scene_tags tables
+Version: 010
+Date: 2026-10-17
+Description: Normalized tag storage: one row per StashDB tag and an indexed scene-to-tag join table, backfilled from the JSON tags/categories columns
+"""
+
+import json
+import sqlite3
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_json_list(value):
+    if not value:
+        return []
+    try:
+        loaded = json.loads(value)
+    except ValueError:
+        return []
+    return loaded if isinstance(loaded, list) else []
+
+
+def backfill_scene_tags(cursor):
+    """Fill tags and scene_tags from the JSON tags/categories columns of existing scenes.
+    
+    The JSON columns keep tag names and categories as separate lists, and categories only
+    for tags that have one. Where both lists are the same length every tag had a category
+    and they pair up in order; StashDB categories are per tag, so the categories learned
+    there are applied to the same tag names in every other scene. Tags get their StashDB
+    id the next time discovery sees them.
+    """
+    categories = {}
+    for tags_json, categories_json in cursor.execute(
+            "SELECT tags, categories FROM scenes WHERE tags IS NOT NULL AND categories IS NOT NULL").fetchall():
+        names = load_json_list(tags_json)
+        scene_categories = load_json_list(categories_json)
+        if names and len(names) == len(scene_categories):
+            for name, category in zip(names, scene_categories):
+                if name and category:
+                    categories.setdefault(name, category)
+    
+    tag_ids = {}
+    links = []
+    for scene_id, tags_json in cursor.execute("SELECT id, tags FROM scenes WHERE tags IS NOT NULL").fetchall():
+        for name in set(load_json_list(tags_json)):
+            if not name:
+                continue
+            if name not in tag_ids:
+                cursor.execute("INSERT OR IGNORE INTO tags (name, category) VALUES (?, ?)", (name, categories.get(name)))
+                tag_ids[name] = cursor.execute("SELECT id FROM tags WHERE name = ?", (name,)).fetchone()[0]
+            links.append((scene_id, tag_ids[name]))
+    
+    cursor.executemany("INSERT OR IGNORE INTO scene_tags (scene_id, tag_id) VALUES (?, ?)", links)
+    logger.info(f"Backfilled {len(tag_ids)} tags ({sum(1 for name in tag_ids if name in categories)} with a category) "
+                f"and {len(links)} scene links")
+
+
+def upgrade_database(db_path):
+    """Apply the migration to upgrade the database."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting migration 010: Add tags and scene_tags tables")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tags (
+                id INTEGER NOT NULL PRIMARY KEY,
+                stashdb_id VARCHAR(50) UNIQUE,
+                name VARCHAR(200) NOT NULL UNIQUE,
+                category VARCHAR(200)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_tags_category ON tags (category)")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scene_tags (
+                scene_id INTEGER NOT NULL REFERENCES scenes (id) ON DELETE CASCADE,
+                tag_id INTEGER NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+                PRIMARY KEY (scene_id, tag_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_scene_tags_tag_id ON scene_tags (tag_id, scene_id)")
+        
+        logger.info("Created tags and scene_tags tables")
+        
+        backfill_scene_tags(cursor)
+        
+        # Create migration tracking table if it doesn't exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migration_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version VARCHAR(10) NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                applied_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                success BOOLEAN DEFAULT 1 NOT NULL
+            )
+        """)
+        
+        # Record this migration
+        cursor.execute("""
+            INSERT OR IGNORE INTO migration_history (version, name, applied_date, success)
+            VALUES ('010', 'add_scene_tags', ?, 1)
+        """, (datetime.utcnow().isoformat(),))
+        
+        conn.commit()
+        logger.info("Migration 010 completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 010 failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def downgrade_database(db_path):
+    """Rollback the migration (downgrade the database)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting rollback of migration 010")
+        
+        cursor.execute("DROP TABLE IF EXISTS scene_tags")
+        cursor.execute("DROP TABLE IF EXISTS tags")
+        cursor.execute("DELETE FROM migration_history WHERE version = '010'")
+        
+        conn.commit()
+        logger.info("Migration 010 rollback completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 010 rollback failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def check_migration_status(db_path):
+    """Check if this migration has been applied."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT name FROM sqlite_master 
+            WHERE type='table' AND name='scene_tags'
+        """)
+        if cursor.fetchone() is None:
+            return False
+        
+        # create_all() makes the tables empty; scenes stored before then still need the backfill
+        cursor.execute("""
+            SELECT 1 FROM scenes
+            WHERE tags IS NOT NULL AND NOT EXISTS (SELECT 1 FROM scene_tags WHERE scene_tags.scene_id = scenes.id)
+            LIMIT 1
+        """)
+        return cursor.fetchone() is None
+        
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    import os
+    
+    # Default database path
+    db_path = os.environ.get('DATABASE_PATH', '/app/data/stash_filter.db')
+    
+    if len(sys.argv) < 2:
+        print("Usage: python 010_add_scene_tags.py [upgrade|downgrade|status]")
+        sys.exit(1)
+    
+    command = sys.argv[1].lower()
+    
+    if command == "upgrade":
+        if check_migration_status(db_path):
+            print("Migration 010 already applied")
+        else:
+            success = upgrade_database(db_path)
+            print("Migration 010 applied successfully" if success else "Migration 010 failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "downgrade":
+        if not check_migration_status(db_path):
+            print("Migration 010 not applied, nothing to rollback")
+        else:
+            success = downgrade_database(db_path)
+            print("Migration 010 rollback successful" if success else "Migration 010 rollback failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "status":
+        applied = check_migration_status(db_path)
+        print(f"Migration 010 status: {'Applied' if applied else 'Not Applied'}")
+    
+    else:
+        print("Invalid command. Use: upgrade, downgrade, or status")
+        sys.exit(1)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Migration: Add performance indexes
+Version: 011
+Date: 2026-10-17
+Description: Single and composite indexes for the scene, wanted-scene and log queries that otherwise scan whole tables
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (index name, table, columns); names match the models so create_all() builds the same indexes
+INDEXES = [
+    ('ix_scenes_performer_release', 'scenes', 'performer_id, release_date'),
+    ('ix_scenes_studio_release', 'scenes', 'studio_id, release_date'),
+    ('ix_scenes_wanted_release', 'scenes', 'is_wanted, release_date'),
+    ('ix_scenes_filtered_discovered', 'scenes', 'is_filtered, discovered_date'),
+    ('ix_scenes_release_date', 'scenes', 'release_date'),
+    ('ix_wanted_scenes_pending', 'wanted_scenes', 'status, added_to_whisparr'),
+    ('ix_wanted_scenes_release_date', 'wanted_scenes', 'release_date'),
+    ('ix_logs_timestamp', 'logs', 'timestamp'),
+]
+
+
+def upgrade_database(db_path):
+    """Apply the migration to upgrade the database."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting migration 011: Add performance indexes")
+        
+        for name, table, columns in INDEXES:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            logger.info(f"Created index {name} on {table} ({columns})")
+        
+        # Give the planner row counts for the new indexes
+        cursor.execute("ANALYZE")
+        
+        # Create migration tracking table if it doesn't exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migration_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version VARCHAR(10) NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                applied_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                success BOOLEAN DEFAULT 1 NOT NULL
+            )
+        """)
+        
+        # Record this migration
+        cursor.execute("""
+            INSERT OR IGNORE INTO migration_history (version, name, applied_date, success)
+            VALUES ('011', 'add_performance_indexes', ?, 1)
+        """, (datetime.utcnow().isoformat(),))
+        
+        conn.commit()
+        logger.info("Migration 011 completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 011 failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def downgrade_database(db_path):
+    """Rollback the migration (downgrade the database)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        logger.info("Starting rollback of migration 011")
+        
+        for name, _, _ in INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        cursor.execute("DELETE FROM migration_history WHERE version = '011'")
+        
+        conn.commit()
+        logger.info("Migration 011 rollback completed successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Migration 011 rollback failed: {str(e)}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+def check_migration_status(db_path):
+    """Check if this migration has been applied."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        return all(name in existing for name, _, _ in INDEXES)
+        
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    import os
+    
+    # Default database path
+    db_path = os.environ.get('DATABASE_PATH', '/app/data/stash_filter.db')
+    
+    if len(sys.argv) < 2:
+        print("Usage: python 011_add_performance_indexes.py [upgrade|downgrade|status]")
+        sys.exit(1)
+    
+    command = sys.argv[1].lower()
+    
+    if command == "upgrade":
+        if check_migration_status(db_path):
+            print("Migration 011 already applied")
+        else:
+            success = upgrade_database(db_path)
+            print("Migration 011 applied successfully" if success else "Migration 011 failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "downgrade":
+        if not check_migration_status(db_path):
+            print("Migration 011 not applied, nothing to rollback")
+        else:
+            success = downgrade_database(db_path)
+            print("Migration 011 rollback successful" if success else "Migration 011 rollback failed")
+            sys.exit(0 if success else 1)
+    
+    elif command == "status":
+        applied = check_migration_status(db_path)
+        print(f"Migration 011 status: {'Applied' if applied else 'Not Applied'}")
+    
+    else:
+        print("Invalid command. Use: upgrade, downgrade, or status")
+        sys.exit(1)
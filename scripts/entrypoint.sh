@@ -46,7 +46,7 @@ if [ -f "/app/run_migration.py" ] && [ -d "/app/migrations" ]; then
             echo "Checking migration: $migration_name"
             
             # Check if migration is needed and run it
-            if ! python /app/run_migration.py "$migration_name" status 2>/dev/null | grep -q "APPLIED"; then
+            if ! python /app/run_migration.py "$migration_name" status 2>/dev/null | grep -q "status: APPLIED"; then
                 echo "Running migration: $migration_name"
                 python /app/run_migration.py "$migration_name" upgrade
                 if [ $? -eq 0 ]; then
@@ -74,6 +74,27 @@ with app.app_context():
 "
 fi
 
+# Schedule discovery: daily at 6 AM, or every DISCOVERY_TICK_MINUTES with the adaptive schedule
+# (cron doesn't pass the container environment on, so the job is told which mode it runs in)
+if [ "${DISCOVERY_ADAPTIVE_SCHEDULE}" = "true" ]; then
+    TICK_MINUTES=${DISCOVERY_TICK_MINUTES:-60}
+    case "${TICK_MINUTES}" in
+        ''|*[!0-9]*) TICK_MINUTES=60 ;;
+    esac
+    if [ "${TICK_MINUTES}" -lt 5 ]; then
+        TICK_MINUTES=5
+    fi
+    if [ "${TICK_MINUTES}" -lt 60 ]; then
+        DISCOVERY_CRON="*/${TICK_MINUTES} * * * *"
+    else
+        DISCOVERY_CRON="0 */$((TICK_MINUTES / 60)) * * *"
+    fi
+    echo "Adaptive discovery schedule: looking for due entities with cron '${DISCOVERY_CRON}'"
+    echo "${DISCOVERY_CRON} cd /app && DISCOVERY_ADAPTIVE_SCHEDULE=true python app/scheduler.py" | crontab -
+else
+    echo "0 6 * * * cd /app && python app/scheduler.py" | crontab -
+fi
+
 # Start cron daemon for scheduled tasks
 echo "Starting cron daemon..."
 cron
@@ -9,6 +9,22 @@ import os
 # Add the project root to Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from flask import Flask
+
+from app.models import db
+
+@pytest.fixture
+def app():
+    """Flask app bound to a fresh in-memory database, with an app context pushed."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
 @pytest.fixture
 def mock_app_context():
     """Mock app context for testing."""
@@ -0,0 +1,74 @@
+"""
+Tests for the release-cadence check schedule.
+"""
+
+import pytest
+from datetime import date, datetime, timedelta
+
+from app.models import db, DiscoveryRun, Performer, Studio
+from app.check_schedule import any_entity_due, check_interval_hours
+from app.discovery import run_discovery_task
+
+TODAY = date(2026, 6, 1)
+
+def days_ago(*days):
+    return [TODAY - timedelta(days=day) for day in days]
+
+def test_daily_studio_is_checked_at_the_shortest_interval():
+    """Test an entity releasing several scenes a day is clamped to the minimum interval."""
+    recent = days_ago(*[day // 3 for day in range(540)])
+    
+    assert check_interval_hours(recent, recent[0], TODAY) == 6
+
+def test_monthly_performer_is_checked_about_twice_a_month():
+    """Test the interval is half the expected gap between releases."""
+    recent = days_ago(3, 33, 63, 93, 123, 153)
+    
+    assert check_interval_hours(recent, recent[0], TODAY) == 30 * 24 / 2
+
+def test_dormant_performer_is_checked_at_the_longest_interval():
+    """Test an entity silent for years falls back to the maximum interval."""
+    assert check_interval_hours([], TODAY - timedelta(days=5 * 365), TODAY) == 720
+
+def test_silence_longer_than_cadence_stretches_the_interval():
+    """Test a recently active entity that went quiet is checked less often."""
+    recent = days_ago(*range(40, 50))
+    
+    assert check_interval_hours(recent, recent[0], TODAY) == 40 * 24 / 2
+
+def test_entity_without_releases_uses_longest_interval(monkeypatch):
+    """Test the configured maximum applies when nothing is known."""
+    monkeypatch.setenv('DISCOVERY_MAX_CHECK_HOURS', '240')
+    
+    assert check_interval_hours([], None, TODAY) == 240
+
+def test_future_release_counts_as_today():
+    """Test announced releases don't produce a negative silence."""
+    recent = days_ago(-10, 30, 60, 90, 120, 150)
+    
+    assert check_interval_hours(recent, recent[0], TODAY) == 30 * 24 / 2
+
+def test_any_entity_due_looks_at_monitored_entities_only(app):
+    """Test an entity is due with no next check set or one in the past, and unmonitored ones never count."""
+    now = datetime(2026, 6, 1, 12, 0)
+    db.session.add_all([
+        Performer(name='Later', next_check_due=now + timedelta(hours=1)),
+        Studio(name='Unmonitored', monitored=False, next_check_due=None)
+    ])
+    db.session.commit()
+    assert not any_entity_due(now)
+    
+    db.session.add(Studio(name='Overdue', next_check_due=now - timedelta(minutes=1)))
+    db.session.commit()
+    assert any_entity_due(now)
+
+def test_adaptive_tick_returns_early_when_nothing_is_due(app, monkeypatch):
+    """Test a scheduled tick with no due entity returns before starting a run."""
+    monkeypatch.setenv('DISCOVERY_ADAPTIVE_SCHEDULE', 'true')
+    db.session.add(Performer(name='Later', next_check_due=datetime.utcnow() + timedelta(days=1)))
+    db.session.commit()
+    
+    result = run_discovery_task(trigger='scheduled')
+    
+    assert result['status'] == 'not_due'
+    assert DiscoveryRun.query.count() == 0
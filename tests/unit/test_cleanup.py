@@ -0,0 +1,72 @@
+"""
+Unit tests for the chunked cleanup job.
+"""
+
+import importlib.util
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from app.models import db, Scene, WantedScene, LogEntry, Tag, SceneTag
+from app.cleanup import run_cleanup
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', '..', 'migrations', '012_enable_incremental_vacuum.py')
+
+SETTINGS = {'log_retention_days': 30, 'filtered_retention_days': 90, 'batch_size': 3, 'pause_ms': 0, 'vacuum': True}
+
+def add_scene(number, filtered, age_days, wanted=False):
+    scene = Scene(stashdb_id=f'scene-{number}', title=f'Scene {number}', is_filtered=filtered,
+                  discovered_date=datetime.utcnow() - timedelta(days=age_days))
+    db.session.add(scene)
+    db.session.flush()
+    db.session.add(SceneTag(scene_id=scene.id, tag_id=1))
+    if wanted:
+        db.session.add(WantedScene(scene_id=scene.id, title=scene.title))
+    return scene
+
+def test_cleanup_deletes_past_retention_in_chunks(app):
+    """Test old logs and old filtered scenes go, with their wanted rows and tag links, and nothing else does."""
+    db.session.add(Tag(id=1, name='Anal'))
+    for number in range(7):
+        add_scene(number, filtered=True, age_days=120, wanted=number % 2 == 0)
+    add_scene(10, filtered=True, age_days=10)
+    add_scene(11, filtered=False, age_days=400, wanted=True)
+    for age in (1, 5, 40, 41, 42, 43):
+        db.session.add(LogEntry(level='INFO', message=f'{age} days old', timestamp=datetime.utcnow() - timedelta(days=age)))
+    db.session.commit()
+    
+    report = run_cleanup(SETTINGS)
+    
+    assert report['scenes_deleted'] == 7
+    assert report['wanted_deleted'] == 4
+    assert report['scene_tags_deleted'] == 7
+    assert report['logs_deleted'] == 4
+    assert report['rows_deleted'] == 22
+    # 4 logs in chunks of 3 (2), 7 scenes in chunks of 3 (3)
+    assert report['chunks'] == 5
+    assert sorted(scene.stashdb_id for scene in Scene.query.all()) == ['scene-10', 'scene-11']
+    assert WantedScene.query.count() == 1
+    assert SceneTag.query.count() == 2
+    assert LogEntry.query.count() == 2
+    
+    assert run_cleanup(SETTINGS)['rows_deleted'] == 0
+
+def test_migration_enables_incremental_vacuum(tmp_path):
+    """Test migration 012 converts an existing database so cleanup can shrink it."""
+    spec = importlib.util.spec_from_file_location('migration_012', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    
+    db_path = str(tmp_path / 'stash_filter.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY, message TEXT)")
+    conn.commit()
+    conn.close()
+    
+    assert not migration.check_migration_status(db_path)
+    assert migration.upgrade_database(db_path)
+    assert migration.check_migration_status(db_path)
+    
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,47 @@
+"""
+Tests for the SQLite connection settings.
+"""
+
+import sqlite3
+
+import pytest
+
+from app.database import get_sqlite_settings, apply_sqlite_pragmas
+
+def test_defaults(monkeypatch):
+    """Test WAL with NORMAL sync, a busy timeout and foreign keys are on by default."""
+    for name in ('SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS', 'SQLITE_BUSY_TIMEOUT_MS', 'SQLITE_CACHE_SIZE_KB',
+                 'SQLITE_MMAP_SIZE_MB', 'SQLITE_FOREIGN_KEYS'):
+        monkeypatch.delenv(name, raising=False)
+    settings = get_sqlite_settings()
+    
+    assert settings['journal_mode'] == 'WAL'
+    assert settings['synchronous'] == 'NORMAL'
+    assert settings['busy_timeout'] == 15000
+    assert settings['cache_size'] == -65536
+    assert settings['foreign_keys'] == 1
+
+def test_invalid_values_fall_back_to_defaults(monkeypatch):
+    """Test unknown modes and non-numeric sizes are ignored rather than passed to SQLite."""
+    monkeypatch.setenv('SQLITE_JOURNAL_MODE', 'wal; DROP TABLE scenes')
+    monkeypatch.setenv('SQLITE_SYNCHRONOUS', 'full')
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', 'soon')
+    monkeypatch.setenv('SQLITE_FOREIGN_KEYS', 'false')
+    settings = get_sqlite_settings()
+    
+    assert settings['journal_mode'] == 'WAL'
+    assert settings['synchronous'] == 'FULL'
+    assert settings['busy_timeout'] == 15000
+    assert settings['foreign_keys'] == 0
+
+def test_pragmas_take_effect_on_a_file_database(tmp_path, monkeypatch):
+    """Test the pragmas are in effect on a new connection to a database file."""
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '2500')
+    conn = sqlite3.connect(str(tmp_path / 'test.db'))
+    apply_sqlite_pragmas(conn, get_sqlite_settings())
+    
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 2500
+    assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    conn.close()
@@ -0,0 +1,418 @@
+"""
+Unit tests for set-based discovery writes.
+"""
+
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import discovery
+from app.models import db, Scene, WantedScene, Performer, Studio, Tag, SceneTag, DiscoveryCursor
+from app.discovery import (apply_scene_page, entity_watermark, iter_entity_scene_pages, process_entity_scenes,
+                           record_entity_results, run_entities_concurrently, run_feed_discovery, SeenScenes,
+                           FEED_CURSOR_NAME, SCENES_PER_PAGE)
+from app.filter_engine import FilterEngine
+
+class FakeOwnership:
+    ready = True
+    
+    def __init__(self, owned=()):
+        self.owned = set(owned)
+    
+    def is_owned(self, stashdb_id):
+        return stashdb_id in self.owned
+
+class FakeFeed:
+    """StashDB scene feed served from a list, newest first"""
+    
+    def __init__(self, scenes, page_size):
+        self.scenes = scenes
+        self.page_size = page_size
+        self.pages_requested = []
+    
+    def get_scene_feed(self, page=1, limit=100):
+        self.pages_requested.append(page)
+        start = (page - 1) * self.page_size
+        return {'scenes': self.scenes[start:start + self.page_size]}
+
+@pytest.fixture
+def app(app):
+    db.session.add_all([Performer(id=1, name='Performer One'), Performer(id=2, name='Performer Two'),
+                        Studio(id=1, name='Studio One')])
+    db.session.commit()
+    return app
+
+def scene(scene_id, tags=(), performer='Performer One', studio='Studio One', date='2024-01-01'):
+    return {
+        'id': scene_id, 'title': f'Title {scene_id}', 'date': date, 'duration': 1800,
+        'tags': [{'id': f'tag-{name}', 'name': name, 'category': category} for name, category in tags],
+        'performers': [{'performer': {'id': 'p1', 'name': performer}}],
+        'studio': {'id': 's1', 'name': studio}
+    }
+
+def feed_scene(scene_id, created, performer_id='p1', studio_id='other'):
+    return dict(scene(scene_id), created=created.isoformat() + 'Z',
+                performers=[{'performer': {'id': performer_id, 'name': performer_id}}],
+                studio={'id': studio_id, 'name': studio_id})
+
+class FakeEntityScenes:
+    """A performer's scenes served a full page at a time, newest first"""
+    
+    def __init__(self, scenes, fail_on_page=None):
+        self.scenes = scenes
+        self.fail_on_page = fail_on_page
+        self.pages_requested = []
+    
+    def get_performer_scenes(self, stashdb_id, page=1):
+        self.pages_requested.append(page)
+        if page == self.fail_on_page:
+            raise Exception('StashDB unavailable')
+        start = (page - 1) * SCENES_PER_PAGE
+        return {'scenes': self.scenes[start:start + SCENES_PER_PAGE]}
+
+class FakeCatalogues:
+    """Three scenes per performer, on one page; every third performer's first scene has an unwanted tag"""
+    
+    def get_performer_scenes(self, stashdb_id, page=1):
+        number = int(stashdb_id.split('-')[1])
+        tags = [('Anal', 'Action')] if number % 3 == 0 else [('Blonde', 'Hair')]
+        return {'scenes': [scene(f'{stashdb_id}-a', tags=tags), scene(f'{stashdb_id}-b'), scene(f'{stashdb_id}-c')]}
+
+def daily_scenes(count, newest=date(2024, 6, 1)):
+    """One scene a day going back from newest, as StashDB returns them"""
+    return [scene(f'day-{number}', date=(newest - timedelta(days=number)).isoformat()) for number in range(count)]
+
+def watermarked_performer(release_date, scene_id, last_full_sync=None):
+    performer = db.session.get(Performer, 1)
+    performer.stashdb_id = 'p1'
+    performer.latest_release_date = release_date
+    performer.latest_scene_id = scene_id
+    performer.last_full_sync = last_full_sync or datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+    return performer
+
+def pool_jobs(count=8):
+    performers = [Performer(id=10 + number, name=f'Pool {number}', stashdb_id=f'pool-{number}') for number in range(count)]
+    db.session.add_all(performers)
+    db.session.commit()
+    return [('performer', performer) for performer in performers]
+
+def pool_results():
+    return {'new_scenes': 0, 'filtered_scenes': 0, 'pages_fetched': 0, 'entity_timings': [], 'page_writes': [],
+            'errors': []}
+
+def entity_summary(results):
+    return sorted((timing['name'], timing['pages'], timing['new_scenes'], timing['filtered_scenes'])
+                  for timing in results['entity_timings'])
+
+def feed_results():
+    return {'new_scenes': 0, 'filtered_scenes': 0, 'pages_fetched': 0}
+
+def test_new_scenes_are_inserted_with_wanted_rows_and_tags(app):
+    """Test new scenes are stored once each, and only unfiltered, not-owned ones become wanted."""
+    page = [
+        (scene('a', tags=[('Blonde', 'Hair')]), (False, None)),
+        (scene('b', tags=[('Anal', 'Action')]), (True, 'Contains unwanted category: anal')),
+        (scene('c'), (False, None)),
+        # Repeated within the page: only the first copy counts
+        (scene('a'), (True, 'ignored')),
+    ]
+    results = apply_scene_page(page, FakeOwnership(owned={'c'}), performer_id=1)
+    db.session.commit()
+    
+    assert (results['inserted'], results['new_scenes'], results['filtered_scenes']) == (3, 1, 1)
+    assert results['associations_updated'] == 0
+    assert results['wanted_ids'] == ['a']
+    
+    scenes = {row.stashdb_id: row for row in Scene.query.all()}
+    assert set(scenes) == {'a', 'b', 'c'}
+    assert (scenes['a'].is_wanted, scenes['a'].is_filtered, scenes['a'].performer_id) == (True, False, 1)
+    assert json.loads(scenes['a'].tags) == ['Blonde'] and json.loads(scenes['a'].categories) == ['Hair']
+    assert (scenes['b'].is_filtered, scenes['b'].filter_reason) == (True, 'Contains unwanted category: anal')
+    assert (scenes['c'].is_owned, scenes['c'].is_wanted) == (True, False)
+    
+    wanted = WantedScene.query.one()
+    assert (wanted.scene_id, wanted.performer_name, wanted.studio_name, wanted.status) == \
+        (scenes['a'].id, 'Performer One', 'Studio One', 'wanted')
+    assert {(link.scene_id, link.tag_id) for link in SceneTag.query.all()} == {
+        (scenes['a'].id, Tag.query.filter_by(name='Blonde').one().id),
+        (scenes['b'].id, Tag.query.filter_by(name='Anal').one().id)
+    }
+
+def test_known_scenes_only_get_missing_associations(app):
+    """Test scenes already stored are not inserted again and only have empty links filled in."""
+    apply_scene_page([(scene('a'), (False, None)), (scene('b'), (False, None))], FakeOwnership(), performer_id=1)
+    db.session.commit()
+    
+    # 'a' and 'b' are known; 'c' is new on this page
+    results = apply_scene_page([(scene('a'), (True, 'changed')), (scene('b'), (False, None)),
+                                (scene('c'), (False, None))], FakeOwnership(), performer_id=2, studio_id=1)
+    db.session.commit()
+    
+    assert results['inserted'] == 1
+    assert results['new_scenes'] == 1
+    # Studio link filled in on 'a' and 'b'; their performer link is kept
+    assert results['associations_updated'] == 2
+    scenes = {row.stashdb_id: row for row in Scene.query.all()}
+    assert len(scenes) == 3
+    assert [(scenes[key].performer_id, scenes[key].studio_id) for key in 'abc'] == [(1, 1), (1, 1), (2, 1)]
+    # A known scene's stored verdict is left alone
+    assert scenes['a'].is_filtered is False
+    assert WantedScene.query.count() == 3
+
+def test_feed_stops_at_the_cursor_scene(app, monkeypatch):
+    """Test the feed keeps same-second scenes other than the cursor scene and reads no further pages."""
+    monkeypatch.setattr(discovery, 'FEED_PAGE_SIZE', 4)
+    since = datetime(2024, 3, 1, 12, 0, 0)
+    db.session.add(DiscoveryCursor(name=FEED_CURSOR_NAME, created_at=since, scene_id='cursor'))
+    performer = db.session.get(Performer, 1)
+    performer.stashdb_id = 'p1'
+    db.session.commit()
+    
+    feed = FakeFeed([
+        feed_scene('newest', since + timedelta(hours=2)),
+        feed_scene('unmonitored', since + timedelta(hours=1), performer_id='nobody'),
+        feed_scene('same-second', since),
+        feed_scene('cursor', since),
+        feed_scene('older', since - timedelta(hours=1)),
+    ], page_size=4)
+    results = feed_results()
+    report = run_feed_discovery([('performer', performer)], feed, FakeOwnership(), FilterEngine(), results)
+    db.session.commit()
+    
+    assert feed.pages_requested == [1]
+    assert (report['scenes_seen'], report['matched'], report['new_scenes']) == (4, 2, 2)
+    assert results == {'new_scenes': 2, 'filtered_scenes': 0, 'pages_fetched': 1}
+    assert sorted(row.stashdb_id for row in Scene.query.all()) == ['newest', 'same-second']
+    
+    cursor = DiscoveryCursor.query.filter_by(name=FEED_CURSOR_NAME).one()
+    assert (cursor.created_at, cursor.scene_id) == (since + timedelta(hours=2), 'newest')
+    assert performer.last_checked > since
+    assert performer.latest_scene_id == 'newest'
+    
+    # Nothing is newer than the advanced cursor on the next run
+    report = run_feed_discovery([('performer', performer)], feed, FakeOwnership(), FilterEngine(), feed_results())
+    assert (report['matched'], report['new_scenes']) == (0, 0)
+    assert Scene.query.count() == 2
+
+def test_feed_page_limit_keeps_the_cursor(app, monkeypatch):
+    """Test a crawl cut short by DISCOVERY_FEED_MAX_PAGES leaves the cursor so the next run reads the rest."""
+    monkeypatch.setattr(discovery, 'FEED_PAGE_SIZE', 4)
+    monkeypatch.setenv('DISCOVERY_FEED_MAX_PAGES', '1')
+    since = datetime(2024, 3, 1, 12, 0, 0)
+    db.session.add(DiscoveryCursor(name=FEED_CURSOR_NAME, created_at=since, scene_id='cursor'))
+    performer = db.session.get(Performer, 1)
+    performer.stashdb_id = 'p1'
+    db.session.commit()
+    last_checked = performer.last_checked
+    
+    feed = FakeFeed([feed_scene(f'new-{hours}', since + timedelta(hours=hours)) for hours in range(6, 0, -1)] +
+                    [feed_scene('cursor', since)], page_size=4)
+    report = run_feed_discovery([('performer', performer)], feed, FakeOwnership(), FilterEngine(), feed_results())
+    db.session.commit()
+    
+    assert feed.pages_requested == [1]
+    assert (report['complete'], report['new_scenes']) == (False, 4)
+    cursor = DiscoveryCursor.query.filter_by(name=FEED_CURSOR_NAME).one()
+    assert (cursor.created_at, cursor.scene_id) == (since, 'cursor')
+    assert performer.last_checked == last_checked
+    
+    # The next run reads down to the cursor again and picks up the scenes it missed
+    monkeypatch.setenv('DISCOVERY_FEED_MAX_PAGES', '5')
+    feed.pages_requested = []
+    report = run_feed_discovery([('performer', performer)], feed, FakeOwnership(), FilterEngine(), feed_results())
+    db.session.commit()
+    
+    assert feed.pages_requested == [1, 2]
+    assert (report['complete'], report['new_scenes']) == (True, 2)
+    assert Scene.query.count() == 6
+    assert (cursor.created_at, cursor.scene_id) == (since + timedelta(hours=6), 'new-6')
+
+def test_first_feed_run_starts_from_entity_checks(app):
+    """Test without a cursor the feed reads back to the oldest last check and matches sub-studios."""
+    since = datetime(2024, 3, 1)
+    studio = db.session.get(Studio, 1)
+    studio.stashdb_id = 's1'
+    studio.last_checked = since
+    db.session.commit()
+    
+    child_scene = feed_scene('child', since + timedelta(days=1), performer_id='nobody', studio_id='s1-child')
+    child_scene['studio']['parent'] = {'id': 's1'}
+    feed = FakeFeed([child_scene, feed_scene('before', since - timedelta(days=1), performer_id='nobody', studio_id='s1')],
+                    page_size=100)
+    report = run_feed_discovery([('studio', studio)], feed, FakeOwnership(), FilterEngine(), feed_results())
+    db.session.commit()
+    
+    assert report['since'] == since.isoformat()
+    assert [(row.stashdb_id, row.studio_id, row.performer_id) for row in Scene.query.all()] == [('child', 1, None)]
+    assert DiscoveryCursor.query.filter_by(name=FEED_CURSOR_NAME).one().scene_id == 'child'
+
+def test_seen_scenes_claim_link_and_flush(app):
+    """Test claim returns only unseen ids, the first link per scene wins and flush writes missing links once."""
+    apply_scene_page([(scene('a'), (False, None)), (scene('b'), (False, None))], FakeOwnership())
+    db.session.commit()
+    seen = SeenScenes()
+    
+    assert seen.claim(['a', 'b']) == {'a', 'b'}
+    assert seen.claim(['b', 'c']) == {'c'}
+    assert 'c' in seen and 'd' not in seen
+    
+    seen.link(['a', 'b'], performer_id=1)
+    seen.link(['a'], performer_id=2, studio_id=1)
+    assert seen.flush() == 3
+    assert seen.associations_updated == 3
+    assert [(row.stashdb_id, row.performer_id, row.studio_id) for row in Scene.query.order_by(Scene.stashdb_id)] == \
+        [('a', 1, 1), ('b', 1, None)]
+    # Queued links are written once
+    assert seen.flush() == 0
+
+def test_shared_scene_is_written_once_per_run(app):
+    """Test a scene seen under two entities is stored by the first and only linked by the second."""
+    seen = SeenScenes()
+    first = apply_scene_page([(scene('shared'), (False, None)), (scene('solo'), (False, None))],
+                             FakeOwnership(), performer_id=1, seen=seen)
+    second = apply_scene_page([(scene('shared'), (False, None))], FakeOwnership(), studio_id=1, seen=seen)
+    
+    assert (first['inserted'], first['redundant_skipped']) == (2, 0)
+    assert (second['inserted'], second['redundant_skipped'], second['new_scenes']) == (0, 1, 0)
+    assert seen.redundant_skipped == 1
+    
+    assert seen.flush() == 1
+    db.session.commit()
+    shared = Scene.query.filter_by(stashdb_id='shared').one()
+    assert (shared.performer_id, shared.studio_id) == (1, 1)
+    assert WantedScene.query.count() == 2
+
+def test_failed_write_releases_claimed_scenes(app, monkeypatch):
+    """Test scenes whose page write raised are evaluated again by the next sighting instead of skipped."""
+    seen = SeenScenes()
+    
+    def fail(scene_tags):
+        raise RuntimeError('database is locked')
+    monkeypatch.setattr(discovery, 'store_scene_tags', fail)
+    with pytest.raises(RuntimeError):
+        apply_scene_page([(scene('a'), (False, None))], FakeOwnership(), performer_id=1, seen=seen)
+    db.session.rollback()
+    assert 'a' not in seen
+    
+    monkeypatch.undo()
+    results = apply_scene_page([(scene('a'), (False, None))], FakeOwnership(), performer_id=2, seen=seen)
+    assert (results['inserted'], results['redundant_skipped']) == (1, 0)
+    assert Scene.query.filter_by(stashdb_id='a').one().performer_id == 2
+
+def test_up_to_date_entity_fetches_one_page(monkeypatch):
+    """Test an entity with nothing newer than its watermark costs one request, not the prefetch depth."""
+    monkeypatch.setenv('PREFETCH_DEPTH', '2')
+    released = date(2024, 1, 1)
+    api = FakeEntityScenes([scene(f'old-{number}', date=(released - timedelta(days=number)).isoformat())
+                            for number in range(SCENES_PER_PAGE * 4)])
+    progress = {}
+    
+    pages = list(iter_entity_scene_pages('performer', 'p1', 'Performer One', api, watermark=(released, 'old-0'),
+                                         progress=progress))
+    
+    assert [page_num for page_num, _ in pages] == [1]
+    assert api.pages_requested == [1]
+    assert progress['complete'] is True
+
+def test_crawl_stops_at_first_page_without_newer_scenes(app):
+    """Test an incremental crawl reads up to the first page with nothing newer, then moves the watermark."""
+    scenes = daily_scenes(SCENES_PER_PAGE * 4)
+    # The watermark sits part-way down page 2, so page 3 is the first with nothing new
+    mark = scenes[SCENES_PER_PAGE + 10]
+    performer = watermarked_performer(date.fromisoformat(mark['date']), mark['id'])
+    api = FakeEntityScenes(scenes)
+    
+    results = process_entity_scenes('performer', performer, api, FakeOwnership(), FilterEngine())
+    db.session.commit()
+    
+    assert api.pages_requested == [1, 2, 3]
+    assert results['pages'] == 3
+    assert (performer.latest_release_date, performer.latest_scene_id) == (date(2024, 6, 1), 'day-0')
+    assert Scene.query.count() == SCENES_PER_PAGE * 3
+
+def test_watermark_kept_when_a_page_fetch_fails(app):
+    """Test pages read before a failed fetch are stored but the watermark stays, so the next run retries them."""
+    scenes = daily_scenes(SCENES_PER_PAGE * 3)
+    mark = scenes[-1]
+    performer = watermarked_performer(date.fromisoformat(mark['date']), mark['id'])
+    api = FakeEntityScenes(scenes, fail_on_page=2)
+    
+    results = process_entity_scenes('performer', performer, api, FakeOwnership(), FilterEngine())
+    db.session.commit()
+    
+    assert results['pages'] == 1
+    assert Scene.query.count() == SCENES_PER_PAGE
+    assert (performer.latest_release_date, performer.latest_scene_id) == (date.fromisoformat(mark['date']), mark['id'])
+
+def test_deep_resync_walks_the_whole_catalogue(app, monkeypatch):
+    """Test deep_resync, or a last full walk older than DISCOVERY_DEEP_RESYNC_DAYS, ignores the watermark."""
+    monkeypatch.setenv('DISCOVERY_DEEP_RESYNC_DAYS', '7')
+    scenes = daily_scenes(SCENES_PER_PAGE * 2 + 5)
+    performer = watermarked_performer(date(2024, 6, 1), 'day-0', last_full_sync=datetime.utcnow() - timedelta(days=2))
+    
+    assert entity_watermark(performer) == (date(2024, 6, 1), 'day-0')
+    assert entity_watermark(performer, deep_resync=True) is None
+    performer.last_full_sync = datetime.utcnow() - timedelta(days=8)
+    assert entity_watermark(performer) is None
+    # 0 turns the periodic walk off
+    monkeypatch.setenv('DISCOVERY_DEEP_RESYNC_DAYS', '0')
+    assert entity_watermark(performer) == (date(2024, 6, 1), 'day-0')
+    
+    api = FakeEntityScenes(scenes)
+    process_entity_scenes('performer', performer, api, FakeOwnership(), FilterEngine(), deep_resync=True)
+    db.session.commit()
+    
+    assert api.pages_requested == [1, 2, 3]
+    assert Scene.query.count() == len(scenes)
+    assert performer.last_full_sync > datetime.utcnow() - timedelta(minutes=1)
+
+def test_worker_pool_matches_sequential_run(app):
+    """Test entities collected on a worker pool store and report the same as the sequential loop."""
+    jobs = pool_jobs()
+    filters = FilterEngine(unwanted=['Anal'])
+    
+    sequential = pool_results()
+    for kind, entity in jobs:
+        record_entity_results(kind, entity, process_entity_scenes(kind, entity, FakeCatalogues(), FakeOwnership(),
+                                                                  filters, True, SeenScenes()), 0.0, sequential)
+    db.session.commit()
+    sequential_scenes = {row.stashdb_id: (row.performer_id, row.is_filtered, row.filter_reason, row.is_wanted)
+                         for row in Scene.query.all()}
+    
+    WantedScene.query.delete()
+    SceneTag.query.delete()
+    Scene.query.delete()
+    db.session.commit()
+    pooled = pool_results()
+    run_entities_concurrently(jobs, FakeCatalogues(), FakeOwnership(), filters, pooled, workers=4, deep_resync=True,
+                              seen=SeenScenes())
+    db.session.commit()
+    
+    assert pooled['errors'] == []
+    assert (pooled['new_scenes'], pooled['filtered_scenes']) == (21, 3)
+    assert (sequential['new_scenes'], sequential['filtered_scenes']) == (21, 3)
+    assert entity_summary(pooled) == entity_summary(sequential)
+    assert {row.stashdb_id: (row.performer_id, row.is_filtered, row.filter_reason, row.is_wanted)
+            for row in Scene.query.all()} == sequential_scenes
+
+def test_worker_pool_keeps_going_past_a_failed_entity(app, monkeypatch):
+    """Test one entity whose write fails is reported while every other entity is still stored."""
+    jobs = pool_jobs()
+    apply_collected = discovery.apply_collected_scenes
+    
+    def flaky(kind, entity, *args, **kwargs):
+        if entity.name == 'Pool 3':
+            raise RuntimeError('database is locked')
+        return apply_collected(kind, entity, *args, **kwargs)
+    monkeypatch.setattr(discovery, 'apply_collected_scenes', flaky)
+    
+    results = pool_results()
+    run_entities_concurrently(jobs, FakeCatalogues(), FakeOwnership(), FilterEngine(), results, workers=4)
+    db.session.commit()
+    
+    assert results['errors'] == ['Error processing performer Pool 3: database is locked']
+    assert len(results['entity_timings']) == len(jobs) - 1
+    assert Scene.query.count() == 3 * (len(jobs) - 1)
+    assert not Scene.query.filter(Scene.stashdb_id.like('pool-3-%')).count()
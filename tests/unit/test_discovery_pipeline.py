@@ -0,0 +1,172 @@
+"""
+Unit tests for the staged discovery pipeline.
+"""
+
+import threading
+import time
+
+import pytest
+
+from app import discovery
+from app.models import db, Config, Performer, Scene, WantedScene
+from app.discovery import process_entity_scenes, record_entity_results, SeenScenes
+from app.discovery_pipeline import run_discovery_pipeline
+from app.filter_engine import FilterEngine
+
+PERFORMERS = 40
+
+class FakeOwnership:
+    ready = True
+    
+    def is_owned(self, stashdb_id):
+        return False
+
+class FakeStashDB:
+    """Two scenes per performer, the second shared with a neighbouring performer.
+    
+    Solo scenes of performers in `tagged` carry an unwanted tag; those in `broken` have a
+    malformed tag list.
+    """
+    
+    def __init__(self, tagged=(), broken=()):
+        self.tagged = set(tagged)
+        self.broken = set(broken)
+    
+    def get_performer_scenes(self, stashdb_id, page=1):
+        if page > 1:
+            return {'scenes': []}
+        number = int(stashdb_id.split('-')[1])
+        solo = scene(f'solo-{number}', number)
+        if number in self.tagged:
+            solo['tags'] = [{'id': 'tag-anal', 'name': 'Anal', 'category': 'Action'}]
+        if number in self.broken:
+            solo['tags'] = [None]
+        return {'scenes': [solo, scene(f'shared-{number // 2}', number)]}
+
+def scene(scene_id, number):
+    return {'id': scene_id, 'title': scene_id, 'date': '2024-01-01', 'duration': 1800, 'tags': [],
+            'performers': [{'performer': {'id': f'performer-{number}', 'name': f'Performer {number}'}}],
+            'studio': None}
+
+def empty_results():
+    return {'new_scenes': 0, 'filtered_scenes': 0, 'pages_fetched': 0, 'page_writes': [], 'entity_timings': [],
+            'errors': []}
+
+def jobs():
+    return [('performer', performer) for performer in Performer.query.order_by(Performer.id).all()]
+
+def run_pipeline(app, stashdb, config):
+    """Run the pipeline on a thread of its own, failing instead of hanging the suite if it deadlocks"""
+    outcome = {}
+    
+    def run():
+        with app.app_context():
+            results = empty_results()
+            try:
+                outcome['report'] = run_discovery_pipeline(jobs(), stashdb, FakeOwnership(), config, results)
+                db.session.commit()
+            except Exception as e:
+                outcome['error'] = e
+            outcome['results'] = results
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive()
+    return outcome
+
+def stored_scenes():
+    return {row.stashdb_id: (row.performer_id, row.is_filtered, row.filter_reason, row.is_wanted)
+            for row in Scene.query.all()}
+
+@pytest.fixture
+def app(app, monkeypatch):
+    monkeypatch.setenv('PIPELINE_QUEUE_SIZE', '1')
+    monkeypatch.setenv('PIPELINE_FETCH_WORKERS', '1')
+    db.session.add_all([Performer(id=number, name=f'Performer {number}', stashdb_id=f'performer-{number}')
+                        for number in range(1, PERFORMERS + 1)])
+    db.session.commit()
+    return app
+
+def test_more_jobs_than_queue_capacity(app):
+    """Test a run with far more entities than the bounded queues hold finishes and stores every scene."""
+    outcome = run_pipeline(app, FakeStashDB(), Config(auto_add_to_whisparr=False))
+    
+    results = outcome['results']
+    assert results['errors'] == []
+    assert len(results['entity_timings']) == PERFORMERS
+    assert outcome['report']['stages']['fetch']['items_in'] == PERFORMERS
+    # 40 solo scenes and 21 shared ones (0..20), each stored once
+    assert Scene.query.count() == PERFORMERS + PERFORMERS // 2 + 1
+    assert results['new_scenes'] == WantedScene.query.count() == Scene.query.count()
+    assert Scene.query.filter_by(stashdb_id='solo-7').one().performer_id == 7
+
+def test_pipeline_matches_sequential_discovery(app):
+    """Test the pipeline stores the same scenes, verdicts and counts as the sequential entity loop."""
+    config = Config(auto_add_to_whisparr=False, unwanted_categories='["Anal"]')
+    stashdb = FakeStashDB(tagged=range(1, PERFORMERS + 1, 3))
+    
+    outcome = run_pipeline(app, stashdb, config)
+    pipelined = outcome['results']
+    pipelined_scenes = stored_scenes()
+    
+    Scene.query.delete()
+    WantedScene.query.delete()
+    db.session.commit()
+    sequential = empty_results()
+    seen = SeenScenes()
+    filters = FilterEngine.from_config(config)
+    for kind, entity in jobs():
+        entity_results = process_entity_scenes(kind, entity, stashdb, FakeOwnership(), filters, True, seen)
+        record_entity_results(kind, entity, entity_results, 0.0, sequential)
+    seen.flush()
+    db.session.commit()
+    
+    assert pipelined_scenes == stored_scenes()
+    assert sum(filtered for _, filtered, _, _ in pipelined_scenes.values()) == 14
+    for key in ('new_scenes', 'filtered_scenes'):
+        assert pipelined[key] == sequential[key]
+    assert sorted(timing['name'] for timing in pipelined['entity_timings']) == \
+        sorted(timing['name'] for timing in sequential['entity_timings'])
+
+def test_report_fills_utilization_and_bottleneck(app):
+    """Test every stage reports its throughput and utilization and the bottleneck is one of them."""
+    report = run_pipeline(app, FakeStashDB(), Config(auto_add_to_whisparr=False))['report']
+    
+    stages = report['stages']
+    assert list(stages) == ['fetch', 'normalize', 'dedup', 'filter', 'ownership', 'persist']
+    for name, stage in stages.items():
+        assert stage['items_in'] > 0, name
+        assert stage['utilization'] is not None and 0 <= stage['utilization'] <= 1, name
+        assert stage['items_per_second'] > 0, name
+    assert report['bottleneck'] in stages
+    assert stages[report['bottleneck']]['utilization'] == max(stage['utilization'] for stage in stages.values())
+    assert report['seconds'] > 0
+
+def test_stage_error_drops_the_item_and_the_run_finishes(app):
+    """Test an exception inside a stage is reported and the rest of the run carries on."""
+    outcome = run_pipeline(app, FakeStashDB(broken={5}), Config(auto_add_to_whisparr=False))
+    
+    results = outcome['results']
+    assert 'error' not in outcome
+    assert len(results['errors']) == 1 and results['errors'][0].startswith('Pipeline stage normalize failed')
+    # Only performer 5's page was lost; its entity is still reported
+    assert not Scene.query.filter_by(stashdb_id='solo-5').count()
+    assert Scene.query.count() == PERFORMERS + PERFORMERS // 2
+    assert len(results['entity_timings']) == PERFORMERS
+
+def test_writer_error_stops_every_stage(app, monkeypatch):
+    """Test an exception on the writer thread stops the stages instead of leaving them blocked on full queues."""
+    def fail(*args, **kwargs):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(discovery, 'record_entity_results', fail)
+    
+    outcome = run_pipeline(app, FakeStashDB(), Config(auto_add_to_whisparr=False))
+    
+    assert str(outcome['error']) == 'disk full'
+    for _ in range(50):
+        running = [thread.name for thread in threading.enumerate() if thread.name.startswith('pipeline-')]
+        if not running:
+            break
+        time.sleep(0.1)
+    assert running == []
@@ -0,0 +1,97 @@
+"""
+Unit tests for discovery run checkpoints and resume.
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.models import db, DiscoveryRun
+from app.discovery_runs import DiscoveryRunTracker
+
+PERFORMERS = [SimpleNamespace(id=number) for number in range(4)]
+
+def add_run(status, hours_ago, heartbeat_minutes_ago=None, **fields):
+    started = datetime.utcnow() - timedelta(hours=hours_ago)
+    heartbeat = started if heartbeat_minutes_ago is None else datetime.utcnow() - timedelta(minutes=heartbeat_minutes_ago)
+    run = DiscoveryRun(status=status, started_at=started, heartbeat_at=heartbeat, **fields)
+    db.session.add(run)
+    db.session.commit()
+    return run.id
+
+def test_resumes_latest_interrupted_run(app):
+    """Test the latest interrupted run resumes, skipping finished entities and continuing the current one."""
+    older = add_run('failed', 10)
+    latest = add_run('failed', 2, completed_entities='["performer:1"]', current_entity='performer:2', last_page=3)
+    
+    tracker = DiscoveryRunTracker.start(trigger='manual')
+    
+    assert tracker.run.id == latest
+    assert (tracker.run.status, tracker.run.resume_count, tracker.resumed) == ('running', 1, True)
+    assert tracker.is_done('performer', PERFORMERS[1])
+    assert not tracker.is_done('performer', PERFORMERS[2])
+    assert tracker.start_page('performer', PERFORMERS[2]) == 4
+    assert tracker.start_page('performer', PERFORMERS[3]) == 1
+    assert tracker.start_page('studio', PERFORMERS[2]) == 1
+    # Only the latest run is picked up; the older one is left as it was
+    assert db.session.get(DiscoveryRun, older).status == 'failed'
+    
+    # Once the interrupted entity is done, it starts from page 1 again
+    tracker.entity_done('performer', PERFORMERS[2])
+    assert tracker.start_page('performer', PERFORMERS[2]) == 1
+    assert db.session.get(DiscoveryRun, latest).get_completed_entities() == ['performer:1', 'performer:2']
+
+def test_refuses_while_a_run_is_alive(app):
+    """Test no run starts while another one has checkpointed recently."""
+    add_run('running', 1, heartbeat_minutes_ago=1)
+    
+    assert DiscoveryRunTracker.start() is None
+    assert DiscoveryRun.query.count() == 1
+
+def test_stale_running_run_is_resumed(app):
+    """Test a 'running' run whose heartbeat stopped is treated as interrupted."""
+    stale = add_run('running', 1, heartbeat_minutes_ago=60)
+    
+    assert DiscoveryRunTracker.start().run.id == stale
+
+def test_old_or_superseded_runs_are_abandoned(app, monkeypatch):
+    """Test interrupted runs that are not the latest, or past DISCOVERY_RESUME_HOURS, give way to a new run."""
+    monkeypatch.setenv('DISCOVERY_RESUME_HOURS', '6')
+    superseded = add_run('failed', 5)
+    add_run('completed', 4)
+    
+    tracker = DiscoveryRunTracker.start()
+    assert tracker.run.id != superseded and not tracker.resumed
+    assert db.session.get(DiscoveryRun, superseded).status == 'abandoned'
+    tracker.finish({'status': 'success', 'seconds': 1.0})
+    db.session.commit()
+    
+    expired = add_run('failed', 8)
+    # Make it the latest run by moving the others further back
+    DiscoveryRun.query.filter(DiscoveryRun.id != expired).update(
+        {DiscoveryRun.started_at: datetime.utcnow() - timedelta(hours=20)}, synchronize_session=False)
+    db.session.commit()
+    
+    tracker = DiscoveryRunTracker.start()
+    assert tracker.run.id != expired
+    assert db.session.get(DiscoveryRun, expired).status == 'abandoned'
+
+def test_deep_resync_does_not_resume_a_regular_run(app):
+    """Test a deep resync starts over rather than continuing an interrupted incremental run."""
+    interrupted = add_run('failed', 1, deep_resync=False)
+    
+    tracker = DiscoveryRunTracker.start(deep_resync=True)
+    assert tracker.run.id != interrupted and tracker.deep_resync
+
+def test_finish_sums_attempt_durations(app):
+    """Test a resumed run's duration is the time its attempts ran, not the wall time since it first started."""
+    add_run('failed', 3, new_scenes=5, stats='{"attempts": [{"seconds": 40.0}]}')
+    
+    tracker = DiscoveryRunTracker.start()
+    tracker.finish({'status': 'success', 'seconds': 20.5, 'new_scenes': 2, 'errors': []})
+    db.session.commit()
+    
+    run = tracker.run
+    assert run.status == 'completed'
+    assert run.duration_seconds == 60.5
+    assert run.new_scenes == 7
+    assert [attempt['seconds'] for attempt in run.get_stats()['attempts']] == [40.0, 20.5]
@@ -0,0 +1,115 @@
+"""
+Unit tests for set-based duplicate scene consolidation.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+from app.models import db, Scene, WantedScene, Tag, SceneTag
+from app.duplicates import consolidate_duplicate_scenes
+
+@pytest.fixture
+def app(app):
+    # Duplicates only exist in databases from before stashdb_id was unique
+    connection = db.session.connection()
+    connection.exec_driver_sql("DROP TABLE scenes")
+    connection.exec_driver_sql(str(CreateTable(Scene.__table__).compile(db.engine)).replace('\n\tUNIQUE (stashdb_id), ', ''))
+    for index in Scene.__table__.indexes:
+        connection.exec_driver_sql(str(CreateIndex(index).compile(db.engine)))
+    db.session.commit()
+    return app
+
+def add_scene(stashdb_id, age_days, performer_id=None, studio_id=None, tag_ids=(), wanted=False, owned=False):
+    scene = Scene(stashdb_id=stashdb_id, title=stashdb_id, performer_id=performer_id, studio_id=studio_id,
+                  is_owned=owned, discovered_date=datetime.utcnow() - timedelta(days=age_days))
+    db.session.add(scene)
+    db.session.flush()
+    for tag_id in tag_ids:
+        db.session.add(SceneTag(scene_id=scene.id, tag_id=tag_id))
+    if wanted:
+        db.session.add(WantedScene(scene_id=scene.id, title=stashdb_id, added_date=datetime.utcnow() - timedelta(days=age_days)))
+    return scene.id
+
+@pytest.fixture
+def duplicates(app):
+    db.session.add_all([Tag(id=1, name='Anal'), Tag(id=2, name='Blonde')])
+    ids = {
+        'a_oldest': add_scene('a', 30, studio_id=5, tag_ids=[1]),
+        'a_copy': add_scene('a', 20, performer_id=7, studio_id=6, tag_ids=[1, 2], wanted=True, owned=True),
+        'a_copy2': add_scene('a', 10, performer_id=8, wanted=True),
+        'b_oldest': add_scene('b', 30, performer_id=1, wanted=True),
+        'b_copy': add_scene('b', 5, performer_id=2, wanted=True),
+        'c': add_scene('c', 1, tag_ids=[2], wanted=True)
+    }
+    db.session.commit()
+    return ids
+
+def test_dry_run_reports_without_changes(duplicates):
+    """Test a dry run counts groups, scenes and wanted rows to remove and leaves the database alone."""
+    report = consolidate_duplicate_scenes(dry_run=True)
+    
+    assert report['duplicate_groups'] == 2
+    assert report['removed_scenes'] == 3
+    assert report['removed_wanted'] == 2
+    assert {group['stashdb_id']: group['remove'] for group in report['sample']} == {
+        'a': [duplicates['a_copy'], duplicates['a_copy2']],
+        'b': [duplicates['b_copy']]
+    }
+    assert Scene.query.count() == 6
+    assert WantedScene.query.count() == 5
+    # The temporary map is gone from the connection
+    assert consolidate_duplicate_scenes(dry_run=True)['removed_scenes'] == 3
+
+def test_duplicates_merge_into_oldest_scene(duplicates):
+    """Test the oldest copy survives with merged links, tags and a single wanted row."""
+    report = consolidate_duplicate_scenes()
+    
+    assert report['removed_scenes'] == 3
+    assert report['removed_wanted'] == 2
+    assert report['moved_wanted'] == 1
+    assert sorted(scene.id for scene in Scene.query.all()) == [duplicates['a_oldest'], duplicates['b_oldest'], duplicates['c']]
+    
+    a = db.session.get(Scene, duplicates['a_oldest'])
+    # Own studio kept, performer from the first copy that had one, ownership and wanted flags merged
+    assert (a.performer_id, a.studio_id, a.is_owned, a.is_wanted) == (7, 5, True, True)
+    assert {link.tag_id for link in SceneTag.query.filter_by(scene_id=a.id)} == {1, 2}
+    assert SceneTag.query.count() == 3
+    
+    wanted = {row.scene_id: row.title for row in WantedScene.query.all()}
+    assert wanted == {a.id: 'a', duplicates['b_oldest']: 'b', duplicates['c']: 'c'}
+    
+    assert consolidate_duplicate_scenes()['removed_scenes'] == 0
+
+@pytest.mark.slow
+def test_benchmark_100k_scenes_with_10_percent_duplicates(app):
+    """Benchmark: 100k scenes of which 10k are extra copies, merged in a few set-based statements."""
+    started = datetime(2024, 1, 1)
+    unique = 90000
+    rows = [{'stashdb_id': f'scene-{number}', 'title': f'Scene {number}', 'studio_id': number % 50 + 1,
+             'performer_id': None if number % 3 == 0 else number % 100 + 1,
+             'discovered_date': started + timedelta(minutes=number)} for number in range(unique)]
+    rows += [{'stashdb_id': f'scene-{number}', 'title': f'Scene {number}', 'studio_id': None,
+              'performer_id': number % 100 + 1, 'discovered_date': started + timedelta(minutes=number, seconds=30)}
+             for number in range(0, unique, 9)]
+    db.session.execute(Scene.__table__.insert(), rows)
+    db.session.execute(Tag.__table__.insert(), [{'id': tag_id, 'name': f'tag-{tag_id}'} for tag_id in range(1, 21)])
+    db.session.execute(SceneTag.__table__.insert(), [
+        {'scene_id': scene_id, 'tag_id': tag_id} for scene_id in range(1, len(rows) + 1)
+        for tag_id in {scene_id % 20 + 1, scene_id * 7 % 20 + 1}
+    ])
+    db.session.execute(WantedScene.__table__.insert(), [
+        {'scene_id': scene_id, 'title': 'wanted'} for scene_id in range(1, len(rows) + 1, 7)
+    ])
+    db.session.commit()
+    
+    dry_run = consolidate_duplicate_scenes(dry_run=True)
+    report = consolidate_duplicate_scenes()
+    print(f"\ndry run {dry_run['seconds']}s, merge {report['seconds']}s: {report}")
+    
+    assert dry_run['removed_scenes'] == report['removed_scenes'] == 10000
+    assert report['moved_wanted'] > 0
+    assert Scene.query.count() == unique
+    assert db.session.query(db.func.count(db.distinct(WantedScene.scene_id))).scalar() == WantedScene.query.count()
+    assert report['seconds'] < 30
@@ -0,0 +1,77 @@
+"""
+Tests for the compiled scene filter engine.
+"""
+
+import pytest
+
+from app.filter_engine import FilterEngine, UNWANTED_CATEGORY, MISSING_REQUIRED, TOO_SHORT, TOO_LONG
+from app.models import Config
+
+def make_scene(tags=(), duration=None):
+    return {
+        'title': 'Test Scene',
+        'duration': duration,
+        'tags': [{'name': name, 'category': category} for name, category in tags]
+    }
+
+def test_unwanted_terms_match_tag_names_and_categories_case_insensitively():
+    """Test unwanted terms are found in either the tag name or its category."""
+    engine = FilterEngine(unwanted=['Anal', 'VR'])
+    
+    assert engine.evaluate(make_scene([('Outdoor', 'Location'), ('anal', 'Action')])) == (True, UNWANTED_CATEGORY, 'anal')
+    assert engine.evaluate(make_scene([('Oculus', 'vr')])) == (True, UNWANTED_CATEGORY, 'vr')
+    assert engine.evaluate(make_scene([('Outdoor', 'Location')])) == (False, None, None)
+
+def test_required_terms_and_reason_text():
+    """Test scenes without any required term are filtered with the stored reason text."""
+    engine = FilterEngine(required=['Blonde', 'Redhead'])
+    
+    assert engine.evaluate(make_scene([('Redhead', 'Hair')]))[0] is False
+    assert engine.evaluate(make_scene([('Brunette', 'Hair')]))[1] == MISSING_REQUIRED
+    assert engine.apply(make_scene()) == (True, 'Missing required categories: blonde, redhead')
+
+def test_unwanted_wins_over_required():
+    """Test a scene with both a required and an unwanted term is filtered as unwanted."""
+    engine = FilterEngine(unwanted=['anal'], required=['blonde'])
+    
+    assert engine.evaluate(make_scene([('Blonde', 'Hair'), ('Anal', 'Action')]))[1] == UNWANTED_CATEGORY
+
+def test_duration_bounds():
+    """Test duration bounds are applied in seconds and unknown durations pass."""
+    engine = FilterEngine(min_duration_minutes=10, max_duration_minutes=60)
+    
+    assert engine.evaluate(make_scene(duration=5 * 60))[1] == TOO_SHORT
+    assert engine.evaluate(make_scene(duration=90 * 60))[1] == TOO_LONG
+    assert engine.evaluate(make_scene(duration=30 * 60))[0] is False
+    assert engine.evaluate(make_scene())[0] is False
+    assert engine.apply(make_scene(duration=300)) == (True, 'Duration too short: 5.0 min < 10 min')
+
+def test_from_config_compiles_json_settings():
+    """Test a Config is compiled once and an engine is passed through unchanged."""
+    config = Config(unwanted_categories='["Anal"]', required_categories='[]',
+                    min_duration_minutes=0, max_duration_minutes=0)
+    engine = FilterEngine.from_config(config)
+    
+    assert engine.unwanted == frozenset({'anal'})
+    assert FilterEngine.from_config(engine) is engine
+
+def test_evaluate_terms_matches_evaluate_for_stored_scenes():
+    """Test stored tag names and categories give the same verdicts as the StashDB tag list."""
+    engine = FilterEngine(unwanted=['anal', 'vr'], required=['blonde'], min_duration_minutes=10)
+    
+    assert engine.evaluate_terms(engine.fold_terms(['Blonde', 'Outdoor', 'Hair']), 1800) == (False, None, None)
+    assert engine.evaluate_terms(engine.fold_terms(['Outdoor']), 1800)[1] == MISSING_REQUIRED
+    assert engine.evaluate_terms(engine.fold_terms(['Blonde']), 300)[1] == TOO_SHORT
+    assert engine.evaluate_terms(engine.fold_terms(['Blonde', 'VR', 'Hair']), 1800) == (True, UNWANTED_CATEGORY, 'vr')
+
+def test_several_unwanted_terms_report_the_first_configured():
+    """Test both paths name the unwanted term listed first in the settings, whatever the tag order."""
+    engine = FilterEngine(unwanted=['VR', 'Outdoor', 'Anal'])
+    tags = [('Anal', 'Action'), ('Beach', 'Outdoor'), ('Oculus', 'VR')]
+    
+    for ordered in (tags, tags[::-1]):
+        scene = make_scene(ordered, duration=1800)
+        terms = engine.fold_terms([name for name, _ in ordered] + [category for _, category in ordered])
+        assert engine.evaluate(scene) == engine.evaluate_terms(terms, 1800) == (True, UNWANTED_CATEGORY, 'vr')
+    
+    assert engine.apply(make_scene(tags[:2])) == (True, 'Contains unwanted category: outdoor')
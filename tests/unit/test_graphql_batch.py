@@ -0,0 +1,59 @@
+"""
+Tests for GraphQL alias batching.
+"""
+
+import pytest
+
+from app.graphql_batch import GraphQLBatcher, build_aliased_query, split_aliased_response
+
+def test_build_aliased_query():
+    """Test that each lookup gets its own alias and variable."""
+    query = build_aliased_query('searchPerformer', 'term', 'String!', '{ id name }', 2)
+    
+    assert 'query BatchSearchPerformer($v0: String!, $v1: String!)' in query
+    assert 'q0: searchPerformer(term: $v0) { id name }' in query
+    assert 'q1: searchPerformer(term: $v1) { id name }' in query
+
+def test_split_aliased_response_reports_errors_per_item():
+    """Test that an error on one alias leaves the other items intact."""
+    result = {
+        'data': {'q0': [{'id': '1'}], 'q1': None, 'q2': [{'id': '3'}]},
+        'errors': [{'message': 'not found', 'path': ['q1']}]
+    }
+    
+    items = split_aliased_response(result, 3)
+    
+    assert items[0] == ([{'id': '1'}], None)
+    assert items[1] == (None, 'not found')
+    assert items[2] == ([{'id': '3'}], None)
+
+def test_batcher_chunks_and_retries_rejected_documents():
+    """Test batch size chunking and per-item retry when a whole document is rejected."""
+    documents = []
+    
+    def send(query, variables):
+        documents.append(variables)
+        if 'bad' in variables.values():
+            return {'data': None, 'errors': [{'message': 'validation failed'}]}
+        return {'data': {f'q{i}': variables[f'v{i}'].upper() for i in range(len(variables))}}
+    
+    batcher = GraphQLBatcher(send, batch_size=2)
+    items = batcher.run('searchStudio', 'term', 'String!', '{ id }', ['a', 'b', 'c', 'bad'])
+    
+    assert [data for data, _ in items] == ['A', 'B', 'C', None]
+    assert items[3][1] is not None
+    assert len(documents) == 4
+    assert batcher.stats['errors'] == 1
+
+def test_batcher_reports_transport_failure_for_every_item():
+    """Test that a failed request marks the whole chunk without retrying each item."""
+    calls = []
+    
+    def send(query, variables):
+        calls.append(variables)
+        raise Exception('connection refused')
+    
+    items = GraphQLBatcher(send, batch_size=10).run('findScene', 'id', 'ID!', '{ id }', ['1', '2', '3'])
+    
+    assert items == [(None, 'connection refused')] * 3
+    assert len(calls) == 1
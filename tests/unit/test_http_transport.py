@@ -0,0 +1,128 @@
+"""
+Unit tests for the shared HTTP transport's retries and per-host cap.
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from app import http_transport
+from app.http_transport import HttpTransport
+
+URL = 'https://stashdb.example/graphql'
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+    
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+    """Plays back responses (or raises exceptions) in order and records each call"""
+    
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+    
+    def request(self, method, url, **kwargs):
+        self.calls.append(method)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(http_transport.time, 'sleep', delays.append)
+    return delays
+
+def make_transport(outcomes, **kwargs):
+    transport = HttpTransport(max_retries=3, backoff=0.5, max_backoff=30, **kwargs)
+    session = FakeSession(outcomes)
+    transport._sessions['stashdb.example'] = session
+    return transport, session
+
+def test_429_is_retried_honouring_retry_after(sleeps):
+    """Test a throttled request waits Retry-After seconds and is retried, even for a POST."""
+    throttled = FakeResponse(429, {'Retry-After': '7'})
+    transport, session = make_transport([throttled, FakeResponse(200)])
+    
+    response = transport.request('POST', URL, json={'query': 'mutation'})
+    
+    assert response.status_code == 200
+    assert session.calls == ['POST', 'POST']
+    assert sleeps == [7.0]
+    assert throttled.closed
+    assert transport.stats == {'requests': 2, 'retries': 1, 'failures': 0}
+
+def test_server_errors_retried_only_when_idempotent(sleeps):
+    """Test 5xx responses and connection errors are retried for GETs and idempotent queries only."""
+    transport, session = make_transport([FakeResponse(503), requests.exceptions.ConnectionError(), FakeResponse(200)])
+    assert transport.request('GET', URL).status_code == 200
+    assert len(session.calls) == 3 and len(sleeps) == 2
+    assert all(0 <= delay <= 30 for delay in sleeps)
+    
+    # A GraphQL read sent as POST opts in explicitly
+    transport, session = make_transport([FakeResponse(502), FakeResponse(200)])
+    assert transport.request('POST', URL, idempotent=True).status_code == 200
+    assert session.calls == ['POST', 'POST']
+    
+    # Retries stop after max_retries and hand back the last response
+    transport, session = make_transport([FakeResponse(500)] * 4)
+    assert transport.request('GET', URL).status_code == 500
+    assert len(session.calls) == 4
+    assert transport.stats['retries'] == 3
+
+def test_non_idempotent_post_is_never_retried(sleeps):
+    """Test a plain POST that hit a 5xx or a dropped connection is not sent twice."""
+    transport, session = make_transport([FakeResponse(500)])
+    assert transport.request('POST', URL).status_code == 500
+    assert session.calls == ['POST']
+    
+    transport, session = make_transport([requests.exceptions.ConnectionError()])
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.request('POST', URL)
+    assert session.calls == ['POST']
+    assert transport.stats == {'requests': 1, 'retries': 0, 'failures': 1}
+    assert sleeps == []
+
+def test_concurrent_requests_per_host_are_capped():
+    """Test no more than host_concurrency requests are in flight against one host."""
+    transport = HttpTransport(host_concurrency=2)
+    lock = threading.Lock()
+    release = threading.Event()
+    in_flight = [0]
+    peak = [0]
+    
+    class SlowSession:
+        def request(self, method, url, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            release.wait(timeout=5)
+            with lock:
+                in_flight[0] -= 1
+            return FakeResponse(200)
+    
+    transport._sessions['stashdb.example'] = SlowSession()
+    threads = [threading.Thread(target=transport.request, args=('GET', URL)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    # Give every thread the chance to reach the semaphore before letting them through
+    for _ in range(50):
+        if in_flight[0] == 2:
+            break
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    
+    assert peak[0] == 2
+    assert transport.stats['requests'] == 6
@@ -0,0 +1,83 @@
+"""
+Unit tests for the buffered database log sink.
+"""
+
+import logging
+import time
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from app.models import LogEntry
+from app.log_sink import DatabaseLogHandler
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    LogEntry.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def sink_logger():
+    logger = logging.getLogger('app.test_sink')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    yield logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+def stored_rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(LogEntry.level, LogEntry.message, LogEntry.module)
+                                  .order_by(LogEntry.id)).all()
+
+def test_records_are_written_in_batches(engine, sink_logger):
+    """Test queued records reach the logs table in batch_size inserts with their level and module."""
+    handler = DatabaseLogHandler(engine, batch_size=10, flush_seconds=60, start=False)
+    sink_logger.addHandler(handler)
+    
+    for i in range(25):
+        sink_logger.info(f"message {i}")
+    sink_logger.error("cleanup failed", extra={'db_module': 'cleanup'})
+    sink_logger.debug("below the handler level")
+    assert stored_rows(engine) == []
+    
+    handler.flush()
+    rows = stored_rows(engine)
+    assert len(rows) == 26
+    assert rows[0] == ('INFO', 'message 0', 'test_sink')
+    assert rows[-1] == ('ERROR', 'cleanup failed', 'cleanup')
+    assert handler.status()['batches'] == 3
+    assert handler.status()['written'] == 26
+
+def test_full_queue_drops_instead_of_blocking(engine, sink_logger):
+    """Test records beyond the queue capacity are counted as dropped."""
+    handler = DatabaseLogHandler(engine, capacity=5, start=False)
+    sink_logger.addHandler(handler)
+    
+    for i in range(8):
+        sink_logger.warning(f"message {i}")
+    
+    assert handler.status()['dropped'] == 3
+    handler.flush()
+    assert [message for _, message, _ in stored_rows(engine)] == [f"message {i}" for i in range(5)]
+
+def test_writer_thread_flushes_on_size_and_close(engine, sink_logger):
+    """Test the background writer stores records without an explicit flush, and close() writes the rest."""
+    handler = DatabaseLogHandler(engine, batch_size=5, flush_seconds=60)
+    sink_logger.addHandler(handler)
+    
+    for i in range(5):
+        sink_logger.info(f"message {i}")
+    deadline = time.monotonic() + 5
+    while len(stored_rows(engine)) < 5 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert len(stored_rows(engine)) == 5
+    
+    sink_logger.info("last")
+    sink_logger.removeHandler(handler)
+    handler.close()
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(LogEntry.__table__)).scalar() == 6
@@ -0,0 +1,101 @@
+"""
+Unit tests for the owned library index.
+"""
+
+from datetime import datetime, timedelta
+
+from app.models import db, OwnedScene
+from app.owned_index import OwnedLibraryIndex, parse_stash_timestamp
+
+class FakeStash:
+    """Stash library export, paged in updated_at order like findScenes"""
+    
+    def __init__(self, scenes):
+        self.scenes = scenes
+        self.exports = []
+        self.checked = []
+    
+    def get_scene_stash_ids(self, page=1, per_page=1000, updated_since=None):
+        if page == 1:
+            self.exports.append(updated_since)
+        scenes = sorted(self.scenes.values(), key=lambda scene: scene['updated_at'])
+        if updated_since:
+            since = parse_stash_timestamp(updated_since)
+            scenes = [scene for scene in scenes if parse_stash_timestamp(scene['updated_at']) > since]
+        start = (page - 1) * per_page
+        return {'count': len(scenes), 'scenes': scenes[start:start + per_page]}
+    
+    def check_scene_exists(self, stashdb_id):
+        self.checked.append(stashdb_id)
+        return stashdb_id == 'owned-elsewhere'
+
+def stash_scene(scene_id, updated_at, *stashdb_ids):
+    return {'id': scene_id, 'updated_at': updated_at.isoformat() + 'Z',
+            'stash_ids': [{'stash_id': stashdb_id, 'endpoint': 'https://stashdb.org/graphql'} for stashdb_id in stashdb_ids]}
+
+def test_incremental_refresh_reads_only_updated_scenes(app):
+    """Test the first refresh exports everything and later ones ask only for scenes updated after the newest indexed."""
+    updated = datetime(2024, 5, 1, 12, 0, 0)
+    stash = FakeStash({
+        '1': stash_scene('1', updated, 'uuid-a'),
+        '2': stash_scene('2', updated + timedelta(hours=1), 'uuid-b', 'uuid-c'),
+        '3': stash_scene('3', updated + timedelta(hours=2), 'uuid-d')
+    })
+    index = OwnedLibraryIndex(stash, page_size=2)
+    
+    results = index.refresh()
+    assert (results['mode'], results['scenes_scanned'], results['owned_ids']) == ('full', 3, 4)
+    assert stash.exports == [None]
+    assert index.is_owned('uuid-c') and not index.is_owned('uuid-z')
+    
+    # Scene 1 is re-linked in Stash, which bumps its updated_at
+    stash.scenes['1'] = stash_scene('1', updated + timedelta(hours=3), 'uuid-z')
+    results = index.refresh()
+    assert (results['mode'], results['scenes_scanned'], results['owned_ids']) == ('incremental', 1, 4)
+    assert stash.exports == [None, '2024-05-01T14:00:00+00:00']
+    assert index.is_owned('uuid-z') and not index.is_owned('uuid-a')
+    assert OwnedScene.query.count() == 4
+    
+    # Nothing changed since: nothing is re-read
+    assert index.refresh()['scenes_scanned'] == 0
+    assert index.fallback_checks == 0 and stash.checked == []
+
+def test_full_rebuild_after_rebuild_days(app, monkeypatch):
+    """Test scenes deleted from Stash only drop out once OWNED_INDEX_REBUILD_DAYS forces a full export."""
+    monkeypatch.setenv('OWNED_INDEX_REBUILD_DAYS', '7')
+    updated = datetime(2024, 5, 1)
+    stash = FakeStash({'1': stash_scene('1', updated, 'uuid-a'), '2': stash_scene('2', updated, 'uuid-b')})
+    index = OwnedLibraryIndex(stash)
+    index.refresh()
+    
+    # Deleting a scene doesn't bump anything an incremental refresh could see
+    del stash.scenes['2']
+    assert index.refresh()['mode'] == 'incremental'
+    assert index.is_owned('uuid-b')
+    
+    OwnedScene.query.update({OwnedScene.indexed_date: datetime.utcnow() - timedelta(days=8)})
+    db.session.commit()
+    results = index.refresh()
+    assert (results['mode'], results['owned_ids']) == ('full', 1)
+    assert not index.is_owned('uuid-b')
+    
+    # A forced refresh rebuilds regardless of age
+    assert index.refresh(full=True)['mode'] == 'full'
+
+def test_falls_back_to_stash_when_index_cannot_load(app):
+    """Test a failed refresh leaves the index unloaded and each lookup asks Stash instead."""
+    stash = FakeStash({})
+    
+    def unavailable(**kwargs):
+        raise Exception('Stash unavailable')
+    stash.get_scene_stash_ids = unavailable
+    index = OwnedLibraryIndex(stash)
+    
+    results = index.refresh()
+    assert results['error'] == 'Stash unavailable'
+    assert not index.ready
+    
+    assert 'owned-elsewhere' in index
+    assert not index.is_owned('uuid-a')
+    assert stash.checked == ['owned-elsewhere', 'uuid-a']
+    assert index.fallback_checks == 2
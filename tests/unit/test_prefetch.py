@@ -0,0 +1,56 @@
+"""
+Tests for the prefetching paginated fetcher.
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.prefetch import PrefetchingPager
+
+def test_pages_arrive_in_order_until_last_page():
+    """Test that pages are yielded in order and fetching stops at the last page."""
+    fetched = []
+    
+    def fetch_page(page_num):
+        fetched.append(page_num)
+        return list(range(10 if page_num < 4 else 3))
+    
+    pager = PrefetchingPager(fetch_page, is_last=lambda page_num, items: len(items) < 10, depth=2)
+    pages = [page_num for page_num, _ in pager]
+    
+    assert pages == [1, 2, 3, 4]
+    assert fetched == [1, 2, 3, 4]
+
+def test_close_stops_look_ahead():
+    """Test that stopping early cancels the background fetcher within its bounded look-ahead."""
+    fetched = []
+    
+    def fetch_page(page_num):
+        fetched.append(page_num)
+        time.sleep(0.01)
+        return [page_num]
+    
+    with PrefetchingPager(fetch_page, max_pages=100, depth=2) as pager:
+        for page_num, _ in pager:
+            if page_num == 2:
+                break
+    
+    time.sleep(0.2)
+    assert len(fetched) <= 2 + 3
+    assert not any(thread.name.startswith('prefetch-') for thread in threading.enumerate())
+
+def test_fetch_errors_reach_the_consumer():
+    """Test that a failed fetch is raised at the page where it happened."""
+    def fetch_page(page_num):
+        if page_num == 3:
+            raise ValueError('page 3 failed')
+        return [page_num]
+    
+    seen = []
+    with pytest.raises(ValueError):
+        for page_num, _ in PrefetchingPager(fetch_page, max_pages=10, depth=2):
+            seen.append(page_num)
+    
+    assert seen == [1, 2]
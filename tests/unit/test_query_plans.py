@@ -0,0 +1,156 @@
+"""
+Query-plan regression tests: the app's key queries must be answered from indexes.
+
+Each test runs real app code against an empty in-memory database built from the models,
+captures the SQL it emits and checks SQLite's EXPLAIN QUERY PLAN for full table scans.
+"""
+
+import importlib.util
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models import db, Scene, WantedScene, LogEntry
+from app.check_schedule import load_release_history
+from app.cleanup import run_cleanup
+from app.discovery import pending_whisparr_scenes, update_scene_associations
+from app.discovery_runs import DiscoveryRunTracker
+from app.scene_tags import scenes_with_terms, uncategorised_scenes_query
+
+# Tables small enough that scanning them is the right plan
+SMALL_TABLES = {'config', 'tags'}
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', '..', 'migrations', '011_add_performance_indexes.py')
+
+@contextmanager
+def captured_queries():
+    """SELECT/UPDATE/DELETE statements (with parameters) executed inside the block"""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+            statements.append((statement, parameters))
+    
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+def query_plan(statement, parameters=()):
+    return [row[-1] for row in db.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + statement, parameters
+    ).fetchall()]
+
+def assert_indexed(statements, allow_sort=False):
+    assert statements, 'no queries captured'
+    for statement, parameters in statements:
+        plan = query_plan(statement, parameters)
+        for step in plan:
+            match = FULL_SCAN.match(step)
+            assert not (match and match.group(1) not in SMALL_TABLES), f'full scan in {plan} for {statement}'
+            assert allow_sort or 'TEMP B-TREE FOR ORDER BY' not in step, f'sort without index in {plan} for {statement}'
+
+def plan_of(query):
+    """Compile an ORM query and capture it as it runs"""
+    with captured_queries() as statements:
+        query.all()
+    return statements
+
+def test_whisparr_queue_uses_pending_index(app):
+    """Test the Whisparr push queue is read through the (status, added_to_whisparr) index."""
+    with captured_queries() as statements:
+        pending_whisparr_scenes(50)
+    
+    assert_indexed(statements)
+    assert any('ix_wanted_scenes_pending' in step for step in query_plan(*statements[0]))
+
+def test_wanted_scenes_page_sorted_by_release_date(app):
+    """Test the wanted-scenes page walks the release_date index instead of sorting."""
+    since = date.today() - timedelta(days=365)
+    
+    assert_indexed(plan_of(WantedScene.query.order_by(WantedScene.release_date.desc())))
+    assert_indexed(plan_of(WantedScene.query.filter(WantedScene.release_date >= since)
+                           .order_by(WantedScene.release_date.desc())))
+
+def test_scene_lists_by_flag(app):
+    """Test wanted and filtered scene lists use their flag indexes in page order."""
+    assert_indexed(plan_of(Scene.query.filter_by(is_wanted=True).order_by(Scene.release_date.desc()).limit(50)))
+    assert_indexed(plan_of(Scene.query.filter(Scene.is_filtered == True).order_by(Scene.discovered_date.desc()).limit(50)))
+    assert_indexed(plan_of(Scene.query.filter(
+        Scene.is_filtered == True, Scene.discovered_date < datetime.utcnow() - timedelta(days=90)
+    )))
+
+def test_scenes_by_entity(app):
+    """Test a performer's or studio's scenes and release history are index lookups."""
+    assert_indexed(plan_of(Scene.query.filter_by(performer_id=1).order_by(Scene.release_date.desc())))
+    assert_indexed(plan_of(Scene.query.filter_by(studio_id=1).order_by(Scene.release_date.desc())))
+    
+    for kind in ('performer', 'studio'):
+        with captured_queries() as statements:
+            load_release_history(kind, [1, 2, 3])
+        assert_indexed(statements, allow_sort=True)
+
+def test_discovery_writes_find_rows_by_index(app):
+    """Test association updates and tag lookups during discovery avoid scanning scenes."""
+    with captured_queries() as statements:
+        update_scene_associations(['a', 'b'], performer_id=1, studio_id=2)
+        scenes_with_terms(['anal'])
+    
+    assert_indexed(statements)
+
+def test_refilter_finds_uncategorised_scenes_by_index(app):
+    """Test scenes linked to tags without a category are found through the tag index."""
+    assert_indexed(plan_of(uncategorised_scenes_query()))
+
+def test_discovery_run_bookkeeping(app):
+    """Test starting a discovery run finds running and interrupted runs by index."""
+    with captured_queries() as statements:
+        DiscoveryRunTracker.start(trigger='test')
+    
+    assert_indexed(statements, allow_sort=True)
+
+def test_log_retention_and_listing(app):
+    """Test old logs are found and recent logs listed through the timestamp index."""
+    assert_indexed(plan_of(LogEntry.query.filter(LogEntry.timestamp < datetime.utcnow() - timedelta(days=30))))
+    assert_indexed(plan_of(LogEntry.query.order_by(LogEntry.timestamp.desc()).limit(100)))
+
+def test_cleanup_deletes_by_index(app):
+    """Test every chunked cleanup DELETE finds its rows through an index."""
+    with captured_queries() as statements:
+        run_cleanup({'log_retention_days': 30, 'filtered_retention_days': 90, 'batch_size': 100,
+                     'pause_ms': 0, 'vacuum': False})
+    
+    assert_indexed([(statement, parameters) for statement, parameters in statements
+                    if statement.startswith('DELETE')])
+
+def test_migration_creates_model_indexes(app, tmp_path):
+    """Test migration 011 creates exactly the indexes the models declare."""
+    spec = importlib.util.spec_from_file_location('migration_011', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    
+    model_indexes = {
+        index.name for table in ('scenes', 'wanted_scenes', 'logs')
+        for index in db.metadata.tables[table].indexes
+    }
+    assert {name for name, _, _ in migration.INDEXES} == model_indexes
+    
+    # An existing database: the tables as create_all() makes them, without the new indexes
+    db_path = str(tmp_path / 'stash_filter.db')
+    conn = sqlite3.connect(db_path)
+    for row in db.session.connection().exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ('scenes', 'wanted_scenes', 'logs')"):
+        conn.execute(row[0])
+    conn.commit()
+    conn.close()
+    
+    assert not migration.check_migration_status(db_path)
+    assert migration.upgrade_database(db_path)
+    assert migration.check_migration_status(db_path)
@@ -0,0 +1,48 @@
+"""
+Tests for the adaptive StashDB rate limiter.
+"""
+
+import pytest
+
+from app.rate_limiter import AdaptiveRateLimiter
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def test_healthy_responses_ramp_up_to_ceiling():
+    """Test additive increase stops at the configured maximums."""
+    limiter = AdaptiveRateLimiter('test', max_rate=1000, max_window=4)
+    
+    for _ in range(200):
+        limiter.release(limiter.acquire(), FakeResponse(200))
+    
+    status = limiter.status()
+    assert status['rate'] == 1000
+    assert status['window'] == 4
+    assert status['in_flight'] == 0
+
+def test_throttling_halves_rate_and_window_once_per_cooldown():
+    """Test multiplicative decrease on 429 and that a burst counts as one event."""
+    limiter = AdaptiveRateLimiter('test', max_rate=1000, max_window=8, cooldown=60)
+    rate, window = limiter.rate, limiter.window
+    
+    for _ in range(3):
+        limiter.release(limiter.acquire(), FakeResponse(429))
+    
+    status = limiter.status()
+    assert status['rate'] == rate / 2
+    assert status['window'] == window / 2
+    assert status['counters']['throttled'] == 3
+    assert len(status['throttle_events']) == 1
+
+def test_errors_release_window_slot():
+    """Test that failed requests give their concurrency slot back."""
+    limiter = AdaptiveRateLimiter('test', max_rate=1000, max_window=1)
+    
+    limiter.release(limiter.acquire(), error='ConnectionError')
+    limiter.release(limiter.acquire(), FakeResponse(200))
+    
+    assert limiter.status()['in_flight'] == 0
+    assert limiter.status()['counters']['errors'] == 1
@@ -0,0 +1,86 @@
+"""
+Unit tests for re-filtering stored scenes.
+"""
+
+import json
+
+import pytest
+
+from app.models import db, Scene, WantedScene, Performer, Studio
+from app.filter_engine import FilterEngine
+from app.refilter import refilter_stored_scenes
+from app.scene_tags import store_scene_tags
+
+FILTERS = FilterEngine(unwanted=['Anal'])
+
+@pytest.fixture
+def app(app):
+    db.session.add_all([Performer(id=1, name='Performer One'), Studio(id=1, name='Studio One')])
+    db.session.commit()
+    return app
+
+def add_scene(stashdb_id, tags, filtered=False, reason=None, owned=False, wanted=False, pushed=False):
+    """Store a scene the way discovery does: JSON columns plus scene_tags links"""
+    scene = Scene(stashdb_id=stashdb_id, title=stashdb_id, duration=1800, performer_id=1, studio_id=1,
+                  tags=json.dumps([name for name, _ in tags]) if tags else None,
+                  categories=json.dumps([category for _, category in tags]) if tags else None,
+                  is_filtered=filtered, filter_reason=reason, is_owned=owned, is_wanted=wanted)
+    db.session.add(scene)
+    db.session.flush()
+    store_scene_tags({scene.id: [{'id': f'tag-{name}', 'name': name, 'category': category} for name, category in tags]})
+    if wanted:
+        db.session.add(WantedScene(scene_id=scene.id, title=stashdb_id, status='wanted', added_to_whisparr=pushed))
+    return scene.id
+
+@pytest.fixture
+def scenes(app):
+    ids = {
+        'wanted': add_scene('wanted', [('Anal', 'Action')], wanted=True),
+        'pushed': add_scene('pushed', [('Anal', 'Action')], wanted=True, pushed=True),
+        'unfiltered': add_scene('unfiltered', [('Blonde', 'Hair')], filtered=True,
+                                reason='Contains unwanted category: blonde'),
+        'owned': add_scene('owned', [('Blonde', 'Hair')], filtered=True, reason='Contains unwanted category: blonde',
+                           owned=True),
+        'reason': add_scene('reason', [('Anal', 'Action')], filtered=True, reason='Duration too short: 30.0 min < 40 min'),
+        'kept': add_scene('kept', [('Anal', 'Action'), ('Blonde', 'Hair')], filtered=True,
+                          reason='Contains unwanted category: anal'),
+        'untagged': add_scene('untagged', [])
+    }
+    db.session.commit()
+    return ids
+
+def test_refilter_applies_changed_verdicts(scenes):
+    """Test newly filtered scenes leave the wanted list unless pushed, and unfiltered ones join it."""
+    report = refilter_stored_scenes(FILTERS)
+    
+    assert (report['scanned'], report['newly_filtered'], report['unfiltered'], report['reason_changed']) == (7, 2, 2, 1)
+    assert (report['wanted_removed'], report['wanted_added']) == (1, 1)
+    
+    rows = {scene.stashdb_id: scene for scene in Scene.query.all()}
+    for key in ('wanted', 'pushed', 'reason', 'kept'):
+        assert (rows[key].is_filtered, rows[key].filter_reason) == (True, 'Contains unwanted category: anal')
+    assert rows['wanted'].is_wanted is False
+    assert (rows['unfiltered'].is_filtered, rows['unfiltered'].filter_reason, rows['unfiltered'].is_wanted) == (False, None, True)
+    assert (rows['owned'].is_filtered, rows['owned'].is_wanted) == (False, False)
+    assert rows['untagged'].is_filtered is False
+    
+    wanted = {row.scene_id: row for row in WantedScene.query.all()}
+    # The un-pushed row went; the one already sent to Whisparr keeps its history
+    assert set(wanted) == {scenes['pushed'], scenes['unfiltered']}
+    added = wanted[scenes['unfiltered']]
+    assert (added.title, added.performer_name, added.studio_name, added.status, added.added_to_whisparr) == \
+        ('unfiltered', 'Performer One', 'Studio One', 'wanted', False)
+    
+    # Nothing left to change
+    report = refilter_stored_scenes(FILTERS)
+    assert (report['newly_filtered'], report['unfiltered'], report['reason_changed']) == (0, 0, 0)
+
+def test_dry_run_leaves_rows_untouched(scenes):
+    """Test a dry run reports the same changes without writing any of them."""
+    report = refilter_stored_scenes(FILTERS, dry_run=True)
+    
+    assert (report['newly_filtered'], report['unfiltered'], report['reason_changed']) == (2, 2, 1)
+    assert (report['wanted_added'], report['wanted_removed'], report['dry_run']) == (0, 0, True)
+    assert Scene.query.filter_by(is_filtered=True).count() == 4
+    assert db.session.get(Scene, scenes['reason']).filter_reason.startswith('Duration too short')
+    assert WantedScene.query.count() == 2
@@ -0,0 +1,50 @@
+"""
+Tests for the StashDB response cache.
+"""
+
+import pytest
+
+from app.response_cache import ResponseCache
+
+def test_cache_hit_and_miss_counters(tmp_path):
+    """Test that a second fetch is served from the cache."""
+    cache = ResponseCache(path=str(tmp_path / 'cache.db'))
+    calls = []
+    
+    def loader():
+        calls.append(1)
+        return {'searchPerformer': [{'id': 'abc', 'name': 'Example'}]}
+    
+    first = cache.fetch('search', 'query { searchPerformer }', {'term': 'Example'}, loader)
+    second = cache.fetch('search', 'query {\n  searchPerformer }', {'term': 'Example'}, loader)
+    
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_cache_does_not_store_failures(tmp_path):
+    """Test that loader errors propagate and are not cached."""
+    cache = ResponseCache(path=str(tmp_path / 'cache.db'))
+    
+    def failing_loader():
+        raise Exception('StashDB unavailable')
+    
+    with pytest.raises(Exception):
+        cache.fetch('tags', 'query { queryTags }', {'page': 1}, failing_loader)
+    
+    assert cache.stats()['entries'] == 0
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test LRU eviction once the cache grows past max_entries."""
+    cache = ResponseCache(path=str(tmp_path / 'cache.db'), max_entries=2)
+    for term in ['a', 'b', 'c']:
+        cache.set('search', 'query', {'term': term}, term)
+    
+    # Reading 'a' makes 'b' the least recently used entry
+    cache.get('search', 'query', {'term': 'a'})
+    cache.evict()
+    
+    assert cache.get('search', 'query', {'term': 'a'}) == (True, 'a')
+    assert cache.get('search', 'query', {'term': 'b'}) == (False, None)
+    assert cache.get('search', 'query', {'term': 'c'}) == (True, 'c')
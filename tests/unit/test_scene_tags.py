@@ -0,0 +1,146 @@
+"""
+Unit tests for normalized tag storage.
+"""
+
+import importlib.util
+import json
+import os
+import sqlite3
+
+from app.models import db, Scene, Tag, SceneTag
+from app.filter_engine import FilterEngine
+from app.refilter import refilter_stored_scenes
+from app.scene_tags import resolve_tag_ids, store_scene_tags, tag_statistics
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', '..', 'migrations', '010_add_scene_tags.py')
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location('migration_010', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+def add_scene(stashdb_id, tags, categories, **flags):
+    scene = Scene(stashdb_id=stashdb_id, title=stashdb_id, tags=json.dumps(tags) if tags else None,
+                  categories=json.dumps(categories) if categories else None, **flags)
+    db.session.add(scene)
+    db.session.flush()
+    return scene.id
+
+def test_resolve_tag_ids_inserts_and_updates_tags(app):
+    """Test unknown tags are inserted, backfilled ones get their StashDB id and category, and renames follow."""
+    db.session.add_all([Tag(name='Blonde'), Tag(stashdb_id='t-old', name='Old Name', category='Action')])
+    db.session.commit()
+    
+    tag_ids = resolve_tag_ids([
+        {'id': 't-blonde', 'name': 'Blonde', 'category': 'Hair'},
+        {'id': 't-old', 'name': 'New Name', 'category': 'Action'},
+        {'id': 't-vr', 'name': 'Oculus', 'category': 'VR'}
+    ])
+    db.session.commit()
+    
+    tags = {tag.stashdb_id: tag for tag in Tag.query.all()}
+    assert set(tags) == {'t-blonde', 't-old', 't-vr'}
+    assert (tags['t-blonde'].name, tags['t-blonde'].category) == ('Blonde', 'Hair')
+    assert tags['t-old'].name == 'New Name'
+    assert tags['t-vr'].category == 'VR'
+    assert tag_ids == {tag.name: tag.id for tag in tags.values()}
+    
+    # Seen again, nothing is inserted
+    assert resolve_tag_ids([{'id': 't-vr', 'name': 'Oculus', 'category': 'VR'}]) == {'Oculus': tags['t-vr'].id}
+    assert Tag.query.count() == 3
+
+def test_store_scene_tags_links_each_tag_once(app):
+    """Test scenes are linked to their tags once each, skipping nameless tags, and repeats are ignored."""
+    first = add_scene('a', ['Blonde'], ['Hair'])
+    second = add_scene('b', [], [])
+    tags = [{'id': 't-blonde', 'name': 'Blonde', 'category': 'Hair'}, {'id': 't-blonde', 'name': 'Blonde'},
+            {'id': 't-none', 'name': ''}]
+    
+    assert store_scene_tags({first: tags, second: tags[:1]}) == 2
+    assert store_scene_tags({first: tags}) == 1
+    assert store_scene_tags({second: None}) == 0
+    db.session.commit()
+    
+    assert SceneTag.query.count() == 2
+    assert [tag.name for tag in Tag.query.all()] == ['Blonde']
+
+def test_tag_statistics_counts_scenes_per_tag_and_category(app):
+    """Test per-tag and per-category counts, with a scene counted once per category."""
+    scenes = {
+        'wanted': add_scene('wanted', None, None, is_wanted=True),
+        'filtered': add_scene('filtered', None, None, is_filtered=True),
+        'owned': add_scene('owned', None, None, is_owned=True)
+    }
+    store_scene_tags({
+        scenes['wanted']: [{'name': 'Blonde', 'category': 'Hair'}, {'name': 'Long Hair', 'category': 'Hair'}],
+        scenes['filtered']: [{'name': 'Blonde', 'category': 'Hair'}, {'name': 'Anal', 'category': 'Action'}],
+        scenes['owned']: [{'name': 'Indoors'}]
+    })
+    db.session.commit()
+    
+    stats = tag_statistics()
+    tags = {tag['name']: tag for tag in stats['tags']}
+    assert stats['tags'][0]['name'] == 'Blonde'
+    assert (tags['Blonde']['scenes'], tags['Blonde']['filtered'], tags['Blonde']['wanted']) == (2, 1, 1)
+    assert (tags['Indoors']['category'], tags['Indoors']['owned']) == (None, 1)
+    assert stats['categories'] == [
+        {'category': 'Hair', 'scenes': 2, 'filtered': 1, 'wanted': 1, 'owned': 0},
+        {'category': 'Action', 'scenes': 1, 'filtered': 1, 'wanted': 0, 'owned': 0}
+    ]
+    assert [tag['name'] for tag in tag_statistics(category='Action')['tags']] == ['Anal']
+
+def test_migration_backfills_tags_from_json(tmp_path):
+    """Test migration 010 links every stored scene and learns categories from scenes whose lists line up."""
+    migration = load_migration()
+    db_path = str(tmp_path / 'stash_filter.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE scenes (id INTEGER PRIMARY KEY, tags TEXT, categories TEXT)")
+    conn.executemany("INSERT INTO scenes (id, tags, categories) VALUES (?, ?, ?)", [
+        (1, '["Blonde", "Anal"]', '["Hair", "Action"]'),
+        # Fewer categories than tags: can't tell which tag each belongs to
+        (2, '["Oculus", "Outdoor", "Blonde"]', '["VR", "Hair"]'),
+        (3, None, None)
+    ])
+    conn.commit()
+    conn.close()
+    
+    assert not migration.check_migration_status(db_path)
+    assert migration.upgrade_database(db_path)
+    assert migration.check_migration_status(db_path)
+    
+    conn = sqlite3.connect(db_path)
+    assert dict(conn.execute("SELECT name, category FROM tags").fetchall()) == {
+        'Blonde': 'Hair', 'Anal': 'Action', 'Oculus': None, 'Outdoor': None
+    }
+    links = conn.execute("SELECT scene_id, name FROM scene_tags JOIN tags ON tags.id = tag_id ORDER BY scene_id, name").fetchall()
+    assert links == [(1, 'Anal'), (1, 'Blonde'), (2, 'Blonde'), (2, 'Oculus'), (2, 'Outdoor')]
+    conn.close()
+
+def test_refilter_matches_same_terms_before_and_after_backfill(app):
+    """Test backfilled scenes keep their verdict when their tags' categories are not known."""
+    filters = FilterEngine(unwanted=['VR'])
+    reason = 'Contains unwanted category: vr'
+    vr = add_scene('vr', ['Oculus', 'Outdoor'], ['VR'], is_filtered=True, filter_reason=reason)
+    paired = add_scene('paired', ['Headset'], ['VR'], is_filtered=True, filter_reason=reason)
+    plain = add_scene('plain', ['Outdoor'], None, is_filtered=True, filter_reason=reason)
+    db.session.commit()
+    
+    unlinked = refilter_stored_scenes(filters, dry_run=True)
+    assert (unlinked['unfiltered'], unlinked['newly_filtered']) == (1, 0)
+    
+    load_migration().backfill_scene_tags(db.session.connection().connection.driver_connection.cursor())
+    db.session.commit()
+    assert Tag.query.filter_by(name='Oculus').one().category is None
+    assert Tag.query.filter_by(name='Headset').one().category == 'VR'
+    
+    report = refilter_stored_scenes(filters)
+    assert (report['unfiltered'], report['newly_filtered'], report['wanted_added']) == (1, 0, 1)
+    assert {scene.stashdb_id for scene in Scene.query.filter_by(is_filtered=True)} == {'vr', 'paired'}
+    assert db.session.get(Scene, plain).is_wanted is True
+    
+    # Once discovery reports the tag's category, the tag index alone decides
+    resolve_tag_ids([{'id': 't-oculus', 'name': 'Oculus', 'category': 'VR'}])
+    db.session.commit()
+    assert refilter_stored_scenes(filters, dry_run=True)['unfiltered'] == 0
+    assert db.session.get(Scene, vr).is_filtered and db.session.get(Scene, paired).is_filtered
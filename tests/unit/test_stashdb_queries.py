@@ -0,0 +1,52 @@
+"""
+Unit tests for the StashDB scene projections.
+"""
+
+import re
+
+import pytest
+
+from app.stashdb_queries import normalize_scene, normalize_scenes, query_scenes_query, scene_selection
+
+def top_level_fields(selection):
+    """Field names directly inside a selection set, skipping nested ones"""
+    fields, depth = [], 0
+    for token in re.findall(r'[{}]|\w+', selection):
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+        elif depth == 1:
+            fields.append(token)
+    return fields
+
+def test_unknown_projection_raises():
+    """Test a typo in a projection name fails loudly instead of sending an empty selection."""
+    with pytest.raises(ValueError, match='Unknown scene projection: full'):
+        scene_selection('full')
+    with pytest.raises(ValueError):
+        query_scenes_query('QueryScenes', projection='')
+
+def test_discovery_projection_leaves_out_detail_fields():
+    """Test discovery asks only for what it stores and filters on."""
+    discovery = top_level_fields(scene_selection('discovery'))
+    detail = top_level_fields(scene_selection('detail'))
+    
+    assert discovery == ['id', 'title', 'date', 'duration', 'studio', 'performers', 'tags']
+    for field in ('images', 'urls', 'director'):
+        assert field not in discovery and field in detail
+    assert {'created', 'parent'} <= set(re.findall(r'\w+', scene_selection('feed')))
+
+def test_normalize_scene_flattens_tag_categories():
+    """Test category objects become their name, and missing or already flat categories are left alone."""
+    scene = {'id': 'a', 'tags': [
+        {'name': 'Anal', 'category': {'id': 'c1', 'name': 'Action'}},
+        {'name': 'Outdoor', 'category': None},
+        {'name': 'Blonde', 'category': 'Hair'},
+        {'name': 'Oculus'}
+    ]}
+    
+    assert normalize_scene(scene) is scene
+    assert [tag.get('category') for tag in scene['tags']] == ['Action', None, 'Hair', None]
+    assert normalize_scene(None) is None
+    assert normalize_scenes([{'id': 'b', 'tags': None}, {'id': 'c'}]) == [{'id': 'b', 'tags': None}, {'id': 'c'}]
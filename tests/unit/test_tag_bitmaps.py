@@ -0,0 +1,98 @@
+"""
+Tests for the bitmap helpers and index behind filter simulation.
+"""
+
+import json
+import random
+
+import pytest
+
+from app.models import db, Scene
+from app.filter_engine import FilterEngine
+from app.refilter import refilter_stored_scenes
+from app.scene_tags import resolve_tag_ids, store_scene_tags
+from app.tag_bitmaps import TagBitmapIndex, bitmap_from_ids, ids_from_bitmap
+
+TAGS = [('Anal', 'Action'), ('Blonde', 'Hair'), ('Brunette', 'Hair'), ('Oculus', 'VR'), ('Outdoor', 'Location'),
+        ('Solo', None)]
+# Only ever seen on scenes stored before scene_tags, so they never learn their category
+LEGACY_TAGS = [('Headset', 'VR'), ('Beach', 'Location')]
+
+def seed_scenes(count):
+    """Scenes with random tags, durations and verdicts, stored linked, unlinked (JSON only) or backfilled"""
+    rng = random.Random(7)
+    for number in range(count):
+        storage = rng.choice(['linked', 'unlinked', 'backfilled'])
+        tags = rng.sample(TAGS if storage == 'linked' else TAGS + LEGACY_TAGS, rng.randint(0, 3))
+        names = [name for name, _ in tags]
+        categories = [category for _, category in tags if category]
+        filtered = rng.random() < 0.3
+        scene = Scene(stashdb_id=f'scene-{number}', title=f'Scene {number}',
+                      duration=rng.choice([None, 600, 1200, 1230, 1800, 2400, 3600, 5400]),
+                      tags=json.dumps(names) if names else None,
+                      categories=json.dumps(categories) if categories else None,
+                      is_filtered=filtered, filter_reason='Contains unwanted category: blonde' if filtered else None)
+        db.session.add(scene)
+        db.session.flush()
+        if storage == 'linked':
+            store_scene_tags({scene.id: [{'name': name, 'category': category} for name, category in tags]})
+        elif storage == 'backfilled':
+            # Migration 010 could not tell which tag each category belonged to
+            store_scene_tags({scene.id: [{'name': name} for name in names]})
+    db.session.commit()
+
+def test_bitmap_round_trip():
+    """Test scene ids survive a bitmap round trip, lowest first."""
+    ids = [1, 7, 8, 64, 1000, 99999]
+    bitmap = bitmap_from_ids(reversed(ids))
+    
+    assert bitmap.bit_count() == len(ids)
+    assert ids_from_bitmap(bitmap, 100) == ids
+    assert ids_from_bitmap(bitmap, 2) == [1, 7]
+
+def test_empty_bitmap():
+    """Test no ids give an empty bitmap and an empty bitmap gives no ids."""
+    assert bitmap_from_ids([]) == 0
+    assert ids_from_bitmap(0, 10) == []
+
+def test_set_operations_match_python_sets():
+    """Test bitmap AND/OR/AND-NOT popcounts agree with the same operations on sets."""
+    left, right = {2, 3, 5, 8, 13, 21}, {1, 2, 3, 4, 5}
+    a, b = bitmap_from_ids(left), bitmap_from_ids(right)
+    
+    assert ids_from_bitmap(a & b, 100) == sorted(left & right)
+    assert ids_from_bitmap(a | b, 100) == sorted(left | right)
+    assert ids_from_bitmap(a & ~b, 100) == sorted(left - right)
+
+@pytest.mark.parametrize('filters', [
+    FilterEngine(unwanted=['Anal', 'VR']),
+    FilterEngine(unwanted=['hair'], min_duration_minutes=20),
+    FilterEngine(required=['Location', 'Solo'], max_duration_minutes=60),
+    FilterEngine(unwanted=['Oculus'], required=['Hair'], min_duration_minutes=30, max_duration_minutes=90),
+])
+def test_simulation_agrees_with_refilter(app, filters):
+    """Test the bitmap simulation predicts exactly what a re-filter would change."""
+    seed_scenes(300)
+    
+    simulated = TagBitmapIndex().simulate(filters)
+    report = refilter_stored_scenes(filters, dry_run=True)
+    
+    assert simulated['scenes'] == report['scanned'] == 300
+    assert simulated['newly_filtered'] == report['newly_filtered']
+    assert simulated['unfiltered'] == report['unfiltered']
+
+def test_index_follows_tag_category_changes(app):
+    """Test scenes indexed before their tag learned its category are found under it afterwards."""
+    scene = Scene(stashdb_id='a', title='a', tags='["Oculus"]')
+    db.session.add(scene)
+    db.session.flush()
+    store_scene_tags({scene.id: [{'name': 'Oculus'}]})
+    db.session.commit()
+    index = TagBitmapIndex()
+    filters = FilterEngine(unwanted=['VR'])
+    assert index.simulate(filters)['would_filter'] == 0
+    
+    resolve_tag_ids([{'id': 't-oculus', 'name': 'Oculus', 'category': 'VR'}])
+    db.session.commit()
+    assert index.simulate(filters)['would_filter'] == 1
+    assert index.simulate(FilterEngine(unwanted=['Oculus']))['would_filter'] == 1
@@ -0,0 +1,83 @@
+"""
+Unit tests for the cached Whisparr catalogues.
+"""
+
+from app import whisparr_api
+from app.whisparr_api import WhisparrAPI
+
+class FakeWhisparr:
+    """Serves GET /api/v3/<endpoint> lists and counts the downloads"""
+    
+    def __init__(self, lists):
+        self.lists = lists
+        self.downloads = []
+    
+    def __call__(self, method, endpoint, data=None):
+        self.downloads.append(endpoint)
+        return list(self.lists[endpoint])
+
+def make_api(monkeypatch, lists, ttl=300):
+    api = WhisparrAPI()
+    api.catalogue_ttl = ttl
+    server = FakeWhisparr(lists)
+    monkeypatch.setattr(api, '_make_request', server)
+    return api, server
+
+def test_lookups_hit_and_miss(monkeypatch):
+    """Test scene lookups match any StashDB id field and movie lookups match title, optionally by year."""
+    api, _ = make_api(monkeypatch, {
+        'scene': [{'title': 'Scene A', 'stashId': 'uuid-a'}, {'title': 'Scene B', 'foreignId': 'uuid-b'}],
+        'movie': [{'title': 'Some Movie', 'year': 2023}]
+    })
+    
+    assert api.check_scene_exists_by_uuid('uuid-a')
+    assert api.check_scene_exists_by_uuid('uuid-b')
+    assert not api.check_scene_exists_by_uuid('uuid-c')
+    assert api.check_movie_exists('some movie')
+    assert api.check_movie_exists('Some Movie', 2023)
+    assert not api.check_movie_exists('Some Movie', 2022)
+    assert not api.check_movie_exists('Other Movie')
+
+def test_catalogue_is_downloaded_once_per_ttl(monkeypatch):
+    """Test lookups reuse the catalogue until WHISPARR_CATALOGUE_TTL passes, then download it again."""
+    now = [1000.0]
+    monkeypatch.setattr(whisparr_api.time, 'monotonic', lambda: now[0])
+    api, server = make_api(monkeypatch, {'scene': [{'stashId': 'uuid-a'}]}, ttl=300)
+    
+    assert api.check_scene_exists_by_uuid('uuid-a')
+    assert not api.check_scene_exists_by_uuid('uuid-b')
+    assert server.downloads == ['scene']
+    
+    # Added outside this client: only seen once the cached copy expires
+    server.lists['scene'].append({'stashId': 'uuid-b'})
+    now[0] += 299
+    assert not api.check_scene_exists_by_uuid('uuid-b')
+    now[0] += 2
+    assert api.check_scene_exists_by_uuid('uuid-b')
+    assert server.downloads == ['scene', 'scene']
+    
+    # An explicit refresh or invalidation downloads again regardless of age
+    api.get_catalogue('scene', refresh=True)
+    api.invalidate_catalogue()
+    api.check_scene_exists_by_uuid('uuid-a')
+    assert server.downloads == ['scene'] * 4
+
+def test_added_items_stay_in_their_own_catalogue(monkeypatch):
+    """Test an item created through one endpoint is only recorded in that endpoint's catalogue."""
+    api, server = make_api(monkeypatch, {'scene': [], 'movie': []})
+    api.get_catalogue('scene')
+    api.get_catalogue('movie')
+    
+    api._remember_added('scene', {'title': 'New Scene', 'stashId': 'uuid-new'})
+    api._remember_added('movie', {'title': 'New Movie', 'foreignId': 'uuid-movie'})
+    
+    assert api.check_scene_exists_by_uuid('uuid-new')
+    assert not api.check_scene_exists_by_uuid('uuid-movie')
+    assert api.check_movie_exists('New Movie')
+    assert not api.check_movie_exists('New Scene')
+    assert server.downloads == ['scene', 'movie']
+    
+    # Nothing is recorded for an endpoint whose catalogue was never loaded
+    api.invalidate_catalogue()
+    api._remember_added('scene', {'stashId': 'uuid-later'})
+    assert api._catalogues == {}